@@ -0,0 +1,10 @@
+# Parser benchmarks
+#
+# Synthetic copies of the data folder (INPUT data Excel file with sheets ID, YOKO and ANALITICA, variables file and
+# meteo folders) are generated at several scales of the current history (1x, 10x, 100x) and the parser is run on them,
+# measuring the time spent in every stage and the peak memory (RSS), both with an empty cache (cold) and with nothing
+# to be done (warm). The outputs are compared against a golden run.
+#
+# Usage (from the root directory of the repository):
+#   python -m benchmarks.run --save-golden      # e.g. on the reference version of the parser
+#   python -m benchmarks.run --scales 1 10 100  # outputs are compared against the golden run
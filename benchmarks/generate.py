@@ -0,0 +1,138 @@
+# Required Libraries
+import calendar
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# Constants
+from parser_edar40.common.constants import (IN_DATA_FILE_NAME, IN_DATA_SHEETS_LAYOUT, IN_METEO_FILE_NAME_PERIOD_1,
+                                            VARIABLES_TO_READ_FILE_NAME, IN_METEO_DATA_FILE_DIR, MONTH_FOLDER_NAMES,
+                                            DATA_FILE_NAMES, COLUMN_NAMES, ID_EDAR_CARTUJA_ID_sheet_column_names_FILE_NAME,
+                                            ID_EDAR_CARTUJA_YOKO_sheet_column_names_FILE_NAME,
+                                            ID_EDAR_CARTUJA_ANALITICA_sheet_column_names_FILE_NAME)
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Current history of the INPUT data Excel file and of the meteo folders (scale 1x)
+HISTORY_START = pd.Timestamp('2013-01-01')
+HISTORY_END = pd.Timestamp('2019-09-30')
+METEO_MONTHS = {'2018': MONTH_FOLDER_NAMES[4:], '2019': MONTH_FOLDER_NAMES[:9]}
+
+# Excel files can not hold dates before 1900 (and dates of January and February 1900 are not reliable), and pandas
+# can not hold dates after 2262. Histories longer than that are capped.
+FIRST_DATE = pd.Timestamp('1900-03-01')
+LAST_DATE = pd.Timestamp('2262-04-01')
+
+# Lists of column names of every sheet (written by the parser, see blnCreate_ID_sheet_columns_list)
+SHEET_COLUMN_NAMES_FILE_NAMES = {'ID': ID_EDAR_CARTUJA_ID_sheet_column_names_FILE_NAME,
+                                 'YOKO': ID_EDAR_CARTUJA_YOKO_sheet_column_names_FILE_NAME,
+                                 'ANALITICA': ID_EDAR_CARTUJA_ANALITICA_sheet_column_names_FILE_NAME}
+
+# Meteo CSV files columns before the variables
+METEO_COLUMNS = ['INDICATIVO', 'AÑO', 'MES', 'DIA', 'NOMBRE', 'ALTITUD', 'LONGITUD', 'LATITUD']
+
+# Define function to get the HEADER of a sheet from the list of its column names, undoing the suffixes added by
+# pandas to duplicated names (e.g. CAUDAL, CAUDAL.1 -> CAUDAL, CAUDAL). The first column (dates) has no name.
+def sheet_header(sheet_name):
+    names = (REPO_DIR / SHEET_COLUMN_NAMES_FILE_NAMES[sheet_name]).read_text(encoding='utf-8').splitlines()
+    header, seen = [None], set()
+    for name in names[1:]:
+        match = re.match(r'^(.*)\.(\d+)$', name)
+        if match and match.group(1) in seen:
+            header.append(match.group(1))
+        else:
+            header.append(name)
+            seen.add(name)
+    return header
+
+def history_dates(scale):
+    """Returns the dates of a history scale times longer than the current one. It ends on HISTORY_END, unless it should
+    start before FIRST_DATE (then it starts on FIRST_DATE), and it is capped to LAST_DATE"""
+    days = int(round(scale * ((HISTORY_END - HISTORY_START).days + 1)))
+    first_date, history_end, last_date = (np.datetime64(date.date()) for date in (FIRST_DATE, HISTORY_END, LAST_DATE))
+    start = max(first_date, history_end - (days - 1))
+    end = min(last_date, start + (days - 1))
+    if (end - start).astype(int) + 1 < days:
+        print(f'¡¡¡WARNING!!!: La historia de escala {scale}x se limita a {start} - {end}')
+    return pd.date_range(start, end)
+
+def generate_workbook(file_name, dates, rng):
+    """Generates an INPUT data Excel file with the layout of every sheet (see IN_DATA_SHEETS_LAYOUT), the columns of
+    the real one and random values (5% of them empty). Some rows of sheet YOKO are duplicated, as in the real one."""
+    wb = Workbook(write_only=True)
+    for sheet_name, layout in IN_DATA_SHEETS_LAYOUT.items():
+        ws = wb.create_sheet(sheet_name)
+        header = sheet_header(sheet_name)
+        for i in range(layout['data']):
+            if i == layout['header']:
+                ws.append(header)
+            elif i == layout['units']:
+                ws.append([None] + [f'u{j}' for j in range(1, len(header))])
+            else:
+                ws.append([f'{sheet_name} {i}'])
+
+        # Values are generated (and written) in blocks of rows, in order to bound memory
+        for first in range(0, len(dates), 1000):
+            block = dates[first:first + 1000]
+            values = np.round(rng.random((len(block), len(header) - 1)) * 100, 3)
+            values[rng.random(values.shape) < 0.05] = np.nan
+            for date, row_values in zip(block, values.tolist()):
+                row = [date.to_pydatetime()] + [None if value != value else value for value in row_values]
+                ws.append(row)
+                if sheet_name == 'YOKO' and date.day == 1:
+                    ws.append(row)
+    wb.save(file_name)
+
+def generate_meteo(meteo_dir, scale, rng):
+    """Generates the meteo folders (<year>/<month>/<file>) with scale times the current number of months. Years before
+    2018 get all their months; 2018 and 2019 keep their current months (see list_year_months in parser_edar40/app.py)"""
+    months_1x = sum(len(months) for months in METEO_MONTHS.values())
+    extra_years = int(np.ceil(max(0, scale - 1) * months_1x / 12))
+    first_year = max(FIRST_DATE.year + 1, 2018 - extra_years)
+    year_months = {str(year): MONTH_FOLDER_NAMES for year in range(first_year, 2018)}
+    year_months.update(METEO_MONTHS)
+
+    for year, months in year_months.items():
+        for month in months:
+            month_number = MONTH_FOLDER_NAMES.index(month) + 1
+            days = calendar.monthrange(int(year), month_number)[1]
+            month_dir = meteo_dir / year / month
+            month_dir.mkdir(parents=True, exist_ok=True)
+            for col, file_name in DATA_FILE_NAMES.items():
+                df = pd.DataFrame({'INDICATIVO': 9434, 'AÑO': int(year), 'MES': month_number,
+                                   'DIA': np.arange(1, days + 1), 'NOMBRE': 'ZARAGOZA/AEROPUERTO', 'ALTITUD': 249,
+                                   'LONGITUD': '0100152', 'LATITUD': 413938})
+                for variable in COLUMN_NAMES[col]:
+                    df[variable] = rng.integers(0, 10000, days)
+                df.to_csv(month_dir / file_name, sep=';', index=False, encoding='latin_1')
+    return sum(len(months) for months in year_months.values())
+
+def generate_tree(root_dir, scale, seed=0):
+    """Generates a synthetic copy of the data folder of the parser
+
+    Parameters:
+        root_dir: Directory where the parser will be run (./data and ./static/Cartuja_Datos are created)
+        scale: Length of the history, relative to the current one (e.g. 1, 10, 100)
+        seed: Seed of the random values, so that the same tree is generated every time
+
+    Returns:
+        info: Dictionary with the dates and the number of meteo months of the tree
+    """
+    root_dir = Path(root_dir)
+    rng = np.random.default_rng(seed)
+    data_dir = root_dir / IN_DATA_FILE_NAME.parent
+    data_dir.mkdir(parents=True, exist_ok=True)
+    (root_dir / 'static' / 'Cartuja_Datos').mkdir(parents=True, exist_ok=True)
+
+    shutil.copy(REPO_DIR / VARIABLES_TO_READ_FILE_NAME, root_dir / VARIABLES_TO_READ_FILE_NAME)
+    shutil.copy(REPO_DIR / IN_METEO_FILE_NAME_PERIOD_1, root_dir / IN_METEO_FILE_NAME_PERIOD_1)
+
+    dates = history_dates(scale)
+    generate_workbook(root_dir / IN_DATA_FILE_NAME, dates, rng)
+    meteo_months = generate_meteo(root_dir / IN_METEO_DATA_FILE_DIR, scale, rng)
+    return {'scale': scale, 'start': f'{dates[0]:%Y-%m-%d}', 'end': f'{dates[-1]:%Y-%m-%d}', 'days': len(dates),
+            'meteo_months': meteo_months}
@@ -0,0 +1,187 @@
+# Required Libraries
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Constants
+from parser_edar40.common.constants import OUT_DATASET_DIR
+
+# Parquet dataset
+from parser_edar40.store import read_dataset
+
+# Benchmarks
+from benchmarks.generate import REPO_DIR, generate_tree
+from benchmarks.run_parser import RESULT_PREFIX, OUTPUT_DIR
+
+DEFAULT_WORK_DIR = Path(tempfile.gettempdir()) / 'edar40_benchmarks'
+GENERATION_INFO_FILE_NAME = 'benchmark.json'
+GOLDEN_DATASET_FILE_NAME = 'dataset.parquet'
+
+# Define function to run the parser in its own process, in the directory of a tree, and get its result
+def run_parser(tree_dir, cold):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([str(REPO_DIR)] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    command = [sys.executable, '-m', 'benchmarks.run_parser'] + (['--cold'] if cold else [])
+    process = subprocess.run(command, cwd=str(tree_dir), env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                             universal_newlines=True)
+    lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if process.returncode != 0 or not lines:
+        print(process.stdout)
+        raise RuntimeError(f'El parser ha fallado en {tree_dir} (código {process.returncode})')
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+# Define function to list the OUTPUT files of a tree to be compared (CSV files and lists of column names)
+def output_files(tree_dir):
+    return sorted(f for f in (tree_dir / OUTPUT_DIR).iterdir() if f.suffix in ('.csv', '.md'))
+
+def save_golden(tree_dir, golden_dir):
+    shutil.rmtree(golden_dir, ignore_errors=True)
+    golden_dir.mkdir(parents=True)
+    for f in output_files(tree_dir):
+        shutil.copy(f, golden_dir / f.name)
+    if (tree_dir / OUT_DATASET_DIR).exists():
+        read_dataset(dataset_dir=tree_dir / OUT_DATASET_DIR).to_parquet(golden_dir / GOLDEN_DATASET_FILE_NAME)
+
+# Define function to compare two CSV files value by value: numbers with a relative tolerance, text exactly
+def csv_numerically_equal(file_name_1, file_name_2):
+    df_1 = pd.read_csv(file_name_1, encoding='latin-1', dtype=str, keep_default_na=False)
+    df_2 = pd.read_csv(file_name_2, encoding='latin-1', dtype=str, keep_default_na=False)
+    if list(df_1.columns) != list(df_2.columns) or df_1.shape != df_2.shape:
+        return False
+    for col in df_1.columns:
+        values_1 = pd.to_numeric(df_1[col], errors='coerce').to_numpy()
+        values_2 = pd.to_numeric(df_2[col], errors='coerce').to_numpy()
+        text = np.isnan(values_1) | np.isnan(values_2)
+        if not ((df_1[col][text] == df_2[col][text]).all()
+                and np.allclose(values_1[~text], values_2[~text], rtol=1e-9, atol=0)):
+            return False
+    return True
+
+def compare_golden(tree_dir, golden_dir):
+    """Compares the OUTPUT files of a tree with the golden ones
+
+    Returns:
+        comparison: Dictionary with file name as key and 'same' (identical), 'numeq' (same values, formatted
+                    differently), 'diff' or 'missing' as value
+    """
+    comparison = {}
+    for golden_file in sorted(golden_dir.iterdir()):
+        if golden_file.name == GOLDEN_DATASET_FILE_NAME:
+            dataset_dir = tree_dir / OUT_DATASET_DIR
+            if not dataset_dir.exists():
+                comparison[OUT_DATASET_DIR.name] = 'missing'
+                continue
+            df = read_dataset(dataset_dir=dataset_dir)
+            df_golden = pd.read_parquet(golden_file)
+            comparison[OUT_DATASET_DIR.name] = 'same' if df.equals(df_golden) else 'diff'
+            continue
+
+        out_file = tree_dir / OUTPUT_DIR / golden_file.name
+        if not out_file.exists():
+            comparison[golden_file.name] = 'missing'
+        elif out_file.read_bytes() == golden_file.read_bytes():
+            comparison[golden_file.name] = 'same'
+        elif golden_file.suffix == '.csv' and csv_numerically_equal(golden_file, out_file):
+            comparison[golden_file.name] = 'numeq'
+        else:
+            comparison[golden_file.name] = 'diff'
+    return comparison
+
+def benchmark_scale(scale, work_dir, seed=0, regenerate=False, golden=False):
+    """Runs the benchmark of one scale: generates its tree (unless it exists), runs the parser cold and warm and
+    compares the outputs against the golden ones (or saves them as golden)"""
+    scale_dir = work_dir / f'{scale}x'
+    tree_dir = scale_dir / 'tree'
+    golden_dir = scale_dir / 'golden'
+    info_file_name = tree_dir / GENERATION_INFO_FILE_NAME
+
+    if regenerate or not info_file_name.exists():
+        shutil.rmtree(tree_dir, ignore_errors=True)
+        print(f'Generando datos sintéticos de escala {scale}x en {tree_dir}')
+        start_t = time.time()
+        info = generate_tree(tree_dir, scale, seed)
+        info['generation_seconds'] = time.time() - start_t
+        info_file_name.write_text(json.dumps(info))
+    info = json.loads(info_file_name.read_text())
+
+    print(f'Escala {scale}x: ejecución en frío')
+    cold = run_parser(tree_dir, cold=True)
+    print(f'Escala {scale}x: ejecución sin cambios')
+    warm = run_parser(tree_dir, cold=False)
+
+    if golden:
+        save_golden(tree_dir, golden_dir)
+        comparison = 'saved'
+    elif golden_dir.exists():
+        comparison = compare_golden(tree_dir, golden_dir)
+    else:
+        comparison = None
+    return {'tree': info, 'cold': cold, 'warm': warm, 'golden': comparison}
+
+# Define function to check the comparison of a benchmark against the golden outputs; strict only accepts identical files
+def golden_ok(comparison, strict=False):
+    accepted = ('same',) if strict else ('same', 'numeq')
+    return all(status in accepted for status in comparison.values())
+
+def print_result(scale, result, strict=False):
+    print(f'\n=== Escala {scale}x: {result["tree"]["days"]} días ({result["tree"]["start"]} - {result["tree"]["end"]}), '
+          f'{result["tree"]["meteo_months"]} meses de meteo ===')
+    print(f'{"Etapa":<20}{"frío (s)":>12}{"sin cambios (s)":>18}')
+    for name, cold in result['cold']['stages'].items():
+        warm = result['warm']['stages'].get(name, {})
+        cold_seconds = '-' if cold['seconds'] is None else f'{cold["seconds"]:.3f}'
+        warm_seconds = '-' if warm.get('seconds') is None else f'{warm["seconds"]:.3f}'
+        print(f'{name:<20}{cold_seconds:>12}{warm_seconds:>18}')
+    print(f'{"TOTAL":<20}{result["cold"]["total_seconds"]:>12.3f}{result["warm"]["total_seconds"]:>18.3f}')
+    print(f'Memoria máxima (RSS): {result["cold"]["peak_rss_mb"]:.0f} MB parser, '
+          f'{result["cold"]["peak_rss_workers_mb"]:.0f} MB workers')
+    if isinstance(result['golden'], dict):
+        for file_name, status in result['golden'].items():
+            print(f'{status:<8}{file_name}')
+        print('Golden: ' + ('OK' if golden_ok(result['golden'], strict) else 'FAIL'))
+    else:
+        print(f'Golden: {result["golden"] or "no existe (ejecutar con --save-golden)"}')
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark del parser con datos sintéticos')
+    arg_parser.add_argument('--scales', type=float, nargs='+', default=[1, 10],
+                            help='Escalas de la historia respecto a la actual (por defecto 1 10)')
+    arg_parser.add_argument('--work-dir', type=Path, default=DEFAULT_WORK_DIR,
+                            help=f'Directorio de los datos sintéticos (por defecto {DEFAULT_WORK_DIR})')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--regenerate', action='store_true', help='Generar de nuevo los datos sintéticos')
+    arg_parser.add_argument('--save-golden', action='store_true',
+                            help='Guardar las salidas como referencia (golden) en lugar de compararlas')
+    arg_parser.add_argument('--report', type=Path, default=None,
+                            help='Archivo JSON de resultados (por defecto logs/benchmark_<fecha>.json)')
+    arg_parser.add_argument('--strict', action='store_true',
+                            help='Exigir salidas idénticas byte a byte a las golden (sin tolerancia numérica)')
+    args = arg_parser.parse_args()
+
+    results = {}
+    for scale in args.scales:
+        scale = int(scale) if float(scale).is_integer() else scale
+        results[f'{scale}x'] = benchmark_scale(scale, args.work_dir, args.seed, args.regenerate, args.save_golden)
+        print_result(scale, results[f'{scale}x'], args.strict)
+
+    report_file_name = args.report or REPO_DIR / 'logs' / f'benchmark_{time.strftime("%Y%m%d_%H%M%S")}.json'
+    report_file_name.parent.mkdir(parents=True, exist_ok=True)
+    report_file_name.write_text(json.dumps(results, indent=2))
+    print(f'\nResultados guardados en {report_file_name}')
+
+    # Exit with an error if the outputs of any scale differ from the golden ones (e.g. in CI)
+    if any(isinstance(result['golden'], dict) and not golden_ok(result['golden'], args.strict)
+           for result in results.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
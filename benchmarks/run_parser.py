@@ -0,0 +1,43 @@
+# Run the parser once in the current directory (a tree generated by benchmarks/generate.py) and print the time spent
+# in every stage and the peak memory, as JSON, in the last line. It is executed by benchmarks/run.py in its own
+# process, so that every run starts from scratch (constants, caches in memory and peak memory).
+#
+# Usage: python -m benchmarks.run_parser [--cold]
+#   --cold: remove the parser cache and the OUTPUT files first
+
+# Required Libraries
+import json
+import resource
+import shutil
+import sys
+import time
+from pathlib import Path
+
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+
+# Directories removed before a cold run
+CACHE_DIR = Path('./data/.cache')
+OUTPUT_DIR = Path('./static/Cartuja_Datos')
+
+def main():
+    cold = '--cold' in sys.argv[1:]
+    if cold:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    start_t = time.time()
+    from parser_edar40.app import parser
+    stages = parser()
+    end_t = time.time()
+
+    # NOTE: ru_maxrss is given in KB (Linux). Worker processes (see intParser_WORKERS) are counted apart.
+    result = {'mode': 'cold' if cold else 'warm',
+              'total_seconds': end_t - start_t,
+              'stages': {stage.name: {'seconds': stage.elapsed, 'executed': stage.executed} for stage in stages},
+              'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+              'peak_rss_workers_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024}
+    print(RESULT_PREFIX + json.dumps(result))
+
+if __name__ == '__main__':
+    main()
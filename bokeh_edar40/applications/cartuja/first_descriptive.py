@@ -1,5 +1,6 @@
 from bokeh_edar40.visualizations.treemap import normalize_sizes, squarify
-from utils.rapidminer_proxy import call_webservice 
+from bokeh_edar40.visualizations.simul_optim_widgets import Spinner, create_div_error
+from utils.rapidminer_proxy import async_rapidminer_client
 import utils.bokeh_utils as bokeh_utils
 
 from bokeh.layouts import column, row, widgetbox, grid,layout
@@ -11,7 +12,9 @@ from bokeh.models.tickers import FixedTicker
 from bokeh.models.ranges import FactorRange
 from bokeh.models.tools import HoverTool
 from bokeh.models.widgets import Tabs, Panel
+from bokeh.document import without_document_lock
 
+from functools import partial
 import pandas as pd
 from pandas.io.json import json_normalize
 import numpy as np
@@ -541,53 +544,88 @@ def modify_first_descriptive(doc):
 		tipo_var = 'RENDIMIENTOS'
 	print(f'periodo: {periodo}, tipo_var: {tipo_var}')
 	# desc = create_description()
-	# Llamada al webservice de RapidMiner
-	json_document = call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Perfil_Out_JSON_v5?',
-									username='rapidminer',
-									password='rapidminer',
-									parameters={'Ruta_periodo': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{periodo}.csv',
-												'Ruta_tipo_variable': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_VARIABLES_{tipo_var}.csv',
-												'Normalizacion': 1},
-									out_json=True)
-	print(f'json_doc: {json_document}')
-	df_perfil = [json_normalize(data) for data in json_document]
-
-	# Extracción de los dataframe
-	normalize_df = df_perfil[0]
-	not_normalize_df = df_perfil[1]
-	weight_df = df_perfil[2]
-
-	# Eliminamos texto repetido average() de los indicadores
-	normalize_df['Indicador']=normalize_df['Indicador'].replace(regex=[r'\(', r'\)', 'average'],value='')	
-	not_normalize_df['Indicador']=not_normalize_df['Indicador'].replace(regex=[r'\(', r'\)', 'average'],value='')
-
-	# Convertimos las columnas numericas a flotante
-	normalize_df['valor'] = normalize_df['valor'].astype('float')
-	not_normalize_df['valor'] = not_normalize_df['valor'].astype('float')
-
-	# Creación de los gráficos
-	## Gráfico de perfil y araña normalizado
-	normalize_plot = create_normalize_plot(normalize_df)
-	nor_rad_pl = create_radar_plot(normalize_df, tipo_var)
-	# l_panel = Panel(child=nor_rad_pl, title='Diagrama de araña')
-	# r_panel = Panel(child=normalize_plot, title='Diagrama de linea')
-	# profile_tabs = Tabs(tabs=[l_panel, r_panel], height = 400, sizing_mode="stretch_both", max_width=650, margin=[0,10,0,0])
-	profile_title = create_title('Perfil de calidad del agua (normalizado) - Diagrama de línea')
-	profile_title_rad = create_title('Perfil de calidad del agua (normalizado) - Diagrama de araña')
-	# profile_widget_box = widgetbox([profile_title, profile_tabs], max_width=650, height=400, sizing_mode='stretch_width', spacing=3)
+	# Mientras RapidMiner responde se muestra un spinner. La llamada se hace en una corutina sin el lock del documento
+	# (request_perfil), de forma que el IO loop del servidor Bokeh sigue atendiendo al resto de sesiones, y los gráficos
+	# se crean después en un callback con el lock (show_perfil)
+	spinner = Spinner(size=40)
+	spinner.show_spinner()
+	loading = column([spinner.spinner])
+	doc.add_root(loading)
+
+	@without_document_lock
+	async def request_perfil():
+		# Llamada al webservice de RapidMiner
+		try:
+			json_document = await async_rapidminer_client.call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Perfil_Out_JSON_v5?',
+											username='rapidminer',
+											password='rapidminer',
+											parameters={'Ruta_periodo': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{periodo}.csv',
+														'Ruta_tipo_variable': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_VARIABLES_{tipo_var}.csv',
+														'Normalizacion': 1},
+											out_json=True,
+											cached=True)
+		except Exception as e:
+			print(f'Error en la llamada al perfil: {e!r}')
+			doc.add_next_tick_callback(partial(show_perfil_error, e))
+			return
+		doc.add_next_tick_callback(partial(show_perfil, json_document))
+
+	def show_perfil_error(error):
+		loading.children = [create_div_error(f'<b>Error</b> al obtener el perfil de calidad del agua ({type(error).__name__})')]
+
+	# Creación de los gráficos del perfil a partir de la respuesta de RapidMiner
+	def create_perfil_layout(json_document):
+		print(f'json_doc: {json_document}')
+		df_perfil = [json_normalize(data) for data in json_document]
+
+		# Extracción de los dataframe
+		normalize_df = df_perfil[0]
+		not_normalize_df = df_perfil[1]
+		weight_df = df_perfil[2]
+
+		# Eliminamos texto repetido average() de los indicadores
+		normalize_df['Indicador']=normalize_df['Indicador'].replace(regex=[r'\(', r'\)', 'average'],value='')	
+		not_normalize_df['Indicador']=not_normalize_df['Indicador'].replace(regex=[r'\(', r'\)', 'average'],value='')
+
+		# Convertimos las columnas numericas a flotante
+		normalize_df['valor'] = normalize_df['valor'].astype('float')
+		not_normalize_df['valor'] = not_normalize_df['valor'].astype('float')
+
+		# Creación de los gráficos
+		## Gráfico de perfil y araña normalizado
+		normalize_plot = create_normalize_plot(normalize_df)
+		nor_rad_pl = create_radar_plot(normalize_df, tipo_var)
+		# l_panel = Panel(child=nor_rad_pl, title='Diagrama de araña')
+		# r_panel = Panel(child=normalize_plot, title='Diagrama de linea')
+		# profile_tabs = Tabs(tabs=[l_panel, r_panel], height = 400, sizing_mode="stretch_both", max_width=650, margin=[0,10,0,0])
+		profile_title = create_title('Perfil de calidad del agua (normalizado) - Diagrama de línea')
+		profile_title_rad = create_title('Perfil de calidad del agua (normalizado) - Diagrama de araña')
+		# profile_widget_box = widgetbox([profile_title, profile_tabs], max_width=650, height=400, sizing_mode='stretch_width', spacing=3)
 	
-	## Tabla sin normalizar
-	not_normalize_table_title = create_title('Indicadores influyentes sin normalizar')
-	not_normalize_table = create_not_normalize_plot(not_normalize_df, tipo_var)
-	not_normalize_widget_box = widgetbox([not_normalize_table_title, not_normalize_table], max_width=600, height=400, sizing_mode='stretch_both', spacing=3)
+		## Tabla sin normalizar
+		not_normalize_table_title = create_title('Indicadores influyentes sin normalizar')
+		not_normalize_table = create_not_normalize_plot(not_normalize_df, tipo_var)
+		not_normalize_widget_box = widgetbox([not_normalize_table_title, not_normalize_table], max_width=600, height=400, sizing_mode='stretch_both', spacing=3)
 	
-	## Gráfico de peso de indicadores
-	weight_plot = create_weight_plot(weight_df)
-
-	# Distribución de los gráficos con una grid de bokeh
-	l = grid([
-		[column([profile_title, normalize_plot], sizing_mode='stretch_width'), column([profile_title_rad, nor_rad_pl], sizing_mode='stretch_width')],
-		[not_normalize_widget_box, weight_plot]
-		], sizing_mode='stretch_both')
-
-	doc.add_root(l)
+		## Gráfico de peso de indicadores
+		weight_plot = create_weight_plot(weight_df)
+
+		# Distribución de los gráficos con una grid de bokeh
+		l = grid([
+			[column([profile_title, normalize_plot], sizing_mode='stretch_width'), column([profile_title_rad, nor_rad_pl], sizing_mode='stretch_width')],
+			[not_normalize_widget_box, weight_plot]
+			], sizing_mode='stretch_both')
+		return l
+
+	def show_perfil(json_document):
+		try:
+			l = create_perfil_layout(json_document)
+		except Exception as e:
+			# Respuesta de RapidMiner inesperada
+			print(f'Error en el perfil: {e!r}')
+			show_perfil_error(e)
+			return
+		doc.remove_root(loading)
+		doc.add_root(l)
+
+	doc.add_next_tick_callback(request_perfil)
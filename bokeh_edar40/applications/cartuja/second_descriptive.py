@@ -1,6 +1,6 @@
-from utils.rapidminer_proxy import call_webservice
+from utils.rapidminer_proxy import async_rapidminer_client, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
 from bokeh_edar40.visualizations.decision_tree import Node, Tree
-from bokeh_edar40.visualizations.simul_optim_widgets import SimulOptimWidget, create_div_title, Spinner
+from bokeh_edar40.visualizations.simul_optim_widgets import SimulOptimWidget, create_div_title, create_div_error, Spinner
 import utils.bokeh_utils as bokeh_utils
 from utils.generate_model_vars import load_or_create_model_vars, load_obj, save_obj
 
@@ -8,6 +8,7 @@ from utils.generate_model_vars import load_or_create_model_vars, load_obj, save_
 from bokeh.models import ColumnDataSource, Div, HoverTool, GraphRenderer, StaticLayoutProvider, Rect, MultiLine, LinearAxis, Legend, Span, Label, BasicTicker, ColorBar, LinearColorMapper, PrintfTickFormatter, MonthsTicker, LinearAxis, Range1d
 from bokeh.models.widgets import Select, Button, DataTable, CheckboxButtonGroup
 from bokeh.plotting import figure
+from bokeh.document import without_document_lock
 from bokeh.layouts import layout, widgetbox, column, row
 from bokeh.models.formatters import DatetimeTickFormatter
 from bokeh.models.tickers import FixedTicker
@@ -19,6 +20,7 @@ import numpy as np
 import re
 from pandas.io.json import json_normalize
 from collections import OrderedDict
+from functools import partial
 from datetime import datetime as dt
 import time
 
@@ -706,34 +708,65 @@ def modify_second_descriptive(doc):
 	except:
 		created_models = ['Calidad_Agua']
 	
-	# Llamada al webservice de RapidMiner
-	json_perfil_document = call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Perfil_Out_JSON_v5?',
-											username='rapidminer',
-											password='rapidminer',
-											parameters={'Ruta_periodo': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{periodo}.csv',
-														'Ruta_tipo_variable': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_VARIABLES_{tipo_var}.csv',
-														'Normalizacion': 1},
-											out_json=True)
-	
-	# Extracción de los datos web
-	df_perfil = [json_normalize(data) for data in json_perfil_document]
-	
-	# Asignación de los datos web a su variable correspondiente
-	prediction_df = df_perfil[3]
-	outlier_df = df_perfil[4]
-
-	# Creación de los gráficos y widgets permanentes en la interfaz
-	prediction_plot = create_prediction_plot(prediction_df)
-	outlier_plot = create_outlier_plot(outlier_df, tipo_var)
+	# Las llamadas a RapidMiner se hacen en corutinas sin el lock del documento (request_perfil, request_model), de forma
+	# que el IO loop del servidor Bokeh sigue atendiendo al resto de sesiones (y a esta) mientras responde. Los gráficos se
+	# crean después en callbacks con el lock (show_perfil, show_model)
+	perfil_spinner = Spinner(size=40)
+	perfil_spinner.show_spinner()
+	perfil_plots = column([perfil_spinner.spinner], sizing_mode='stretch_width')
+
+	@without_document_lock
+	async def request_perfil():
+		# Llamada al webservice de RapidMiner
+		try:
+			json_perfil_document = await async_rapidminer_client.call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Perfil_Out_JSON_v5?',
+													username='rapidminer',
+													password='rapidminer',
+													parameters={'Ruta_periodo': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{periodo}.csv',
+																'Ruta_tipo_variable': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_VARIABLES_{tipo_var}.csv',
+																'Normalizacion': 1},
+													out_json=True,
+													cached=True)
+		except Exception as e:
+			print(f'Error en la llamada al perfil: {e!r}')
+			doc.add_next_tick_callback(partial(show_perfil_error, e))
+			return
+		doc.add_next_tick_callback(partial(show_perfil, json_perfil_document))
+
+	def show_perfil_error(error):
+		perfil_plots.children = [create_div_error(f'<b>Error</b> al obtener el perfil de calidad del agua ({type(error).__name__})')]
+
+	def show_perfil(json_perfil_document):
+		try:
+			# Extracción de los datos web
+			df_perfil = [json_normalize(data) for data in json_perfil_document]
+
+			# Asignación de los datos web a su variable correspondiente
+			prediction_df = df_perfil[3]
+			outlier_df = df_perfil[4]
+
+			# Creación de los gráficos del perfil
+			prediction_plot = create_prediction_plot(prediction_df)
+			outlier_plot = create_outlier_plot(outlier_df, tipo_var)
+		except Exception as e:
+			# Respuesta de RapidMiner inesperada
+			print(f'Error en el perfil: {e!r}')
+			show_perfil_error(e)
+			return
+		perfil_plots.children = [prediction_plot, outlier_plot]
+
+	# Creación de los widgets permanentes en la interfaz
 	simulation_title = create_div_title('Creación, Simulación y Optimización de modelos')
 	model_title, add_model_button, model_select_menu = create_model_menu(model_variables=list(total_model_dict.keys()))
 	create_model_spinner = Spinner(size=16)
+	model_error = create_div_error()
 	recreate_button = Button(label='Recrear', button_type='success', height=35, max_width=200, min_width=200)
 	model_select_wb = widgetbox(
 		[
 		row([model_title, create_model_spinner.spinner], sizing_mode='stretch_width', max_width=400),
 		row([model_select_menu, recreate_button], sizing_mode='stretch_width', max_width=400),
-		add_model_button
+		add_model_button,
+		model_error
 		], max_width=400, sizing_mode='stretch_width')
 	created_models_title = create_div_title('Modelos creados')
 	created_models_checkbox = CheckboxButtonGroup(labels=list(models.keys()), height=35)
@@ -763,22 +796,29 @@ def modify_second_descriptive(doc):
 	recreate_button.on_click(recreate_callback)
 
 	# Callbacks para los widgets de la interfaz
-	def prediction_callback(model='Calidad_Agua'):
-		create_model_spinner.show_spinner()
-		if initialize == False:
-			model_objective = model_select_menu.value
-		else:
-			model_objective = model
-		model_discretise = 5
-		
+	def prediction_callback():
+		create_model(model_select_menu.value)
+	add_model_button.on_click(prediction_callback)
+
+	# Modelos cuya creación está en curso
+	pending_models = set()
+
+	def create_model(model_objective, priority=PRIORITY_INTERACTIVE):
 		# Verificar que el modelo no ha sido creado antes
-		if model_objective not in models:		
-			# print(f'Objetivo: {model_objective}')
-			# print(f'Discretizacion: {model_discretise}')
-			# print(f'Ruta_periodo: /home/admin/Cartuja_Datos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{periodo}.csv')
-			# print(f'IN_MODELO: {total_model_dict[model_objective]}')
-			# Llamar al servicio web EDAR_Cartuja_Prediccion con los nuevos parámetros
-			json_prediction_document = call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Prediccion_JSON_v5?',
+		if model_objective not in models and model_objective not in pending_models:
+			pending_models.add(model_objective)
+			create_model_spinner.show_spinner()
+			doc.add_next_tick_callback(without_document_lock(partial(request_model, model_objective, priority)))
+
+	async def request_model(model_objective, priority):
+		model_discretise = 5
+		# print(f'Objetivo: {model_objective}')
+		# print(f'Discretizacion: {model_discretise}')
+		# print(f'Ruta_periodo: /home/admin/Cartuja_Datos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{periodo}.csv')
+		# print(f'IN_MODELO: {total_model_dict[model_objective]}')
+		# Llamar al servicio web EDAR_Cartuja_Prediccion con los nuevos parámetros
+		try:
+			json_prediction_document = await async_rapidminer_client.call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Prediccion_JSON_v5?',
 														username='rapidminer',
 														password='rapidminer',
 														parameters={'Objetivo': model_objective,
@@ -787,61 +827,88 @@ def modify_second_descriptive(doc):
 																	'Ruta_periodo': f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{periodo}.csv',
 																	'IN_MODELO': str(total_model_dict[model_objective])
 																	},
-														out_json=True)	
-			
-			# Obtener datos
-			df_prediction = [json_normalize(data) for data in json_prediction_document]
-
-			decision_tree_df = df_prediction[0]
-			decision_tree_df = append_count(decision_tree_df)
-			confusion_df_raw = df_prediction[1].reindex(columns=list(json_prediction_document[1][0].keys()))
-			confusion_df = create_df_confusion(confusion_df_raw)
-			weight_df = df_prediction[2]
-			pred_df = df_prediction[3]
-			ranges_df = df_prediction[4]
-			ranges_df.set_index('Name', inplace=True)
-			# ranges_df['Values']=ranges_df['Values'].replace(regex=r'\(.*\)',value='')
-			slider_df = create_df_sliders(weight_df, pred_df)
-			daily_pred_df = pred_df[['Fecha', model_objective, f'prediction({model_objective})']]
-			possible_targets = sorted(list(pred_df[model_objective].unique()))
-			# print(f'Targets: {possible_targets}')
-			var_influyentes = list(weight_df['Attribute'])
-			decision_tree_data = create_decision_tree_data(decision_tree_df, model_objective)
-			
-			# Crear nuevos gráficos
-			simul_or_optim_wb = SimulOptimWidget(target=model_objective, simul_df=slider_df, possible_targets=possible_targets, var_influyentes=var_influyentes, periodo=periodo, ranges=ranges_df)
-			daily_pred_plot = create_daily_pred_plot(daily_pred_df, model_objective)
-			decision_tree_plot = create_decision_tree_plot()
-			decision_tree_graph = create_decision_tree_graph_renderer(decision_tree_plot, decision_tree_data)
-			decision_tree_plot = append_labels_to_decision_tree(decision_tree_plot, decision_tree_graph, decision_tree_data)
-			confusion_matrix = create_confusion_matrix(confusion_df)
-			weight_plot = create_attribute_weight_plot(weight_df, model_objective)
-			corrects_plot = create_corrects_plot(confusion_df, model_objective)
-			model_title = create_div_title(f'Modelo - {model_objective}')
-			confusion_title = create_div_title(f'Matriz de confusión - {model_objective}')
-			decision_tree_title = create_div_title(f'Arbol de decisión - {model_objective}')
-			ranges_description = create_ranges_description(possible_targets, model_objective)
-			new_plots = layout([
-				[model_title],
-				[simul_or_optim_wb.rb],
-				[row([simul_or_optim_wb.wb, ranges_description], min_width=1400, sizing_mode='stretch_width')],
-				[daily_pred_plot],
-				[column([confusion_title, confusion_matrix], sizing_mode='stretch_width'), weight_plot, corrects_plot],
-				[decision_tree_title],
-				[decision_tree_plot]
-			], name=model_objective, sizing_mode='stretch_width')
-
-			# Almacenar en RAM y algunos gráficos y en ROM algunos modelos creados
-			model_plots.children.append(new_plots)
-			if model_objective not in created_models:
-				created_models.append(model_objective)
-			save_obj(created_models, 'resources/created_models.pkl')
-			models.update({model_objective: new_plots})
-			models.move_to_end(model_objective, last=False)
-			created_models_checkbox.labels = list(models.keys())
-			created_models_checkbox.active = list(range(len(models.keys())))
-		create_model_spinner.hide_spinner()
-	add_model_button.on_click(prediction_callback)
+														out_json=True,
+														priority=priority)
+		except Exception as e:
+			print(f'Error en la creación del modelo {model_objective}: {e!r}')
+			doc.add_next_tick_callback(partial(show_model_error, model_objective, e))
+			return
+		doc.add_next_tick_callback(partial(show_model, model_objective, json_prediction_document))
+
+	# Fin de la creación de un modelo (con o sin éxito): ya se puede volver a pedir
+	def model_done(model_objective):
+		pending_models.discard(model_objective)
+		if not pending_models:
+			create_model_spinner.hide_spinner()
+
+	def show_model_error(model_objective, error):
+		model_error.text = f'<b>Error</b> al crear el modelo {model_objective} ({type(error).__name__})'
+		model_done(model_objective)
+
+	# Creación de los gráficos de un modelo a partir de la respuesta de RapidMiner
+	def create_model_plots(model_objective, json_prediction_document):
+		# Obtener datos
+		df_prediction = [json_normalize(data) for data in json_prediction_document]
+
+		decision_tree_df = df_prediction[0]
+		decision_tree_df = append_count(decision_tree_df)
+		confusion_df_raw = df_prediction[1].reindex(columns=list(json_prediction_document[1][0].keys()))
+		confusion_df = create_df_confusion(confusion_df_raw)
+		weight_df = df_prediction[2]
+		pred_df = df_prediction[3]
+		ranges_df = df_prediction[4]
+		ranges_df.set_index('Name', inplace=True)
+		# ranges_df['Values']=ranges_df['Values'].replace(regex=r'\(.*\)',value='')
+		slider_df = create_df_sliders(weight_df, pred_df)
+		daily_pred_df = pred_df[['Fecha', model_objective, f'prediction({model_objective})']]
+		possible_targets = sorted(list(pred_df[model_objective].unique()))
+		# print(f'Targets: {possible_targets}')
+		var_influyentes = list(weight_df['Attribute'])
+		decision_tree_data = create_decision_tree_data(decision_tree_df, model_objective)
+		
+		# Crear nuevos gráficos
+		simul_or_optim_wb = SimulOptimWidget(target=model_objective, simul_df=slider_df, possible_targets=possible_targets, var_influyentes=var_influyentes, periodo=periodo, ranges=ranges_df)
+		daily_pred_plot = create_daily_pred_plot(daily_pred_df, model_objective)
+		decision_tree_plot = create_decision_tree_plot()
+		decision_tree_graph = create_decision_tree_graph_renderer(decision_tree_plot, decision_tree_data)
+		decision_tree_plot = append_labels_to_decision_tree(decision_tree_plot, decision_tree_graph, decision_tree_data)
+		confusion_matrix = create_confusion_matrix(confusion_df)
+		weight_plot = create_attribute_weight_plot(weight_df, model_objective)
+		corrects_plot = create_corrects_plot(confusion_df, model_objective)
+		model_title = create_div_title(f'Modelo - {model_objective}')
+		confusion_title = create_div_title(f'Matriz de confusión - {model_objective}')
+		decision_tree_title = create_div_title(f'Arbol de decisión - {model_objective}')
+		ranges_description = create_ranges_description(possible_targets, model_objective)
+		new_plots = layout([
+			[model_title],
+			[simul_or_optim_wb.rb],
+			[row([simul_or_optim_wb.wb, ranges_description], min_width=1400, sizing_mode='stretch_width')],
+			[daily_pred_plot],
+			[column([confusion_title, confusion_matrix], sizing_mode='stretch_width'), weight_plot, corrects_plot],
+			[decision_tree_title],
+			[decision_tree_plot]
+		], name=model_objective, sizing_mode='stretch_width')
+		return new_plots
+
+	def show_model(model_objective, json_prediction_document):
+		model_error.text = ''
+		try:
+			new_plots = create_model_plots(model_objective, json_prediction_document)
+		except Exception as e:
+			# Respuesta de RapidMiner inesperada
+			print(f'Error en la creación del modelo {model_objective}: {e!r}')
+			show_model_error(model_objective, e)
+			return
+		model_done(model_objective)
+		# Almacenar en RAM y algunos gráficos y en ROM algunos modelos creados
+		model_plots.children.append(new_plots)
+		if model_objective not in created_models:
+			created_models.append(model_objective)
+		save_obj(created_models, 'resources/created_models.pkl')
+		models.update({model_objective: new_plots})
+		models.move_to_end(model_objective, last=False)
+		created_models_checkbox.labels = list(models.keys())
+		created_models_checkbox.active = list(range(len(models.keys())))
 
 	# Callback para eliminar algunos modelos seleccionados
 	def remove_model_handler(new):
@@ -870,14 +937,13 @@ def modify_second_descriptive(doc):
 
 	# Creación del layout inicial de la interfaz
 	model_plots = column([])
-	initialize = True
+	doc.add_next_tick_callback(request_perfil)
+	# Los modelos guardados se recrean en segundo plano: las llamadas interactivas (de esta y otras sesiones) pasan antes
 	for model in created_models:
-		prediction_callback(model=model)
-	initialize = False
+		create_model(model, PRIORITY_BACKGROUND)
 	# Creación del layout estático de la interfaz
 	l = layout([
-		[prediction_plot],
-		[outlier_plot],
+		[perfil_plots],
 		[simulation_title],
 		[model_select_wb, column(created_models_wb, delete_model_button, sizing_mode='stretch_width')],		
 		[model_plots]
@@ -3,9 +3,12 @@ import utils.bokeh_utils as bokeh_utils
 import time
 import random
 from collections import OrderedDict
+from functools import partial
 from pandas.io.json import json_normalize
 
-from utils.rapidminer_proxy import call_webservice
+from utils.rapidminer_proxy import async_rapidminer_client
+from bokeh.document import without_document_lock
+from bokeh.io import curdoc
 from bokeh.models import Div, Panel, Tabs
 from bokeh.models.widgets import Select, Button, Slider, TextInput, RadioButtonGroup
 from bokeh.layouts import widgetbox, column, row
@@ -32,6 +35,18 @@ def create_div_title(title = ''):
 	
 	return div_title
 
+def create_div_error(text=''):
+	"""Crea un mensaje de error para un objeto de la interfaz bokeh (p.ej. si falla una llamada a RapidMiner)
+	Parameters:
+		text: String con el mensaje de error
+
+	Returns:
+		div_error: Objeto Div de bokeh con el mensaje
+	"""
+
+	div_error = Div(text=text, style={'color': '#c0392b', 'font-family': 'inherit'})
+	return div_error
+
 class Spinner:
 	def __init__(self, size=25):
 		self.size = size	
@@ -125,26 +140,48 @@ class DynamicSimulWidget:
 							max_width=700,
 							sizing_mode='stretch_width')
 	def simulate(self, new):
-		"""Callback que simula y obtiene una predicción con los valores fijados por el usuario en los sliders
+		"""Callback que simula y obtiene una predicción con los valores fijados por el usuario en los sliders. La llamada a
+		RapidMiner se hace en una corutina sin el lock del documento (request_simulation), sin bloquear el IO loop del
+		servidor Bokeh, y el resultado se muestra después en un callback con el lock (show_simulation)
 		"""
 		self.div_spinner.show_spinner()
 		vars_influyentes = {var: round(drow.slider.value,2) for (var, drow) in self.new_rows.items()}
-		json_simul = call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Simulacion_JSON_v1?',
-									username='rapidminer',
-									password='rapidminer',
-									parameters={
-										'Modelo': self.target,
-										'Variables_influyentes': str(vars_influyentes),
-										'Ruta_periodo':f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{self.periodo}.csv'
-										},
-									out_json=True)
+		doc = curdoc()
+		doc.add_next_tick_callback(without_document_lock(partial(self.request_simulation, doc, vars_influyentes)))
+	async def request_simulation(self, doc, vars_influyentes):
+		try:
+			json_simul = await async_rapidminer_client.call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Simulacion_JSON_v1?',
+										username='rapidminer',
+										password='rapidminer',
+										parameters={
+											'Modelo': self.target,
+											'Variables_influyentes': str(vars_influyentes),
+											'Ruta_periodo':f'https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{self.periodo}.csv'
+											},
+										out_json=True)
+		except Exception as e:
+			print(f'Error en la simulación de {self.target}: {e!r}')
+			doc.add_next_tick_callback(partial(self.show_simulation_error, e))
+			return
+		doc.add_next_tick_callback(partial(self.show_simulation, vars_influyentes, json_simul))
+	def show_simulation_error(self, error):
+		self.sim_target.text = f'<b>{self.target}:</b> <span style="color: #c0392b">error en la simulación ({type(error).__name__})</span>'
+		self.div_spinner.hide_spinner()
+	def show_simulation(self, vars_influyentes, json_simul):
 		print(f'Modelo: {self.target}')
 		print(f'Ruta_periodo: https://edar.vicomtech.org/archivos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_{self.periodo}.csv')
 		print(vars_influyentes)
-		simul_result = json_normalize(json_simul)
-		print(simul_result[f'prediction({self.target})'][0])
+		try:
+			simul_result = json_normalize(json_simul)
+			prediction = simul_result[f'prediction({self.target})'][0]
+		except Exception as e:
+			# Respuesta de RapidMiner inesperada
+			print(f'Error en la simulación de {self.target}: {e!r}')
+			self.show_simulation_error(e)
+			return
+		print(prediction)
 		# self.sim_target.text = f'<b>{self.target}</b>: cluster_{random.randint(0,4)}'
-		self.sim_target.text = f"<b>{self.target}</b>: {simul_result[f'prediction({self.target})'][0]}"
+		self.sim_target.text = f"<b>{self.target}</b>: {prediction}"
 		self.div_spinner.hide_spinner()
 
 # class DynamicOptimRow:
@@ -1,6 +1,6 @@
-from flask import Flask, render_template, session, redirect, url_for, request, flash, send_from_directory
+from flask import Flask, render_template, session, redirect, url_for, request, flash, send_from_directory, Response, abort
 from utils.server_config import *
-from utils.rapidminer_proxy import call_webservice
+from utils.rapidminer_proxy import rapidminer_client
 import json
 from pandas.io.json import json_normalize
 from collections import OrderedDict
@@ -16,15 +16,16 @@ from bokeh.embed import server_document
 from threading import Thread
 
 # import pam
+import sys
+import atexit
 from subprocess import Popen
 
-# Import Scheduler
-from apscheduler.schedulers.background import BackgroundScheduler
-from parser_edar40.app import parser
-sched = BackgroundScheduler(daemon=True)
-sched.add_job(parser, 'cron', day_of_week='mon-sun', hour=5, minute=00)
-# sched.add_job(parser,'interval',seconds=2000)
-sched.start()
+# The parser worker (parser_edar40/worker.py), which runs the parser every day, is a service apart from the web server
+# (see README); it is only started from here when running Flask alone, in test mode.
+from parser_edar40.common.constants import OUT_DATA_FILE_NAME_PERIOD_1
+from parser_edar40.common.settings import blnExpose_PARSER_METRICS
+from parser_edar40.instrumentation import load_last_run_report, metrics_text
+from parser_edar40.publish import current_dir
 
 app = Flask(__name__)
 periodo = '2'
@@ -181,7 +182,7 @@ def optimizacion():
 		session['restricciones'] = restricciones
 		print(f'Target: {arg_target}')
 		print(f'Restricciones: {restricciones}')
-		json_optim = call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Optimizacion_v1?',
+		json_optim = rapidminer_client.call_webservice(url='http://rapidminer.vicomtech.org/api/rest/process/EDAR_Cartuja_Optimizacion_v1?',
 										username='rapidminer',
 										password='rapidminer',
 										parameters={'Target': str(arg_target), 'Restricciones': str(restricciones)},
@@ -205,11 +206,31 @@ def optimizacion():
 							pred=pred,
 							conf=conf)
 
+# OUTPUT files of the parser are served from the current published version (see parser_edar40/publish.py)
 @app.route('/archivos/<path:filename>')
 def send_js(filename):
-    return send_from_directory('static/Cartuja_Datos/', filename)
+    return send_from_directory(str(current_dir(OUT_DATA_FILE_NAME_PERIOD_1.parent)), filename)
+
+# Metrics of the last parser run (Prometheus text format), only if blnExpose_PARSER_METRICS is set
+@app.route('/metrics/parser')
+def parser_metrics():
+	if not blnExpose_PARSER_METRICS:
+		abort(404)
+	return Response(metrics_text(load_last_run_report()), mimetype='text/plain; version=0.0.4')
+
+# Metrics of the RapidMiner client of this process (Flask and Bokeh apps), only if blnExpose_RAPIDMINER_METRICS is set
+@app.route('/metrics/rapidminer')
+def rapidminer_metrics():
+	if not blnExpose_RAPIDMINER_METRICS:
+		abort(404)
+	return Response(rapidminer_client.metrics_text(), mimetype='text/plain; version=0.0.4')
 
 #Configuración cuando ejecutamos unicamente Flask sin Gunicorn, en modo de prueba
 if __name__ == '__main__':
+	parser_worker = Popen([sys.executable, '-m', 'parser_edar40.worker'])
+	def stop_parser_worker():
+		parser_worker.terminate()
+		parser_worker.wait()
+	atexit.register(stop_parser_worker)
 	app.secret_key = '[]V\xf0\xed\r\x84L,p\xc59n\x98\xbc\x92'
 	app.run(port=9995, debug=False, host='0.0.0.0')
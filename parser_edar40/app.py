@@ -1,6 +1,12 @@
 # Required Libraries
+import functools
+import hashlib
+import json
+import os
 import pandas as pd
+import threading
 import time
+from pathlib import Path
 
 # Constants
 from parser_edar40.common.constants import *
@@ -9,10 +15,42 @@ from parser_edar40.common.constants import *
 from parser_edar40.common.settings import *
 
 # Helpers
-from parser_edar40.helpers import create_vars_mask_df, Create_Partial_DF, create_meteo_df
+from parser_edar40.helpers import (create_vars_mask_df, get_partial_units, Create_Partial_DF,
+                                   create_meteo_df, save_frame_parquet, split_units_row, frame_with_units, write_csv,
+                                   append_csv)
 
-def parser():
-    print('Ejecutando parser')
+# Dates
+from parser_edar40.dates import normalize_dates, join_on_day_keys, left_join_on_day_keys
+
+# Derived variables
+from parser_edar40.derived import add_derived_variables
+
+# Data types
+from parser_edar40.dtypes import get_variables_dtypes, apply_dtypes, check_dtypes
+
+# High frequency YOKO exports
+from parser_edar40.highfreq import list_yoko_hf_files, ingest_yoko_hf, merge_yoko_hf
+
+# Raw landing
+from parser_edar40.landing import read_raw_sheet
+
+# Variables
+from parser_edar40.variables import load_variables_registry, get_variables_mapping
+
+# Parquet dataset
+from parser_edar40.store import write_dataset, append_dataset, read_dataset, read_dataset_units
+
+# Stages
+from parser_edar40.stages import Stage, run_stages, load_hashes_cache, save_hashes_cache, file_hash
+
+# Instrumentation
+from parser_edar40.instrumentation import span, report_warning, start_run, write_run_report
+
+# Incremental parse
+from parser_edar40.incremental import load_state, save_state, create_state, modified_sources
+
+# 0 Create Vars ABSOLUTAS and RENDIMIENTOS csv files
+def create_vars_mask_files():
     # 0 Create Vars ABSOLUTAS csv file
     df_abs = create_vars_mask_df(VARS_COLUMN_NAMES, VARS_NORMA_ABSOLUTAS)
     df_abs.to_csv(OUT_VARS_ABSOLUTAS_FILE_NAME, index=False, sep=';')
@@ -21,260 +59,157 @@ def parser():
     df_rend = create_vars_mask_df(VARS_COLUMN_NAMES, VARS_NORMA_RENDIMIENTOS)
     df_rend.to_csv(OUT_VARS_RENDIMIENTOS_FILE_NAME, index=False, sep=';')
 
-    # 0 We first open the Excel file
+# 0 Read a sheet of the Excel file. Each sheet is only decoded once, the first time it is requested after the Excel
+#   file has changed, and stored in the raw cache (see parser_edar40/landing.py).
+#   If blnStream_XLSX, only the columns of the variables mask (sheets mask_sheets of the variables file) are read.
+def read_data_sheet(sheet_name, mask_sheets):
     # Measure computation time (start time).
     start_t = time.time()
-    xl = pd.ExcelFile(IN_DATA_FILE_NAME)
+    columns = None
+    if blnStream_XLSX:
+        registry = load_variables_registry(VARIABLES_TO_READ_FILE_NAME)
+        columns = list(dict.fromkeys(col for mask_sheet in mask_sheets
+                                     for col in get_variables_mapping(registry, mask_sheet, VARS_ORIGEN_COL_NAME,
+                                                                      VARS_DESTINO_COL_NAME)))
+    with span('read_sheet', sheet=sheet_name) as sp:
+        df_raw, units = read_raw_sheet(IN_DATA_FILE_NAME, sheet_name, IN_DATA_SHEETS_LAYOUT, columns)
+        sp.set_shape(df_raw)
     end_t = time.time()
-    print("\nComputation time for reading COMPLETE Excel file is %g seconds.\n" %
-        (end_t - start_t))
+    print("\nComputation time for reading sheet %s is %g seconds.\n" %
+        (sheet_name, end_t - start_t))
+    return df_raw, units
 
+# 1. Process sheet ID
+def parse_sheet_ID(df_raw, units):
     # 1. We start processing sheet ID.
-    # 1.0 Call the Excel file parsing function, specifiying SHEET NAME and HEADER in order to create main df_ID dataframe.
-    df_ID = xl.parse(sheet_name=IN_DATA_SHEET_NAME_ID, header=3)
-
-    # Next, get dataframe with UNITS information that will be used to insert later
-    if (blnConsider_UNITS == True):
-        df_ID_UNITS = xl.parse(sheet_name=IN_DATA_SHEET_NAME_ID, nrows=2)
-
-    # Save units in df_ID
-    if (blnConsider_UNITS == True):
-        df_ID.iloc[1] = df_ID_UNITS.iloc[1].values
-
-    # Delete rows with no data after HEADER
-    if (blnConsider_UNITS == True):
-        df_ID.drop(df_ID.index[[0]], inplace=True)
-    else:
-        df_ID.drop(df_ID.index[[0, 1]], inplace=True)
-
-    # Reset index, if necessary:
-    # + Depending on pandas' version (pd.__version__), the above main reading of the main .xslx file
-    #   gives a different results:
-    # + Version '0.24.0': Dataframe's Index is an autonumeric and a column of name "Unnamed: 0"
-    #                     (specified in constant FIRST_UNKONW_COLUMN_NAME) is created
-    #                     where the datetime information is stored.
-    # + Version '0.23.4': Dataframe's Index is the column storing the datetime information.
-    # + Also, if first column is called DATE_COLUMN_NAME, reset index but drop previous one.
-
-    if ((df_ID.columns[0] != FIRST_UNKONW_COLUMN_NAME) and (df_ID.columns[0] != DATE_COLUMN_NAME)):
-        df_ID.reset_index(drop=False, inplace=True)
-    else:
-        df_ID.reset_index(drop=True, inplace=True)
+    # 1.0 Main df_ID dataframe: the sheet read from the raw cache (HEADER, UNITS and data rows already split). It is a new
+    #     dataframe, read from Parquet, therefore it is modified in place.
+    # NOTE: UNITS are not stored in df_ID (so that all its columns keep their numeric dtype), but in a dictionary with
+    #       column name as key and its UNITS as value, passed along with the dataframe.
+    df_ID = df_raw
 
     # Rename column 0 (which has date information but a non specific column name) to DATE_COLUMN_NAME.
     df_ID.rename(columns={df_ID.columns[0]: DATE_COLUMN_NAME}, inplace=True)
 
-    # Convert column DATE_COLUMN_NAME of df_influente to pandas timestamp format.
-    df_ID[DATE_COLUMN_NAME] = pd.to_datetime(df_ID[DATE_COLUMN_NAME].astype(
-        str), errors="coerce", infer_datetime_format=True)
-
+    # Convert column DATE_COLUMN_NAME to pandas timestamp format, only date part (see parser_edar40/dates.py).
     # IMPORTANT: make sure the information is consistent, saving all values in only date part format.
-    # Otherwise, when joining different dataframes on index of type pandas datetime, if there are values in different format
+    # Otherwise, when joining different dataframes on date, if there are values in different format
     # (some only date, some date and time, although time is 00:00:00), they will be exclusive.
-    df_ID[DATE_COLUMN_NAME] = df_ID[DATE_COLUMN_NAME].dt.date
+    # Rows without a valid date can not be joined, therefore they are removed.
+    df_ID[DATE_COLUMN_NAME] = normalize_dates(df_ID[DATE_COLUMN_NAME])
+    df_ID.dropna(subset=[DATE_COLUMN_NAME], inplace=True)
 
     # Remove duplicates
     df_ID.drop_duplicates(subset=[DATE_COLUMN_NAME], keep='first', inplace=True)
     df_ID.reset_index(drop=True, inplace=True)
 
     # Create list of column names of sheet ID, if requested
-    colum_names_sheet_ID_list = list(df_ID.columns)
+    # NOTE: all the columns of the sheet are listed, even if only the columns of the variables mask have been read
+    colum_names_sheet_ID_list = [DATE_COLUMN_NAME] + list(units)[1:]
     if (blnCreate_ID_sheet_columns_list == True):
         with open(ID_EDAR_CARTUJA_ID_sheet_column_names_FILE_NAME, 'w') as f:
             for item in colum_names_sheet_ID_list:
                 f.write("%s\n" % item)
 
     # 1.1 Open file specifiying variables to be read from sheet ID_INFLUENTE (HEADER position does not need to be specified bacause it is 0)
-    (df_ID_influente,
-    columns_with_all_NaNs_list_ID_influente,
-    columns_not_found_in_original_list_ID_influente) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                        VARIABLES_FILE_SHEET_ID_INFLUENTE,
-                                                                        VARS_ORIGEN_COL_NAME,
-                                                                        VARS_DESTINO_COL_NAME,
-                                                                        df_ID,
-                                                                        colum_names_sheet_ID_list,
-                                                                        True,
-                                                                        blnConsider_UNITS)
-
-    # Work out variables to be calculated
-    # 1. SO4 entrada influente (KG SO4/dia) = SO4 entrada influente (mg SO4/l) * Caudal influente (m3/dia) / 1000
-    # 2. P-PO4 entrada influente (KG PO4/dia) = P-PO4 entrada influente (mg P-PO4/l) * Caudal influente (m3/dia) / 1000
-    # 3. Ratio DBO5/DQO = DBO5 entrada influente (mg DBO5/l) / DQO entrada influente (mg DQO/l)
-    #
-    # IMPORTANT: like in NumPy, basic arithmetic operations in Pandas (+, -, *, /, etc.) are ELEMENT-WISE.
-    # IMPORTANT: make calculations for rows starting from row=1 because in row=0 UNIT  information is stored.
-
-    if (blnConsider_UNITS == True):
-        start_row = 1
-    else:
-        start_row = 0
-
-    df_ID_influente.loc[start_row:, "influente_SO4"] = df_ID_influente.loc[start_row:,
-                                                                        "influente_SO4_conc"] * df_ID_influente.loc[start_row:, "influente_CAUDAL"] / 1000
-    df_ID_influente.loc[start_row:, "influente_P-PO4"] = df_ID_influente.loc[start_row:,
-                                                                            "influente_P-PO4_conc"] * df_ID_influente.loc[start_row:, "influente_CAUDAL"] / 1000
-    df_ID_influente.loc[start_row:, "influente_ratio_DBO5t_DQOt"] = df_ID_influente.loc[start_row:,
-                                                                                        "influente_DBO5t_conc"] / df_ID_influente.loc[start_row:, "influente_DQOt_conc"]
+    (df_ID_influente, report_ID_influente) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                               VARIABLES_FILE_SHEET_ID_INFLUENTE,
+                                                               VARS_ORIGEN_COL_NAME,
+                                                               VARS_DESTINO_COL_NAME,
+                                                               df_ID,
+                                                               colum_names_sheet_ID_list,
+                                                               True)
 
     # 1.2 Open file specifiying variables to be read from sheet ID_BIOS (HEADER position does not need to be specified bacause it is 0)
-    (df_ID_bios,
-    columns_with_all_NaNs_list_ID_bios,
-    columns_not_found_in_original_list_ID_bios) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                    VARIABLES_FILE_SHEET_ID_BIOS,
-                                                                    VARS_ORIGEN_COL_NAME,
-                                                                    VARS_DESTINO_COL_NAME,
-                                                                    df_ID,
-                                                                    colum_names_sheet_ID_list,
-                                                                    True,
-                                                                    blnConsider_UNITS)
-
-    # Work out variables to be calculated
-    # 4. Ratio DBO5/DQO entrada bios = DBO5 entrada BIOS(mg DBO5/l) / DQO entrada BIOS (mg DQO/l)
-    # 5. DO ZONA 1 media BIOS = PROMEDIO (O2 Bio1 Zona 1, O2 Bio2 Zona 1, O2 Bio3 Zona 1)
-    # 6. DO ZONA 2 media BIOS = PROMEDIO (O2 Bio1 Zona 2, O2 Bio2 Zona 2, O2 Bio3 Zona 2)
-    #
-    # IMPORTANT: like in NumPy, basic arithmetic operations in Pandas (+, -, *, /, etc.) are ELEMENT-WISE.
-    # IMPORTANT: make calculations for rows starting from row=1 because in row=0 UNIT  information is stored.
-
-    if (blnConsider_UNITS == True):
-        start_row = 1
-    else:
-        start_row = 0
-
-    df_ID_bios.loc[start_row:, "bios_IN_ratio_DBO5t_DQOt"] = df_ID_bios.loc[start_row:,
-                                                                            "bios_IN_DBO5t_conc"] / df_ID_bios.loc[start_row:, "bios_IN_DQOt_conc"]
-    df_ID_bios.loc[start_row:, "bios_manipulable_O2_Promedio_Zona_1"] = (df_ID_bios.loc[start_row:, "bios_manipulable_O2_Bio1_Zona_1"] +
-                                                                        df_ID_bios.loc[start_row:, "bios_manipulable_O2_Bio2_Zona_1"] +
-                                                                        df_ID_bios.loc[start_row:, "bios_manipulable_O2_Bio3_Zona_1"]) / 3
-    df_ID_bios.loc[start_row:, "bios_manipulable_O2_Promedio_Zona_2"] = (df_ID_bios.loc[start_row:, "bios_manipulable_O2_Bio1_Zona_2"] +
-                                                                        df_ID_bios.loc[start_row:, "bios_manipulable_O2_Bio2_Zona_2"] +
-                                                                        df_ID_bios.loc[start_row:, "bios_manipulable_O2_Bio3_Zona_2"]) / 3
+    (df_ID_bios, report_ID_bios) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                     VARIABLES_FILE_SHEET_ID_BIOS,
+                                                     VARS_ORIGEN_COL_NAME,
+                                                     VARS_DESTINO_COL_NAME,
+                                                     df_ID,
+                                                     colum_names_sheet_ID_list,
+                                                     True)
 
     # 1.3 Open file specifiying variables to be read from sheet ID_FANGOS (HEADER position does not need to be specified bacause it is 0)
-    (df_ID_fangos,
-    columns_with_all_NaNs_list_ID_fangos,
-    columns_not_found_in_original_list_ID_fangos) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                    VARIABLES_FILE_SHEET_ID_FANGOS,
-                                                                    VARS_ORIGEN_COL_NAME,
-                                                                    VARS_DESTINO_COL_NAME,
-                                                                    df_ID,
-                                                                    colum_names_sheet_ID_list,
-                                                                    True,
-                                                                    blnConsider_UNITS)
+    (df_ID_fangos, report_ID_fangos) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                         VARIABLES_FILE_SHEET_ID_FANGOS,
+                                                         VARS_ORIGEN_COL_NAME,
+                                                         VARS_DESTINO_COL_NAME,
+                                                         df_ID,
+                                                         colum_names_sheet_ID_list,
+                                                         True)
 
     # 1.4 Open file specifiying variables to be read from sheet ID_HORNO (HEADER position does not need to be specified bacause it is 0)
-    (df_ID_horno,
-    columns_with_all_NaNs_list_ID_horno,
-    columns_not_found_in_original_list_ID_horno) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                    VARIABLES_FILE_SHEET_ID_HORNO,
-                                                                    VARS_ORIGEN_COL_NAME,
-                                                                    VARS_DESTINO_COL_NAME,
-                                                                    df_ID,
-                                                                    colum_names_sheet_ID_list,
-                                                                    True,
-                                                                    blnConsider_UNITS)
+    (df_ID_horno, report_ID_horno) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                       VARIABLES_FILE_SHEET_ID_HORNO,
+                                                       VARS_ORIGEN_COL_NAME,
+                                                       VARS_DESTINO_COL_NAME,
+                                                       df_ID,
+                                                       colum_names_sheet_ID_list,
+                                                       True)
 
     # 1.5 Open file specifiying variables to be read from sheet ID_EFLUENTE (HEADER position does not need to be specified bacause it is 0)
-    (df_ID_efluente,
-    columns_with_all_NaNs_list_ID_efluente,
-    columns_not_found_in_original_list_ID_efluente) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                        VARIABLES_FILE_SHEET_ID_EFLUENTE,
-                                                                        VARS_ORIGEN_COL_NAME,
-                                                                        VARS_DESTINO_COL_NAME,
-                                                                        df_ID,
-                                                                        colum_names_sheet_ID_list,
-                                                                        True,
-                                                                        blnConsider_UNITS)
+    (df_ID_efluente, report_ID_efluente) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                             VARIABLES_FILE_SHEET_ID_EFLUENTE,
+                                                             VARS_ORIGEN_COL_NAME,
+                                                             VARS_DESTINO_COL_NAME,
+                                                             df_ID,
+                                                             colum_names_sheet_ID_list,
+                                                             True)
 
     # 1.6 Open file specifiying variables to be read from sheet ID_ELECTRICIDAD (HEADER position does not need to be specified bacause it is 0)
-    (df_ID_electricidad,
-    columns_with_all_NaNs_list_ID_electricidad,
-    columns_not_found_in_original_list_ID_electricidad) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                            VARIABLES_FILE_SHEET_ID_ELECTRICIDAD,
-                                                                            VARS_ORIGEN_COL_NAME,
-                                                                            VARS_DESTINO_COL_NAME,
-                                                                            df_ID,
-                                                                            colum_names_sheet_ID_list,
-                                                                            True,
-                                                                            blnConsider_UNITS)
-
-    # Aggregate all columns with all NaN values in a unique list
-    columns_with_all_NaNs_list_ID = (columns_with_all_NaNs_list_ID_influente
-                                    + columns_with_all_NaNs_list_ID_bios
-                                    + columns_with_all_NaNs_list_ID_fangos
-                                    + columns_with_all_NaNs_list_ID_horno
-                                    + columns_with_all_NaNs_list_ID_efluente
-                                    + columns_with_all_NaNs_list_ID_electricidad)
-
-    # Aggregate all columns not found in the original vars list in a unique list
-    columns_not_found_in_original_list_ID = (columns_not_found_in_original_list_ID_influente
-                                            + columns_not_found_in_original_list_ID_bios
-                                            + columns_not_found_in_original_list_ID_fangos
-                                            + columns_not_found_in_original_list_ID_horno
-                                            + columns_not_found_in_original_list_ID_efluente
-                                            + columns_not_found_in_original_list_ID_electricidad)
-
-    # 1.7 Join all dataframes of interest.
-    # Set as index column DATE_COLUMN_NAME on dataframes to be joined.
-    df_ID_influente.set_index(keys=DATE_COLUMN_NAME,
-                            drop=True, inplace=True, verify_integrity=True)
-    df_ID_bios.set_index(keys=DATE_COLUMN_NAME, drop=True,
-                        inplace=True, verify_integrity=True)
-    df_ID_fangos.set_index(keys=DATE_COLUMN_NAME, drop=True,
-                        inplace=True, verify_integrity=True)
-    df_ID_horno.set_index(keys=DATE_COLUMN_NAME, drop=True,
-                        inplace=True, verify_integrity=True)
-    df_ID_efluente.set_index(keys=DATE_COLUMN_NAME, drop=True,
-                            inplace=True, verify_integrity=True)
-    df_ID_electricidad.set_index(
-        keys=DATE_COLUMN_NAME, drop=True, inplace=True, verify_integrity=True)
-
-    # Now, join the dataframes
-    df_ID_out = df_ID_influente.join(
-        [df_ID_bios, df_ID_fangos, df_ID_horno, df_ID_efluente, df_ID_electricidad], how="inner")
-
+    (df_ID_electricidad, report_ID_electricidad) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                                     VARIABLES_FILE_SHEET_ID_ELECTRICIDAD,
+                                                                     VARS_ORIGEN_COL_NAME,
+                                                                     VARS_DESTINO_COL_NAME,
+                                                                     df_ID,
+                                                                     colum_names_sheet_ID_list,
+                                                                     True)
+
+    # Report the warnings of the quality reports of all partial dataframes
+    reports_ID = [report_ID_influente, report_ID_bios, report_ID_fangos, report_ID_horno, report_ID_efluente,
+                  report_ID_electricidad]
+    for report in reports_ID:
+        for message in report.warnings():
+            report_warning(message)
+
+    # 1.7 Join all dataframes of interest (all of them have DATE_COLUMN_NAME as index).
+    # Now, join the dataframes (see parser_edar40/dates.py)
+    df_ID_out = join_on_day_keys(
+        [df_ID_influente, df_ID_bios, df_ID_fangos, df_ID_horno, df_ID_efluente, df_ID_electricidad])
+
+    # Get UNITS of the variables read from sheet ID
+    units_ID_out = {}
+    for variables_sheet_name in VARIABLES_FILE_SHEETS_ID:
+        units_ID_out.update(get_partial_units(VARIABLES_TO_READ_FILE_NAME, variables_sheet_name,
+                                              VARS_ORIGEN_COL_NAME, VARS_DESTINO_COL_NAME, units))
+
+    return df_ID_out, units_ID_out
+
+# 2. Process sheet YOKO
+def parse_sheet_YOKO(df_raw, units):
     # 2. We now process sheet YOKO
-    # 2.0 Call the Excel file parsing function, specifiying SHEET NAME and HEADER in order to create main df_YOKO dataframe.
-    df_YOKO = xl.parse(sheet_name=IN_DATA_SHEET_NAME_YOKO, header=4)
-
-    # NOTE: we do need to get UNITS information in another dataframe as we do for ID and ANALITIC because in YOKO
-    #       units information os below header row.
-
-    # Delete rows with no data after HEADER
-    df_YOKO.drop(df_YOKO.index[[0]], inplace=True)
-
-    # Reset index, if necessary:
-    # + Depending on pandas' version (pd.__version__), the above main reading of the main .xslx file
-    #   gives a different results:
-    # + Version '0.24.0': Dataframe's Index is an autonumeric and a column of name "Unnamed: 0"
-    #                     (specified in constant FIRST_UNKONW_COLUMN_NAME) is created
-    #                     where the datetime information is stored.
-    # + Version '0.23.4': Dataframe's Index is the column storing the datetime information.
-    # + Also, if first column is called DATE_COLUMN_NAME, reset index but drop previous one.
-
-    if ((df_YOKO.columns[0] != FIRST_UNKONW_COLUMN_NAME) and (df_YOKO.columns[0] != DATE_COLUMN_NAME)):
-        df_YOKO.reset_index(drop=False, inplace=True)
-    else:
-        df_YOKO.reset_index(drop=True, inplace=True)
+    # 2.0 Main df_YOKO dataframe: the sheet read from the raw cache (HEADER, UNITS and data rows already split).
+    # NOTE: in YOKO units information is below header row.
+    df_YOKO = df_raw
 
     # Rename column 0 (which has date information but a non specific colun name) to DATE_COLUMN_NAME.
     df_YOKO.rename(columns={df_YOKO.columns[0]: DATE_COLUMN_NAME}, inplace=True)
 
-    # Convert column DATE_COLUMN_NAME of df_influente to pandas timestamp format.
-    df_YOKO[DATE_COLUMN_NAME] = pd.to_datetime(df_YOKO[DATE_COLUMN_NAME].astype(
-        str), errors="coerce", infer_datetime_format=True)
-
+    # Convert column DATE_COLUMN_NAME to pandas timestamp format, only date part (see parser_edar40/dates.py).
     # IMPORTANT: make sure the information is consistent, saving all values in only date part format.
-    # Otherwise, when joining different dataframes on index of type pandas datetime, if there are values in different format
+    # Otherwise, when joining different dataframes on date, if there are values in different format
     # (some only date, some date and time, although time is 00:00:00), they will be exclusive.
-    df_YOKO[DATE_COLUMN_NAME] = df_YOKO[DATE_COLUMN_NAME].dt.date
+    # Rows without a valid date can not be joined, therefore they are removed.
+    df_YOKO[DATE_COLUMN_NAME] = normalize_dates(df_YOKO[DATE_COLUMN_NAME])
+    df_YOKO.dropna(subset=[DATE_COLUMN_NAME], inplace=True)
 
     # Remove duplicates
     df_YOKO.drop_duplicates(subset=[DATE_COLUMN_NAME], keep='first', inplace=True)
     df_YOKO.reset_index(drop=True, inplace=True)
 
     # Create list of column names of sheet YOKO, if requested
-    colum_names_sheet_YOKO_list = list(df_YOKO.columns)
+    # NOTE: all the columns of the sheet are listed, even if only the columns of the variables mask have been read
+    colum_names_sheet_YOKO_list = [DATE_COLUMN_NAME] + list(units)[1:]
     if (blnCreate_YOKO_sheet_columns_list == True):
         with open(ID_EDAR_CARTUJA_YOKO_sheet_column_names_FILE_NAME, 'w') as f:
             for item in colum_names_sheet_YOKO_list:
@@ -282,86 +217,52 @@ def parser():
 
     # 2.1 Open file specifiying variables to be read from sheet YOKO (HEADER position does not need to be specified bacause it is 0)
 
-    (df_YOKO_partial,
-    columns_with_all_NaNs_list_YOKO_partial,
-    columns_not_found_in_original_list_YOKO_partial) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                        VARIABLES_FILE_SHEET_YOKO,
-                                                                        VARS_ORIGEN_COL_NAME,
-                                                                        VARS_DESTINO_COL_NAME,
-                                                                        df_YOKO,
-                                                                        colum_names_sheet_YOKO_list,
-                                                                        True,
-                                                                        blnConsider_UNITS)
-
-    # Aggregate all columns with all NaN values in a unique list
-    columns_with_all_NaNs_list_YOKO = columns_with_all_NaNs_list_YOKO_partial
-
-    # Aggregate all columns not found in the original vars list in a unique list
-    columns_not_found_in_original_list_YOKO = columns_not_found_in_original_list_YOKO_partial
+    (df_YOKO_partial, report_YOKO) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                       VARIABLES_FILE_SHEET_YOKO,
+                                                       VARS_ORIGEN_COL_NAME,
+                                                       VARS_DESTINO_COL_NAME,
+                                                       df_YOKO,
+                                                       colum_names_sheet_YOKO_list,
+                                                       True)
 
-    # 2.2 Join all dataframes of interest.
+    # Report the warnings of the quality report of the partial dataframe
+    for message in report_YOKO.warnings():
+        report_warning(message)
 
-    # Set as index column DATE_COLUMN_NAME on dataframes to be joined.
-    df_YOKO_partial.set_index(keys=DATE_COLUMN_NAME,
-                            drop=True, inplace=True, verify_integrity=True)
-
-    # Now, join the dataframes
+    # 2.2 Join all dataframes of interest (only one; DATE_COLUMN_NAME is already the index of the partial dataframe).
     df_YOKO_out = df_YOKO_partial
 
-    # 3. We now process sheet ANALITICA
-    # 3.0 Call the Excel file parsing function, specifiying SHEET NAME and HEADER in order to create main df_ANALITICA dataframe.
-
-    df_ANALITICA = xl.parse(sheet_name=IN_DATA_SHEET_NAME_ANALITICA, header=4)
+    # Get UNITS of the variables read from sheet YOKO
+    units_YOKO_out = get_partial_units(VARIABLES_TO_READ_FILE_NAME, VARIABLES_FILE_SHEET_YOKO,
+                                       VARS_ORIGEN_COL_NAME, VARS_DESTINO_COL_NAME, units)
 
-    # Next, get dataframe with UNITS information that will be used to insert later
-    if (blnConsider_UNITS == True):
-        df_ANALITICA_UNITS = xl.parse(
-            sheet_name=IN_DATA_SHEET_NAME_ANALITICA, nrows=3)
+    return df_YOKO_out, units_YOKO_out
 
-    # Save units in df_ID
-    if (blnConsider_UNITS == True):
-        df_ANALITICA.iloc[1] = df_ANALITICA_UNITS.iloc[2].values
-
-    # Delete rows with no data after HEADER
-    if (blnConsider_UNITS == True):
-        df_ANALITICA.drop(df_ANALITICA.index[[0]], inplace=True)
-    else:
-        df_ANALITICA.drop(df_ANALITICA.index[[0, 1]], inplace=True)
-
-    # Reset index, if necessary:
-    # + Depending on pandas' version (pd.__version__), the above main reading of the main .xslx file
-    #   gives a different results:
-    # + Version '0.24.0': Dataframe's Index is an autonumeric and a column of name "Unnamed: 0"
-    #                     (specified in constant FIRST_UNKONW_COLUMN_NAME) is created
-    #                     where the datetime information is stored.
-    # + Version '0.23.4': Dataframe's Index is the column stroing the datetime information.
-    # + Also, if first column is called DATE_COLUMN_NAME, reset index but drop previous one.
-
-    if ((df_ANALITICA.columns[0] != FIRST_UNKONW_COLUMN_NAME) and (df_ANALITICA.columns[0] != DATE_COLUMN_NAME)):
-        df_ANALITICA.reset_index(drop=False, inplace=True)
-    else:
-        df_ANALITICA.reset_index(drop=True, inplace=True)
+# 3. Process sheet ANALITICA
+def parse_sheet_ANALITICA(df_raw, units):
+    # 3. We now process sheet ANALITICA
+    # 3.0 Main df_ANALITICA dataframe: the sheet read from the raw cache (HEADER, UNITS and data rows already split).
+    df_ANALITICA = df_raw
 
     # Rename column 0 (which has date information but a non specific colun name) to DATE_COLUMN_NAME.
     df_ANALITICA.rename(
         columns={df_ANALITICA.columns[0]: DATE_COLUMN_NAME}, inplace=True)
 
-    # Convert column DATE_COLUMN_NAME of df_influente to pandas timestamp format.
-    df_ANALITICA[DATE_COLUMN_NAME] = pd.to_datetime(
-        df_ANALITICA[DATE_COLUMN_NAME].astype(str), errors="coerce", infer_datetime_format=True)
-
+    # Convert column DATE_COLUMN_NAME to pandas timestamp format, only date part (see parser_edar40/dates.py).
     # IMPORTANT: make sure the information is consistent, saving all values in only date part format.
-    # Otherwise, when joining different dataframes on index of type pandas datetime, if there are values in different format
+    # Otherwise, when joining different dataframes on date, if there are values in different format
     # (some only date, some date and time, although time is 00:00:00), they will be exclusive.
-    df_ANALITICA[DATE_COLUMN_NAME] = df_ANALITICA[DATE_COLUMN_NAME].dt.date
+    # Rows without a valid date can not be joined, therefore they are removed.
+    df_ANALITICA[DATE_COLUMN_NAME] = normalize_dates(df_ANALITICA[DATE_COLUMN_NAME])
+    df_ANALITICA.dropna(subset=[DATE_COLUMN_NAME], inplace=True)
 
     # Remove duplicates
-    df_ANALITICA.drop_duplicates(
-        subset=[DATE_COLUMN_NAME], keep='first', inplace=True)
+    df_ANALITICA.drop_duplicates(subset=[DATE_COLUMN_NAME], keep='first', inplace=True)
     df_ANALITICA.reset_index(drop=True, inplace=True)
 
     # Create list of column names of sheet ANALITICA, if requested
-    colum_names_sheet_ANALITICA_list = list(df_ANALITICA.columns)
+    # NOTE: all the columns of the sheet are listed, even if only the columns of the variables mask have been read
+    colum_names_sheet_ANALITICA_list = [DATE_COLUMN_NAME] + list(units)[1:]
     if (blnCreate_ANALITICA_sheet_columns_list == True):
         with open(ID_EDAR_CARTUJA_ANALITICA_sheet_column_names_FILE_NAME, 'w') as f:
             for item in colum_names_sheet_ANALITICA_list:
@@ -369,122 +270,383 @@ def parser():
 
     # 3.1 Open file specifiying variables to be read from sheet ANALITICA (HEADER position does not need to be specified bacause it is 0)
 
-    (df_ANALITICA_partial,
-    columns_with_all_NaNs_list_ANALITICA_partial,
-    columns_not_found_in_original_list_ANALITICA_partial) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
-                                                                            VARIABLES_FILE_SHEET_ANALITICA,
-                                                                            VARS_ORIGEN_COL_NAME,
-                                                                            VARS_DESTINO_COL_NAME,
-                                                                            df_ANALITICA,
-                                                                            colum_names_sheet_ANALITICA_list,
-                                                                            True,
-                                                                            blnConsider_UNITS)
+    (df_ANALITICA_partial, report_ANALITICA) = Create_Partial_DF(VARIABLES_TO_READ_FILE_NAME,
+                                                                 VARIABLES_FILE_SHEET_ANALITICA,
+                                                                 VARS_ORIGEN_COL_NAME,
+                                                                 VARS_DESTINO_COL_NAME,
+                                                                 df_ANALITICA,
+                                                                 colum_names_sheet_ANALITICA_list,
+                                                                 True)
+
+    # Report the warnings of the quality report of the partial dataframe
+    for message in report_ANALITICA.warnings():
+        report_warning(message)
 
-    # Aggregate all columns with all NaN values in a unique list
-    columns_with_all_NaNs_list_ANALITICA = columns_with_all_NaNs_list_ANALITICA_partial
+    # 3.2 Join all dataframes of interest (only one; DATE_COLUMN_NAME is already the index of the partial dataframe).
+    df_ANALITICA_out = df_ANALITICA_partial
 
-    # Aggregate all columns not found in the original vars list in a unique list
-    columns_not_found_in_original_list_ANALITICA = columns_not_found_in_original_list_ANALITICA_partial
+    # Get UNITS of the variables read from sheet ANALITICA
+    units_ANALITICA_out = get_partial_units(VARIABLES_TO_READ_FILE_NAME, VARIABLES_FILE_SHEET_ANALITICA,
+                                            VARS_ORIGEN_COL_NAME, VARS_DESTINO_COL_NAME, units)
 
-    # 3.2 Join all dataframes of interest.
+    return df_ANALITICA_out, units_ANALITICA_out
 
-    # Set as index column DATE_COLUMN_NAME on dataframes to be joined.
-    df_ANALITICA_partial.set_index(
-        keys=DATE_COLUMN_NAME, drop=True, inplace=True, verify_integrity=True)
+# Define functions to read and parse every sheet of the INPUT data Excel file (module level functions, so that they can
+# be executed in a worker process)
+def ingest_sheet_ID():
+    return parse_sheet_ID(*read_data_sheet(IN_DATA_SHEET_NAME_ID, VARIABLES_FILE_SHEETS_ID))
 
-    # Now, join the dataframes
-    df_ANALITICA_out = df_ANALITICA_partial
+def ingest_sheet_YOKO():
+    return parse_sheet_YOKO(*read_data_sheet(IN_DATA_SHEET_NAME_YOKO, [VARIABLES_FILE_SHEET_YOKO]))
+
+def ingest_sheet_ANALITICA():
+    return parse_sheet_ANALITICA(*read_data_sheet(IN_DATA_SHEET_NAME_ANALITICA, [VARIABLES_FILE_SHEET_ANALITICA]))
+
+# Define function to read the high frequency YOKO exports (see parser_edar40/highfreq.py). The signals are those of
+# sheet YOKO of the variables file; their UNITS are taken from sheet YOKO when merged (see join_sheets).
+def ingest_yoko_hf_exports():
+    registry = load_variables_registry(VARIABLES_TO_READ_FILE_NAME)
+    mapping = get_variables_mapping(registry, VARIABLES_FILE_SHEET_YOKO, VARS_ORIGEN_COL_NAME, VARS_DESTINO_COL_NAME)
+    mapping = {origen: destino for origen, destino in mapping.items() if origen != DATE_COLUMN_NAME}
+    return ingest_yoko_hf(list_yoko_hf_files(), mapping, intYOKO_HF_CHUNK_ROWS), {}
+
+# Create Meteo PERIOD 2 files
+# NOTE: df_METEO is passed in memory to create_output_period. A copy is persisted in Parquet format; the Excel copy
+#       is optional and written in background (see export_meteo_xlsx).
+def create_meteo(year_months):
+    with span('meteo_files', months=str(sum(len(months) for months in year_months.values()))) as sp:
+        df_METEO, units_METEO = create_meteo_df(UNITS, list(year_months), year_months,
+                                                COLUMN_NAMES, IN_METEO_DATA_FILE_DIR, DATA_FILE_NAMES)
+        sp.set_shape(df_METEO)
+
+    with span('save_meteo'):
+        save_frame_parquet(df_METEO, units_METEO, OUT_METEO_DATA_FILE_NAME_PERIOD_2)
 
-    # 4 Finally, join all three partial dataframes df_ID_out, df_YOKO_out and df_ANALITICA_out, before creating the OUTPUT DATA CSV file.
-    df_OUT = df_ID_out.join([df_YOKO_out, df_ANALITICA_out], how="inner")
-
-    # Save results to OUTPUT DATA CSV file. Respect 'standard' format: ',' for separation, '.' for decimals.
-    # Before that, decide whether or not filter on column Fecha.
-    # If so, convert Date information from index to a normal column first.
-    # NOTE: data must be filtered for the several periods, in this case PERIOD_1 and PERIOD_2.
-    #       Therefore, several CSV files (in this case 2, por PERIOD_1 and PERIOD_2) will be generated.
-
-    # PERIOD_1
-    df_OUT_date_filtered_PERIOD_1 = df_OUT.copy()
-    df_OUT_date_filtered_PERIOD_1.reset_index(drop=False, inplace=True)
-
-    # Convert column DATE_COLUMN_NAME of df_OUT_date_filtered_PERIOD_1 to pandas timestamp format.
-    df_OUT_date_filtered_PERIOD_1[DATE_COLUMN_NAME] = pd.to_datetime(
-        df_OUT_date_filtered_PERIOD_1[DATE_COLUMN_NAME].astype(str), errors="coerce", format="%Y-%m-%d")
-
-    # PERIOD_2
-    df_OUT_date_filtered_PERIOD_2 = df_OUT.copy()
-    df_OUT_date_filtered_PERIOD_2.reset_index(drop=False, inplace=True)
-
-    # Convert column DATE_COLUMN_NAME of df_OUT_date_filtered_PERIOD_2 to pandas timestamp format.
-    df_OUT_date_filtered_PERIOD_2[DATE_COLUMN_NAME] = pd.to_datetime(
-        df_OUT_date_filtered_PERIOD_2[DATE_COLUMN_NAME].astype(str), errors="coerce", format="%Y-%m-%d")
-
-    # Then, convert str_start_date_filter_PERIOD_1/2 and str_end_date_filter_PERIOD_1/2 to pandas timestamp format and filter.
-    # PERIOD_1
-    pd_start_date_filter_PERIOD_1 = pd.to_datetime(
-        str_start_date_filter_PERIOD_1, errors="coerce", format="%Y-%m-%d")
-    df_OUT_date_filtered_PERIOD_1 = df_OUT_date_filtered_PERIOD_1.loc[(
-        df_OUT_date_filtered_PERIOD_1[DATE_COLUMN_NAME] > pd_start_date_filter_PERIOD_1)]
-
-    if (blnFilter_on_start_date == True):
-        # PERIOD_2
-        pd_start_date_filter_PERIOD_2 = pd.to_datetime(
-            str_start_date_filter_PERIOD_2, errors="coerce", format="%Y-%m-%d")
-        df_OUT_date_filtered_PERIOD_2 = df_OUT_date_filtered_PERIOD_2.loc[(
-            df_OUT_date_filtered_PERIOD_2[DATE_COLUMN_NAME] > pd_start_date_filter_PERIOD_2)]
-
-    # PERIOD_1
-    pd_end_date_filter_PERIOD_1 = pd.to_datetime(
-        str_end_date_filter_PERIOD_1, errors="coerce", format="%Y-%m-%d")
-    df_OUT_date_filtered_PERIOD_1 = df_OUT_date_filtered_PERIOD_1.loc[(
-        df_OUT_date_filtered_PERIOD_1[DATE_COLUMN_NAME] <= pd_end_date_filter_PERIOD_1)]
-
-    if (blnFilter_on_end_date == True):
-        # PERIOD_2
-        pd_end_date_filter_PERIOD_2 = pd.to_datetime(
-            str_end_date_filter_PERIOD_2, errors="coerce", format="%Y-%m-%d")
-        df_OUT_date_filtered_PERIOD_2 = df_OUT_date_filtered_PERIOD_2.loc[(
-            df_OUT_date_filtered_PERIOD_2[DATE_COLUMN_NAME] <= pd_end_date_filter_PERIOD_2)]
-
-    # Previous filtering deletes UNITS row. Therefore, it must be recovered.
-    if (blnConsider_UNITS == True):
-        df_OUT_date_filtered_PERIOD_1 = pd.concat(
-            [df_OUT[0:1], df_OUT_date_filtered_PERIOD_1])
-        df_OUT_date_filtered_PERIOD_2 = pd.concat(
-            [df_OUT[0:1], df_OUT_date_filtered_PERIOD_2])
-
-
-    # Now save the data to the output data file. Before that, reset the index again.
-    # PERIOD_1
-    df_OUT_date_filtered_PERIOD_1.set_index(
-        keys=DATE_COLUMN_NAME, drop=True, inplace=True, verify_integrity=True)
-    # Add new meteo columns for each period
-    df_IN_METEO_PER1 = pd.read_excel(IN_METEO_FILE_NAME_PERIOD_1)
-    df_IN_METEO_PER1.set_index(DATE_COLUMN_NAME, inplace=True)
-    # df_OUT_date_filtered_PERIOD_1=df_OUT_date_filtered_PERIOD_1.join(df_IN_METEO_PER1)
-    df_OUT_date_filtered_PERIOD_1 = pd.merge(
-        df_OUT_date_filtered_PERIOD_1, df_IN_METEO_PER1, on='Fecha', how='left')
-    # df_OUT_date_filtered_PERIOD_1.drop_duplicates(keep=False,inplace=True)
-    df_OUT_date_filtered_PERIOD_1.to_csv(
-        OUT_DATA_FILE_NAME_PERIOD_1, sep=',', encoding='latin-1', decimal='.')
-
-    # Create Meteo PERIOD 2 files
-    df_METEO = create_meteo_df(UNITS, YEAR_FOLDERS, YEAR_MONTHS,
-                            COLUMN_NAMES, IN_METEO_DATA_FILE_DIR, DATA_FILE_NAMES)
-
-    df_METEO.to_excel(OUT_METEO_DATA_FILE_NAME_PERIOD_2,
-                    sheet_name=METEO_SHEET_NAME_PERIOD_2)
-
-    # PERIOD_2
-    df_OUT_date_filtered_PERIOD_2.set_index(
-        keys=DATE_COLUMN_NAME, drop=True, inplace=True, verify_integrity=True)
-    # Add new meteo columns for each period
-    df_IN_METEO_PER2 = pd.read_excel(IN_METEO_FILE_NAME_PERIOD_2)
-    df_IN_METEO_PER2.set_index(DATE_COLUMN_NAME, inplace=True)
-    # df_OUT_date_filtered_PERIOD_2=df_OUT_date_filtered_PERIOD_2.join(df_IN_METEO_PER2)
-    df_OUT_date_filtered_PERIOD_2 = pd.merge(
-        df_OUT_date_filtered_PERIOD_2, df_IN_METEO_PER2, on='Fecha', how='left')
-    # df_OUT_date_filtered_PERIOD_2.drop_duplicates(keep=False,inplace=True)
-    df_OUT_date_filtered_PERIOD_2.to_csv(
-        OUT_DATA_FILE_NAME_PERIOD_2, sep=',', encoding='latin-1', decimal='.')
+    return df_METEO, units_METEO
+
+# Define function to write the Excel copy of the meteo data of PERIOD 2, with its UNITS row.
+# It is written to a temporary file first, so that the Excel file is never found half written.
+def export_meteo_xlsx(df_METEO, units_METEO):
+    start_t = time.time()
+    tmp_file_name = OUT_METEO_XLSX_FILE_NAME_PERIOD_2.with_name('~' + OUT_METEO_XLSX_FILE_NAME_PERIOD_2.name)
+    frame_with_units(df_METEO, units_METEO).to_excel(tmp_file_name, sheet_name=METEO_SHEET_NAME_PERIOD_2)
+    tmp_file_name.replace(OUT_METEO_XLSX_FILE_NAME_PERIOD_2)
+    end_t = time.time()
+    print("\nComputation time for exporting %s is %g seconds.\n" %
+        (OUT_METEO_XLSX_FILE_NAME_PERIOD_2, end_t - start_t))
+
+# Define function to declare the data types of the variables (see parser_edar40/dtypes.py)
+def variables_dtypes():
+    return get_variables_dtypes(VARIABLES_TO_READ_FILE_NAME, VARIABLES_FILE_SHEETS, blnMemory_BUDGET,
+                                intDefault_VARIABLE_PRECISION)
+
+# 4 Finally, join all three partial dataframes df_ID_out, df_YOKO_out and df_ANALITICA_out, before creating the OUTPUT DATA CSV file.
+#   If there are high frequency YOKO exports (yoko_hf), their daily statistics are merged into df_YOKO_out first.
+def join_sheets(sheet_ID, sheet_YOKO, sheet_ANALITICA, yoko_hf=None):
+    (df_ID_out, units_ID_out), (df_YOKO_out, units_YOKO_out), (df_ANALITICA_out, units_ANALITICA_out) = sheet_ID, sheet_YOKO, sheet_ANALITICA
+    if yoko_hf is not None:
+        df_YOKO_out, units_YOKO_out = merge_yoko_hf(df_YOKO_out, units_YOKO_out, yoko_hf[0])
+    with span('join_sheets') as sp:
+        df_OUT = join_on_day_keys([df_ID_out, df_YOKO_out, df_ANALITICA_out])
+        units_OUT = {**units_ID_out, **units_YOKO_out, **units_ANALITICA_out}
+        sp.set_shape(df_OUT)
+
+    # 5 Work out variables to be calculated (column CALCULADAS of the variables file), all of them at once (see evaluate_derived_plan).
+    df_OUT = add_derived_variables(df_OUT, VARIABLES_TO_READ_FILE_NAME, VARIABLES_FILE_SHEETS)
+
+    # 6 Convert the variables to their declared data types (float32 and categoricals in the memory budget mode)
+    df_OUT = apply_dtypes(df_OUT, variables_dtypes())
+
+    # NOTE: df_OUT is sorted by date (see join_on_day_keys), so that the rows of every period can be sliced
+    # (see create_output_period).
+    return df_OUT, units_OUT
+
+# Write the OUTPUT DATA Parquet dataset (see parser_edar40/store.py)
+def create_dataset(joined):
+    df_OUT, units_OUT = joined
+    with span('write_dataset') as sp:
+        check_dtypes(df_OUT, variables_dtypes())
+        write_dataset(df_OUT, units_OUT)
+        sp.set_shape(df_OUT)
+
+# Save results to OUTPUT DATA CSV files. Respect 'standard' format: ',' for separation, '.' for decimals.
+# NOTE: data must be filtered for the several periods defined in PERIODS (settings), e.g. PERIOD_1 and PERIOD_2.
+#       Therefore, several CSV files (one for each period) will be generated.
+# df_OUT is sorted by date (see join_sheets), so every period is a slice of it, found with searchsorted (no copies
+# of the complete dataframe nor parsing of its dates).
+def period_file_name(period):
+    return Path(OUT_DATA_FILE_NAME_PERIOD.format(period['name']))
+
+# Define function to work out the positions (first, last + 1) of the rows of a period in a sorted DatetimeIndex
+def period_slice(period, dates):
+    if period.get('last_days') is not None:
+        end = dates[-1] if len(dates) else None
+        start = end - pd.Timedelta(days=period['last_days']) if end is not None else None
+    elif period.get('year') is not None:
+        start = pd.Timestamp(year=int(period['year']) - 1, month=12, day=31)
+        end = pd.Timestamp(year=int(period['year']), month=12, day=31)
+    else:
+        start = pd.to_datetime(period.get('start'), errors="coerce", format="%Y-%m-%d")
+        end = pd.to_datetime(period.get('end'), errors="coerce", format="%Y-%m-%d")
+
+    # Conditions > start and <= end
+    first = dates.searchsorted(start, side='right') if pd.notnull(start) else 0
+    last = dates.searchsorted(end, side='right') if pd.notnull(end) else len(dates)
+    return first, max(first, last)
+
+# Define function to add the meteo columns of a period (meteo data of PERIOD 2 is passed in memory by the meteo stage).
+# Returns the dataframe, its UNITS and the meteo columns added.
+def add_period_meteo(period, df_OUT_period, units_OUT, meteo=None):
+    if period.get('meteo') == 'PERIOD_1':
+        df_METEO = pd.read_excel(IN_METEO_FILE_NAME_PERIOD_1)
+        df_METEO.set_index(DATE_COLUMN_NAME, inplace=True)
+        meteo = split_units_row(df_METEO)
+    if meteo is not None:
+        df_METEO, units_METEO = meteo
+        df_OUT_period = apply_dtypes(left_join_on_day_keys(df_OUT_period, df_METEO), variables_dtypes())
+        units_OUT = {**units_OUT, **units_METEO}
+        return df_OUT_period, units_OUT, list(df_METEO.columns)
+    return df_OUT_period, units_OUT, []
+
+def create_output_period(period, joined, meteo=None):
+    df_OUT, units_OUT = joined
+    with span('period_slice', period=period['name']) as sp:
+        first, last = period_slice(period, df_OUT.index)
+        sp.rows, sp.columns = last - first, df_OUT.shape[1]
+    with span('period_meteo', period=period['name']) as sp:
+        df_OUT_period, units_OUT, meteo_columns = add_period_meteo(period, df_OUT.iloc[first:last], units_OUT, meteo)
+        sp.set_shape(df_OUT_period)
+
+    # Write UNITS row, if requested, after the HEADER. Meteo values were read from Excel: whole numbers are written
+    # without decimals.
+    with span('write_csv', period=period['name']) as sp:
+        check_dtypes(df_OUT_period, variables_dtypes())
+        write_csv(df_OUT_period, units_OUT, period_file_name(period), blnConsider_UNITS, meteo_columns)
+        sp.set_shape(df_OUT_period)
+
+# Define function to append the new rows of a period to its OUTPUT DATA CSV file (see parse_incremental).
+# Periods of the last N days move with every new day, therefore they are written again from the dataset.
+def append_output_period(period, joined_new, meteo=None):
+    df_NEW, units_OUT = joined_new
+    if period.get('last_days') is not None:
+        df_OUT = read_dataset(start=df_NEW.index[-1] - pd.Timedelta(days=period['last_days']))
+        create_output_period(period, (df_OUT, read_dataset_units()), meteo)
+        return
+
+    first, last = period_slice(period, df_NEW.index)
+    if last > first:
+        df_NEW_period, units_OUT, meteo_columns = add_period_meteo(period, df_NEW.iloc[first:last], units_OUT, meteo)
+        check_dtypes(df_NEW_period, variables_dtypes())
+        append_csv(df_NEW_period, period_file_name(period), meteo_columns)
+
+# Define function to list the months of meteo data of every year folder of IN_METEO_DATA_FILE_DIR: the first months of
+# the year, as many as month folders (except for the years in METEO_FIRST_YEAR_MONTHS). The folders are listed at every
+# run, not when the constants are imported, so that the parser worker sees the folders added while it runs.
+def list_year_months(meteo_dir=IN_METEO_DATA_FILE_DIR):
+    year_months = {}
+    for year in sorted(f.name for f in os.scandir(meteo_dir) if f.is_dir()):
+        month_folders = [f for f in os.scandir(Path(meteo_dir) / year) if f.is_dir()]
+        year_months[year] = METEO_FIRST_YEAR_MONTHS.get(year, MONTH_FOLDER_NAMES[:len(month_folders)])
+    return year_months
+
+# Define function to list all the meteo CSV files read by create_meteo_df
+def list_meteo_files(year_months):
+    return [IN_METEO_DATA_FILE_DIR / year / month / DATA_FILE_NAMES[col]
+            for year, months in year_months.items()
+            for month in months
+            for col in COLUMN_NAMES]
+
+# Define the parser stages.
+# Each stage is keyed by the hashes of its input files and its configuration constants, so that only the stages whose
+# inputs have changed since the last run are executed again (e.g. if only one month of meteo has changed, only the
+# meteo and the PERIOD_2 output stages are executed).
+def create_stages(hashes_cache=None):
+    stage_vars_mask = Stage('vars_mask', create_vars_mask_files,
+                            config={'columns': VARS_COLUMN_NAMES,
+                                    'absolutas': VARS_NORMA_ABSOLUTAS,
+                                    'rendimientos': VARS_NORMA_RENDIMIENTOS},
+                            outputs=[OUT_VARS_ABSOLUTAS_FILE_NAME, OUT_VARS_RENDIMIENTOS_FILE_NAME],
+                            hashes_cache=hashes_cache)
+
+    stage_ID = Stage('sheet_ID', ingest_sheet_ID,
+                     files=[IN_DATA_FILE_NAME, VARIABLES_TO_READ_FILE_NAME],
+                     config={'sheet': IN_DATA_SHEET_NAME_ID, 'layout': IN_DATA_SHEETS_LAYOUT[IN_DATA_SHEET_NAME_ID],
+                             'mask_sheets': VARIABLES_FILE_SHEETS_ID, 'stream': blnStream_XLSX},
+                     outputs=[ID_EDAR_CARTUJA_ID_sheet_column_names_FILE_NAME] if blnCreate_ID_sheet_columns_list else [],
+                     hashes_cache=hashes_cache, parallel=True)
+
+    stage_YOKO = Stage('sheet_YOKO', ingest_sheet_YOKO,
+                       files=[IN_DATA_FILE_NAME, VARIABLES_TO_READ_FILE_NAME],
+                       config={'sheet': IN_DATA_SHEET_NAME_YOKO, 'layout': IN_DATA_SHEETS_LAYOUT[IN_DATA_SHEET_NAME_YOKO],
+                               'mask_sheets': [VARIABLES_FILE_SHEET_YOKO], 'stream': blnStream_XLSX},
+                       outputs=[ID_EDAR_CARTUJA_YOKO_sheet_column_names_FILE_NAME] if blnCreate_YOKO_sheet_columns_list else [],
+                       hashes_cache=hashes_cache, parallel=True)
+
+    stage_ANALITICA = Stage('sheet_ANALITICA', ingest_sheet_ANALITICA,
+                            files=[IN_DATA_FILE_NAME, VARIABLES_TO_READ_FILE_NAME],
+                            config={'sheet': IN_DATA_SHEET_NAME_ANALITICA, 'layout': IN_DATA_SHEETS_LAYOUT[IN_DATA_SHEET_NAME_ANALITICA],
+                                    'mask_sheets': [VARIABLES_FILE_SHEET_ANALITICA], 'stream': blnStream_XLSX},
+                            outputs=[ID_EDAR_CARTUJA_ANALITICA_sheet_column_names_FILE_NAME] if blnCreate_ANALITICA_sheet_columns_list else [],
+                            hashes_cache=hashes_cache, parallel=True)
+
+    year_months = list_year_months()
+    stage_meteo = Stage('meteo', functools.partial(create_meteo, year_months),
+                        files=list_meteo_files(year_months),
+                        config={'units': UNITS, 'year_months': year_months,
+                                'columns': COLUMN_NAMES, 'files': DATA_FILE_NAMES},
+                        outputs=[OUT_METEO_DATA_FILE_NAME_PERIOD_2],
+                        hashes_cache=hashes_cache, parallel=True)
+
+    # High frequency YOKO exports, only if there are any
+    stages_yoko_hf = []
+    yoko_hf_files = list_yoko_hf_files() if blnIngest_YOKO_HF else []
+    if yoko_hf_files:
+        stages_yoko_hf.append(Stage('yoko_hf', ingest_yoko_hf_exports,
+                                    files=yoko_hf_files + [VARIABLES_TO_READ_FILE_NAME],
+                                    config={'separator': YOKO_HF_SEPARATOR, 'decimal': YOKO_HF_DECIMAL,
+                                            'timestamp': [YOKO_HF_TIMESTAMP_COLUMN_NAME, YOKO_HF_TIMESTAMP_FORMAT],
+                                            'statistics': YOKO_HF_STATISTICS, 'compression': DATASET_COMPRESSION},
+                                    outputs=[OUT_YOKO_HF_DATASET_DIR],
+                                    hashes_cache=hashes_cache, parallel=True))
+
+    stage_join = Stage('join', join_sheets,
+                       files=[VARIABLES_TO_READ_FILE_NAME],
+                       config={'mask_sheets': VARIABLES_FILE_SHEETS, 'formulas': DERIVED_VARIABLES_FORMULAS,
+                               'memory_budget': blnMemory_BUDGET, 'precision': intDefault_VARIABLE_PRECISION},
+                       depends=[stage_ID, stage_YOKO, stage_ANALITICA] + stages_yoko_hf,
+                       hashes_cache=hashes_cache)
+
+    stages_dataset = []
+    if blnWrite_DATASET:
+        stages_dataset.append(Stage('dataset', create_dataset,
+                                    config={'compression': DATASET_COMPRESSION},
+                                    depends=[stage_join],
+                                    outputs=[OUT_DATASET_DIR],
+                                    hashes_cache=hashes_cache))
+
+    stages_PERIODS = []
+    for period in PERIODS:
+        meteo_PERIOD_1 = period.get('meteo') == 'PERIOD_1'
+        meteo_PERIOD_2 = period.get('meteo') == 'PERIOD_2'
+        stages_PERIODS.append(Stage(f'output_{period["name"]}', functools.partial(create_output_period, period),
+                                    files=[IN_METEO_FILE_NAME_PERIOD_1] if meteo_PERIOD_1 else [],
+                                    config={'period': period, 'units': blnConsider_UNITS,
+                                            'memory_budget': blnMemory_BUDGET, 'precision': intDefault_VARIABLE_PRECISION},
+                                    depends=[stage_join, stage_meteo] if meteo_PERIOD_2 else [stage_join],
+                                    outputs=[period_file_name(period)],
+                                    hashes_cache=hashes_cache))
+
+    return ([stage_vars_mask, stage_ID, stage_YOKO, stage_ANALITICA, stage_meteo] + stages_yoko_hf + [stage_join]
+            + stages_dataset + stages_PERIODS)
+
+# Define function to work out the key of the configuration of the incremental parse. If any of the files or constants
+# defining how the data is processed changes, the data already processed is not valid anymore.
+def incremental_key(hashes_cache=None):
+    key_info = {'variables': file_hash(VARIABLES_TO_READ_FILE_NAME, hashes_cache),
+                'meteo_PERIOD_1': file_hash(IN_METEO_FILE_NAME_PERIOD_1, hashes_cache),
+                'layout': IN_DATA_SHEETS_LAYOUT, 'formulas': DERIVED_VARIABLES_FORMULAS,
+                'meteo': {'units': UNITS, 'columns': COLUMN_NAMES},
+                'periods': PERIODS, 'units': blnConsider_UNITS, 'dataset': blnWrite_DATASET,
+                'memory_budget': blnMemory_BUDGET, 'precision': intDefault_VARIABLE_PRECISION}
+    return hashlib.sha256(json.dumps(key_info, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+# Sources of the joined data: sheets of the INPUT data Excel file, meteo data and high frequency YOKO exports (only if
+# there are any; see create_stages)
+INCREMENTAL_SOURCES = ['sheet_ID', 'sheet_YOKO', 'sheet_ANALITICA', 'meteo', 'yoko_hf']
+
+# Define function to save the state of the incremental parse after a complete parse
+def save_incremental_state(stages, hashes_cache=None):
+    stages = {stage.name: stage for stage in stages}
+    df_OUT, units_OUT = stages['join'].result()
+    if len(df_OUT) == 0:
+        return
+    save_state(create_state(incremental_key(hashes_cache), df_OUT.index[-1], df_OUT.columns,
+                            {name: stages[name].result()[0] for name in INCREMENTAL_SOURCES if name in stages}))
+
+def parse_incremental(stages, hashes_cache=None):
+    """Incremental parse: only the days after the last date processed (see parser_edar40/incremental.py) are joined,
+    their derived variables worked out and their rows appended to the OUTPUT DATA dataset and CSV files.
+
+    Parameters:
+        stages: Parser stages (see create_stages)
+        hashes_cache: Dictionary with the hashes of the input files
+
+    Returns:
+        executed: List with the names of the stages that have been executed, or None if everything must be parsed
+                  again (no state, configuration changed, data already processed modified or output files missing)
+    """
+    state = load_state()
+    if state is None or state['key'] != incremental_key(hashes_cache):
+        print('Parser incremental: sin estado válido, se procesan todos los datos')
+        return None
+    outputs = [period_file_name(period) for period in PERIODS] + ([OUT_DATASET_DIR] if blnWrite_DATASET else [])
+    if not all(Path(f).exists() for f in outputs):
+        print('Parser incremental: faltan archivos de salida, se procesan todos los datos')
+        return None
+    if not blnWrite_DATASET and any(period.get('last_days') is not None for period in PERIODS):
+        return None
+
+    # Parse (or load from the cache) the sources only
+    stages = {stage.name: stage for stage in stages}
+    source_names = [name for name in INCREMENTAL_SOURCES if name in stages]
+    executed = run_stages([stages['vars_mask']] + [stages[name] for name in source_names], intParser_WORKERS)
+    sources = {name: stages[name].result() for name in source_names}
+
+    modified = modified_sources(state, {name: df for name, (df, units) in sources.items()})
+    if modified:
+        print(f'Parser incremental: datos ya procesados modificados en {modified}, se procesan todos los datos')
+        return None
+
+    # Join the new days of the sheets
+    last_date = pd.Timestamp(state['last_date'])
+    sheets_new = [(df[df.index > last_date], units) for df, units in
+                  (sources['sheet_ID'], sources['sheet_YOKO'], sources['sheet_ANALITICA'])]
+    if 'yoko_hf' in sources:
+        sheets_new.append((sources['yoko_hf'][0][sources['yoko_hf'][0].index > last_date], {}))
+    df_NEW, units_OUT = join_sheets(*sheets_new)
+    if list(df_NEW.columns) != state['columns']:
+        print('Parser incremental: las variables han cambiado, se procesan todos los datos')
+        return None
+    if len(df_NEW) == 0:
+        print(f'Parser incremental: no hay datos nuevos después de {state["last_date"]}')
+        return executed
+
+    print(f'Parser incremental: añadiendo {len(df_NEW)} días nuevos ({df_NEW.index[0]:%Y-%m-%d} - {df_NEW.index[-1]:%Y-%m-%d})')
+    with span('incremental_append') as sp:
+        if blnWrite_DATASET:
+            check_dtypes(df_NEW, variables_dtypes())
+            append_dataset(df_NEW, units_OUT)
+        for period in PERIODS:
+            append_output_period(period, (df_NEW, units_OUT),
+                                 sources['meteo'] if period.get('meteo') == 'PERIOD_2' else None)
+        sp.set_shape(df_NEW)
+
+    save_state(create_state(state['key'], df_NEW.index[-1], df_NEW.columns,
+                            {name: df for name, (df, units) in sources.items()}))
+    return executed + ['incremental']
+
+# Run the parser. The stages are returned, so that the time spent in every one of them can be inspected
+# (see benchmarks/run_parser.py)
+def parser():
+    print('Ejecutando parser')
+    start_run(blnTrace_MEMORY)
+    with span('parser'):
+        hashes_cache = load_hashes_cache()
+        stages = create_stages(hashes_cache)
+        executed = parse_incremental(stages, hashes_cache) if blnIncremental_PARSE else None
+        if executed is None:
+            executed = run_stages(stages, intParser_WORKERS)
+            if blnIncremental_PARSE:
+                save_incremental_state(stages, hashes_cache)
+        save_hashes_cache(hashes_cache)
+
+    # Write the run report (see parser_edar40/instrumentation.py)
+    if blnWrite_RUN_REPORT:
+        write_run_report({'executed': executed}, keep=intParser_RUN_REPORTS)
+
+    # Export the meteo data of PERIOD 2 to Excel, if requested, without delaying the parser
+    stage_meteo = next(stage for stage in stages if stage.name == 'meteo')
+    if blnExport_METEO_XLSX and (stage_meteo.executed or not OUT_METEO_XLSX_FILE_NAME_PERIOD_2.exists()):
+        threading.Thread(target=export_meteo_xlsx, args=stage_meteo.result(), name='export_meteo_xlsx').start()
+    print(f'Parser finalizado. Etapas ejecutadas: {executed}')
+    return stages
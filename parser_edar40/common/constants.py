@@ -1,4 +1,3 @@
-import os
 from pathlib import Path
 
 ## Mask Constants
@@ -20,20 +19,23 @@ VARS_NORMA_RENDIMIENTOS = {'efluente_rend_elim_SST': 0.7, 'efluente_rend_elim_DB
 IN_METEO_DATA_FILE_DIR=Path('./data/Meteo/')
 
 # OUT_DATA_FILE_NAME_PERIOD_2='../OUT_data/EDAR4.0_EDAR_Cartuja_METEO_PERIOD_2.csv'
-OUT_METEO_DATA_FILE_NAME_PERIOD_2=Path('./data/METEO_PERIOD_2.xlsx')
+OUT_METEO_DATA_FILE_NAME_PERIOD_2=Path('./data/METEO_PERIOD_2.parquet')
 
-# Year folders
+# Excel copy of the meteo data of PERIOD 2 (only written if blnExport_METEO_XLSX is set)
+OUT_METEO_XLSX_FILE_NAME_PERIOD_2=Path('./data/METEO_PERIOD_2.xlsx')
+
+# Year folders: every folder of IN_METEO_DATA_FILE_DIR. They are listed at the start of every run (see
+# list_year_months in parser_edar40/app.py), so that a long-running worker sees the folders added later.
 # YEAR_FOLDERS=['2018','2019']
-YEAR_FOLDERS = [f.name for f in os.scandir(IN_METEO_DATA_FILE_DIR) if f.is_dir()]
 
 # Months folder names
 MONTH_FOLDER_NAMES=['Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio',
                     'Agosto','Septiembre','Octubre','Noviembre','Diciembre']
 
-# Month selection dictionary depending on year. For 2018 it starts from May until Nov (Dec is empty)
-# For 2019 only Jan and Feb are available
+# Month selection depending on year (see list_year_months): the first months of the year, as many as month folders,
+# except for the years below. For 2018 it starts from May until Nov (Dec is empty)
 # YEAR_MONTHS={'2018':MONTH_FOLDER_NAMES[4:],'2019':MONTH_FOLDER_NAMES[0:9]}
-YEAR_MONTHS={year: (MONTH_FOLDER_NAMES[4:] if year == '2018' else MONTH_FOLDER_NAMES[0:len([f.name for f in os.scandir(IN_METEO_DATA_FILE_DIR / year) if f.is_dir()])]) for year in YEAR_FOLDERS}
+METEO_FIRST_YEAR_MONTHS={'2018': MONTH_FOLDER_NAMES[4:]}
 
 # Data file names dictionary
 DATA_FILE_NAMES = {'P24':'PrecipitacionHorariaZaragoza.csv', 'TMED':'TemperaturaMediaZaragoza.csv',
@@ -42,8 +44,8 @@ DATA_FILE_NAMES = {'P24':'PrecipitacionHorariaZaragoza.csv', 'TMED':'Temperatura
 # Columns that will be parsed
 COLUMN_NAMES={'P24':['P24'],'TMED':['TMED'],'PRES':['PRES00','PRES07','PRES13','PRES18']}
 
-# Units row to add at the beginning of dataframe
-UNITS={'Fecha':'NaT','P24':'mm','TMED':'F','PRES00':'hPa','PRES07':'hPa','PRES13':'hPa','PRES18':'hPa'}
+# Units of the meteo variables (kept apart from the data, see create_meteo_df)
+UNITS={'P24':'mm','TMED':'F','PRES00':'hPa','PRES07':'hPa','PRES13':'hPa','PRES18':'hPa'}
 
 METEO_SHEET_NAME_PERIOD_2='PERIOD2(2018-NOW)'
 
@@ -53,7 +55,6 @@ IN_DATA_FILE_NAME=Path('./data/ID 2013-2019. UTEDEZA EDAR 4.0.xlsx')
 
 # Specify INPUT data for metereologic info
 IN_METEO_FILE_NAME_PERIOD_1=Path('./data/METEO_PERIOD_1.xlsx')
-IN_METEO_FILE_NAME_PERIOD_2=Path('./data/METEO_PERIOD_2.xlsx')
 
 # Sheet ID
 IN_DATA_SHEET_NAME_ID='ID'
@@ -76,6 +77,26 @@ IN_DATA_SHEET_NAME_ANALITICA='ANALITICA'
 blnCreate_ANALITICA_sheet_columns_list=True
 ID_EDAR_CARTUJA_ANALITICA_sheet_column_names_FILE_NAME=Path('./static/Cartuja_Datos/ID_EDAR_Cartuja_column_names_sheet_ANALITICA.md')
 
+# Layout of the sheets of the INPUT data Excel file. Rows (0-based, as returned by pandas without header) holding
+# the HEADER, the UNITS and the first row of data of each sheet.
+# NOTE: in sheet YOKO units information is below HEADER row.
+IN_DATA_SHEETS_LAYOUT={IN_DATA_SHEET_NAME_ID: {'header': 3, 'units': 2, 'data': 6},
+                       IN_DATA_SHEET_NAME_YOKO: {'header': 4, 'units': 6, 'data': 7},
+                       IN_DATA_SHEET_NAME_ANALITICA: {'header': 4, 'units': 3, 'data': 7}}
+
+# Specify INPUT high frequency YOKO (SCADA) exports (see parser_edar40/highfreq.py): CSV files with a timestamp column
+# and one column per signal, named as in sheet YOKO (column ORIGEN of sheet YOKO of the variables file)
+IN_YOKO_HF_DATA_DIR=Path('./data/YOKO/')
+YOKO_HF_FILE_PATTERN='*.csv'
+YOKO_HF_SEPARATOR=';'
+YOKO_HF_DECIMAL=','
+YOKO_HF_TIMESTAMP_COLUMN_NAME='Fecha'
+YOKO_HF_TIMESTAMP_FORMAT='%d/%m/%Y %H:%M:%S'
+
+# Daily statistics of every high frequency YOKO signal. The mean is stored with the name of the variable, the other
+# statistics with the suffix _<statistic> (e.g. yoko_O2_Bio1_max)
+YOKO_HF_STATISTICS=['mean', 'min', 'max', 'p95']
+
 # Specify Excel file name specifiying variables ro be read
 VARIABLES_TO_READ_FILE_NAME=Path('./data/EDAR4.0_EDAR_Cartuja_VARIABLES_V5.0.xlsx')
 
@@ -107,11 +128,85 @@ VARIABLES_FILE_SHEET_ANALITICA='ANALITICA'
 VARS_ORIGEN_COL_NAME = 'ORIGEN'
 VARS_DESTINO_COL_NAME = 'DESTINO'
 VARS_CALCULADAS_COL_NAME = 'CALCULADAS'
-
-# Specify OUTPUT DATA CSV file (for PERIODS 1 & 2; see time filters for PERIOD 1 & 2 below)
-OUT_DATA_FILE_NAME_PERIOD_1=Path('./static/Cartuja_Datos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_1.csv')
-OUT_DATA_FILE_NAME_PERIOD_2=Path('./static/Cartuja_Datos/EDAR4.0_EDAR_Cartuja_ID_PERIOD_2.csv')
+# Optional columns of the variables file, used in the memory budget mode (see parser_edar40/dtypes.py):
+#   PRECISION: significant digits of the variable (e.g. 4 for a sensor measuring 12.34)
+#   TIPO: type of the variable; flags and codes (VARIABLE_TYPES_CATEGORICAL) are stored as categoricals
+VARS_PRECISION_COL_NAME = 'PRECISION'
+VARS_TIPO_COL_NAME = 'TIPO'
+VARIABLE_TYPES_CATEGORICAL = ['FLAG', 'CODIGO']
+
+# Significant digits kept by float32 values: variables with up to this precision are stored as float32
+FLOAT32_SIGNIFICANT_DIGITS = 6
+
+# Sheets of the variables file used for every sheet of the INPUT data Excel file
+VARIABLES_FILE_SHEETS_ID=[VARIABLES_FILE_SHEET_ID_INFLUENTE, VARIABLES_FILE_SHEET_ID_BIOS, VARIABLES_FILE_SHEET_ID_FANGOS,
+                          VARIABLES_FILE_SHEET_ID_HORNO, VARIABLES_FILE_SHEET_ID_EFLUENTE, VARIABLES_FILE_SHEET_ID_ELECTRICIDAD]
+VARIABLES_FILE_SHEETS=VARIABLES_FILE_SHEETS_ID + [VARIABLES_FILE_SHEET_YOKO, VARIABLES_FILE_SHEET_ANALITICA]
+
+# Formulas of the variables to be calculated (see parser_edar40/derived.py). A variable is only calculated if it is
+# listed in column CALCULADAS of the variables file, either by name (its formula is taken from here) or as
+# "name = formula" (the formula in the variables file prevails).
+# IMPORTANT: formulas are evaluated ELEMENT-WISE over the rows of data (UNITS row excluded).
+DERIVED_VARIABLES_FORMULAS={
+    # SO4 entrada influente (KG SO4/dia) = SO4 entrada influente (mg SO4/l) * Caudal influente (m3/dia) / 1000
+    'influente_SO4': 'influente_SO4_conc * influente_CAUDAL / 1000',
+    # P-PO4 entrada influente (KG PO4/dia) = P-PO4 entrada influente (mg P-PO4/l) * Caudal influente (m3/dia) / 1000
+    'influente_P-PO4': 'influente_P-PO4_conc * influente_CAUDAL / 1000',
+    # Ratio DBO5/DQO = DBO5 entrada influente (mg DBO5/l) / DQO entrada influente (mg DQO/l)
+    'influente_ratio_DBO5t_DQOt': 'influente_DBO5t_conc / influente_DQOt_conc',
+    # Ratio DBO5/DQO entrada bios = DBO5 entrada BIOS(mg DBO5/l) / DQO entrada BIOS (mg DQO/l)
+    'bios_IN_ratio_DBO5t_DQOt': 'bios_IN_DBO5t_conc / bios_IN_DQOt_conc',
+    # DO ZONA 1 media BIOS = PROMEDIO (O2 Bio1 Zona 1, O2 Bio2 Zona 1, O2 Bio3 Zona 1)
+    'bios_manipulable_O2_Promedio_Zona_1': '(bios_manipulable_O2_Bio1_Zona_1 + bios_manipulable_O2_Bio2_Zona_1 + bios_manipulable_O2_Bio3_Zona_1) / 3',
+    # DO ZONA 2 media BIOS = PROMEDIO (O2 Bio1 Zona 2, O2 Bio2 Zona 2, O2 Bio3 Zona 2)
+    'bios_manipulable_O2_Promedio_Zona_2': '(bios_manipulable_O2_Bio1_Zona_2 + bios_manipulable_O2_Bio2_Zona_2 + bios_manipulable_O2_Bio3_Zona_2) / 3',
+    # Consumo especifico EDAR (kWh/m3) = Consumo EDAR (kWh/dia) / Caudal influente (m3/dia)
+    'electricidad_kWh_m3': 'electricidad_Consumo_EDAR_kWdia / influente_CAUDAL',
+}
+
+# Specify OUTPUT DATA CSV file (one for every period; see PERIODS in settings)
+OUT_DATA_FILE_NAME_PERIOD='./static/Cartuja_Datos/EDAR4.0_EDAR_Cartuja_ID_{}.csv'
+OUT_DATA_FILE_NAME_PERIOD_1=Path(OUT_DATA_FILE_NAME_PERIOD.format('PERIOD_1'))
+OUT_DATA_FILE_NAME_PERIOD_2=Path(OUT_DATA_FILE_NAME_PERIOD.format('PERIOD_2'))
+
+# Specify OUTPUT DATA Parquet dataset, partitioned by year and month (see parser_edar40/store.py)
+OUT_DATASET_DIR=Path('./static/Cartuja_Datos/EDAR4.0_EDAR_Cartuja_ID_dataset')
+DATASET_COMPRESSION='zstd'
+
+# Specify OUTPUT high frequency YOKO Parquet dataset, partitioned by year and month, for drill-down
+OUT_YOKO_HF_DATASET_DIR=Path('./static/Cartuja_Datos/EDAR4.0_EDAR_Cartuja_YOKO_HF_dataset')
 
 # Other constants of interest
 DATE_COLUMN_NAME = 'Fecha'
-FIRST_UNKONW_COLUMN_NAME = 'Unnamed: 0'
\ No newline at end of file
+FIRST_UNKONW_COLUMN_NAME = 'Unnamed: 0'
+
+## Parser cache Constants
+# Directory where the results of every parser stage are stored (see parser_edar40/stages.py)
+STAGES_CACHE_DIR=Path('./data/.cache/stages')
+
+# Directory where every sheet of the INPUT data Excel files is stored, once decoded, in Parquet format
+# (see parser_edar40/landing.py)
+RAW_CACHE_DIR=Path('./data/.cache/raw')
+
+# Directory where every meteo CSV file is stored, once parsed, in Parquet format (see parser_edar40/helpers.py)
+METEO_CACHE_DIR=Path('./data/.cache/meteo')
+
+# File storing the hashes of the input files, together with their mtime and size
+FILE_HASHES_CACHE_FILE_NAME=Path('./data/.cache/file_hashes.json')
+
+# File storing the state of the incremental parse (last date processed and checksums of the data already processed,
+# see parser_edar40/incremental.py)
+INCREMENTAL_STATE_FILE_NAME=Path('./data/.cache/incremental.json')
+
+# Directory of the JSON reports of every parser run (see parser_edar40/instrumentation.py)
+PARSER_RUN_REPORTS_DIR=Path('./logs/parser')
+
+# Lock file of the parser worker, so that only one parser worker runs at a time (see parser_edar40/worker.py)
+PARSER_LOCK_FILE_NAME=Path('./data/.cache/parser.lock')
+
+# Directory where the OUTPUT files are published after every parser run: one directory per version
+# (<PUBLISHED_DIR>/versions/<version>) and a "current" link to the last one (<PUBLISHED_DIR>/current)
+PUBLISHED_DIR=Path('./static/Cartuja_Datos/published')
+
+# Version of the parser stages. Increase it whenever the parsing code changes, in order to invalidate cached results
+PARSER_CACHE_VERSION=8
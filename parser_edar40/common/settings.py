@@ -1,3 +1,5 @@
+import os
+
 # Date column filtering variables
 blnFilter_on_start_date = True
 blnFilter_on_end_date = False
@@ -11,5 +13,84 @@ str_start_date_filter_PERIOD_2="2018-04-30" # For a condition >
 str_end_date_filter_PERIOD_2="2019-09-29"   # For a condition <=
 # str_end_date_filter_PERIOD_2="2019-02-28"   # For a condition <=
 
+# Periods for which an OUTPUT DATA CSV file is created (EDAR4.0_EDAR_Cartuja_ID_<name>.csv). Each period is defined by:
+#   name: name of the period
+#   start, end: dates "YYYY-MM-DD" for conditions > start and <= end (None for no filtering), or
+#   last_days: the last N days up to the last date with data, or
+#   year: a whole natural year
+#   meteo: meteo data to be added; 'PERIOD_1' (file METEO_PERIOD_1.xlsx) or 'PERIOD_2' (files in folder Meteo)
+PERIODS = [
+    {'name': 'PERIOD_1', 'start': str_start_date_filter_PERIOD_1, 'end': str_end_date_filter_PERIOD_1, 'meteo': 'PERIOD_1'},
+    {'name': 'PERIOD_2',
+     'start': str_start_date_filter_PERIOD_2 if blnFilter_on_start_date else None,
+     'end': str_end_date_filter_PERIOD_2 if blnFilter_on_end_date else None,
+     'meteo': 'PERIOD_2'},
+    # {'name': 'LAST_365_DAYS', 'last_days': 365, 'meteo': 'PERIOD_2'},
+    # {'name': '2019', 'year': 2019, 'meteo': 'PERIOD_2'},
+]
+
+# Write the OUTPUT DATA Parquet dataset (all dates, partitioned by year and month) besides the CSV files of every period
+blnWrite_DATASET = True
+
 # Units including variables
-blnConsider_UNITS = True
\ No newline at end of file
+blnConsider_UNITS = True
+
+# Read only the columns of the variables mask (plus the date column) of the sheets of the INPUT data Excel file,
+# streaming its rows (openpyxl, read only mode). Set to False in order to decode the whole sheets with pandas
+blnStream_XLSX = True
+
+# Ingest the high frequency YOKO exports (IN_YOKO_HF_DATA_DIR), if any: their daily statistics (YOKO_HF_STATISTICS)
+# replace the daily values of sheet YOKO, and the high frequency series are stored in OUT_YOKO_HF_DATASET_DIR.
+# The exports are read intYOKO_HF_CHUNK_ROWS rows at a time
+blnIngest_YOKO_HF = True
+intYOKO_HF_CHUNK_ROWS = 200000
+
+# Memory budget mode: measurement variables are stored as float32 if their precision (column PRECISION of the variables
+# file, or intDefault_VARIABLE_PRECISION if not declared) allows it, and flags and codes (column TIPO) as categoricals,
+# in memory and in the OUTPUT DATA dataset. Set to False in order to store every variable as float64
+blnMemory_BUDGET = False
+# Significant digits of the variables whose precision is not declared in the variables file (None: keep them float64)
+intDefault_VARIABLE_PRECISION = 6
+
+# Memoize every parser stage on disk, keyed by the hashes of its inputs and its configuration
+blnUse_STAGE_CACHE = True
+
+# Incremental parse: only the days after the last date already processed are joined and appended to the OUTPUT DATA
+# CSV files and dataset. If any data already processed has been modified, everything is parsed again
+blnIncremental_PARSE = True
+
+# Write a JSON report of every parser run in PARSER_RUN_REPORTS_DIR (time, CPU time, rows and columns of every step),
+# keeping the last intParser_RUN_REPORTS reports
+blnWrite_RUN_REPORT = True
+intParser_RUN_REPORTS = 30
+
+# Trace the memory allocated by every step of the parser (tracemalloc) in the run report. It slows down the parser.
+# Requires Python 3.9 or later (tracemalloc.reset_peak); otherwise memory_peak_mb is not reported
+blnTrace_MEMORY = False
+
+# Expose the last run report as metrics (Prometheus text format) in the endpoint /metrics/parser of the web application
+blnExpose_PARSER_METRICS = False
+
+# Time of the day at which the parser worker runs the parser (see parser_edar40/worker.py)
+intParser_CRON_HOUR = 5
+intParser_CRON_MINUTE = 0
+
+# Run the parser whenever the INPUT files change (True), instead of every day at intParser_CRON_HOUR:intParser_CRON_MINUTE
+# (False). Requires watchdog. The parser is run intWatch_DEBOUNCE_SECONDS after the last change, and never twice
+# within intWatch_MIN_INTERVAL_SECONDS.
+blnWatch_INPUT_FILES = False
+intWatch_DEBOUNCE_SECONDS = 30
+intWatch_MIN_INTERVAL_SECONDS = 600
+
+# Number of published versions of the OUTPUT files to be kept (see PUBLISHED_DIR)
+intPublished_VERSIONS = 3
+
+# Number of worker processes used to parse the sheets of the INPUT data Excel file, the meteo files and the high
+# frequency YOKO exports at the same time (5 at most: sheets ID, YOKO, ANALITICA, meteo and YOKO HF; the pool is never
+# larger than the number of parallel stages to be executed, see run_stages). Set to 1 in order to parse them one after
+# another in the parser process
+intParser_WORKERS = min(5, os.cpu_count() or 1)
+
+# Write an Excel copy of the meteo data of PERIOD 2 (./data/METEO_PERIOD_2.xlsx), in background, after every parser run
+# in which the meteo data changes. The parser itself only uses the Parquet copy.
+blnExport_METEO_XLSX = False
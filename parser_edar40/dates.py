@@ -0,0 +1,91 @@
+# Required Libraries
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+# Constants
+from parser_edar40.common.constants import DATE_COLUMN_NAME
+
+# IMPORTANT: all the dataframes of the parser are indexed by date (only date part, i.e. datetime64 at 00:00:00).
+# Joins between them are done on integer day keys (days since 1970-01-01), as sorted merges, instead of joining on
+# Python date objects.
+
+def normalize_dates(values):
+    """Converts any date-like column to pandas timestamp format, only date part, in one vectorized pass
+
+    Parameters:
+        values: Series (or array) with dates; either timestamps or text
+
+    Returns:
+        dates: Series of datetime64 at 00:00:00. Values that are not dates are set to NaT
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        dates = values
+    else:
+        dates = pd.to_datetime(values.astype(str), errors="coerce", infer_datetime_format=True)
+    return dates.dt.normalize()
+
+# Define function to get the day keys (int32, days since 1970-01-01) of an index of dates
+def day_keys(index):
+    return pd.DatetimeIndex(index).values.astype('datetime64[D]').astype(np.int64).astype(np.int32)
+
+# Define function to create an index of dates from day keys
+def day_keys_index(keys, name=DATE_COLUMN_NAME):
+    return pd.DatetimeIndex(np.asarray(keys, dtype=np.int64).astype('datetime64[D]'), name=name)
+
+def join_on_day_keys(frames):
+    """Inner join of dataframes indexed by date (without duplicated dates), as a sorted merge on day keys
+
+    Parameters:
+        frames: List of dataframes
+
+    Returns:
+        df: Dataframe with the columns of all the dataframes and the dates found in all of them, sorted by date
+    """
+    keys = [day_keys(df.index) for df in frames]
+    common = reduce(np.intersect1d, keys)
+    index = day_keys_index(common)
+
+    parts = []
+    for df, df_keys in zip(frames, keys):
+        if np.array_equal(df_keys, common):
+            # Same dates, in the same order: no need to take the rows
+            part = df.copy(deep=False)
+        else:
+            order = np.argsort(df_keys, kind='mergesort')
+            part = df.iloc[order[np.searchsorted(df_keys, common, sorter=order)]]
+        part.index = index
+        parts.append(part)
+    return pd.concat(parts, axis=1, copy=False)
+
+def left_join_on_day_keys(df_left, df_right):
+    """Left join of two dataframes indexed by date, as a sorted merge on day keys. The columns of df_right must be
+    numeric; dates of df_left not found in df_right get NaN values. If a date is duplicated in df_right, its first
+    row is taken.
+
+    Parameters:
+        df_left: Dataframe
+        df_right: Dataframe with numeric columns
+
+    Returns:
+        df: Dataframe with the rows of df_left and the columns of both dataframes
+    """
+    left_keys = day_keys(df_left.index)
+    right_keys = day_keys(df_right.index)
+
+    if len(right_keys) == 0:
+        df_right_values = pd.DataFrame(np.nan, index=df_left.index, columns=df_right.columns)
+        return pd.concat([df_left, df_right_values], axis=1, copy=False)
+
+    order = np.argsort(right_keys, kind='mergesort')
+    right_keys_sorted = right_keys[order]
+    positions = np.minimum(np.searchsorted(right_keys_sorted, left_keys), len(right_keys) - 1)
+    found = right_keys_sorted[positions] == left_keys
+    rows = order[positions]
+
+    df_right_values = pd.DataFrame({col: np.where(found, df_right[col].to_numpy(dtype='float64')[rows], np.nan)
+                                    for col in df_right.columns},
+                                   index=df_left.index, columns=df_right.columns)
+    return pd.concat([df_left, df_right_values], axis=1, copy=False)
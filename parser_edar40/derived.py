@@ -0,0 +1,208 @@
+# Required Libraries
+import ast
+import re
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Constants
+from parser_edar40.common.constants import DERIVED_VARIABLES_FORMULAS
+
+# Variables
+from parser_edar40.variables import load_variables_registry
+
+# Instrumentation
+from parser_edar40.instrumentation import span, report_warning
+
+# Nodes allowed in the expression of a formula: arithmetic on variables (placeholders) and numbers. Anything else
+# (attributes, calls, subscripts, ...) is rejected before the expression is evaluated.
+# Numbers are parsed as ast.Num before Python 3.8.
+NUMBER_NODES = (ast.Constant,) if sys.version_info >= (3, 8) else (ast.Constant, ast.Num)
+ALLOWED_EXPRESSION_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load,
+                            ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.FloorDiv, ast.UAdd,
+                            ast.USub) + NUMBER_NODES
+
+# Define function to check that a compiled expression only uses ALLOWED_EXPRESSION_NODES, its placeholders and numbers.
+# Returns the reason why it is rejected, or None.
+def check_expression(expression, placeholders):
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        return f'sintaxis no válida ({e.msg})'
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_EXPRESSION_NODES):
+            return f'elemento no permitido ({type(node).__name__})'
+        if isinstance(node, ast.Name) and node.id not in placeholders:
+            return f'nombre no permitido ({node.id})'
+        if isinstance(node, NUMBER_NODES):
+            value = node.value if isinstance(node, ast.Constant) else node.n
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return f'constante no permitida ({value!r})'
+    return None
+
+class DerivedVariable:
+    """Derived variable compiled from its formula
+
+    Attributes:
+        name: Name of the derived variable
+        formula: Formula as declared
+        expression: Formula with every variable replaced by a placeholder (v0, v1, ...)
+        variables: Dictionary with placeholder as key and variable name as value
+        sheet: Sheet of the variables file where the variable is declared
+    """
+    def __init__(self, name, formula, expression, variables, sheet):
+        self.name = name
+        self.formula = formula
+        self.expression = expression
+        self.variables = variables
+        self.sheet = sheet
+
+# Define function to get the formulas of the variables declared in the CALCULADAS column of the variables file.
+# A cell of column CALCULADAS may declare the formula itself ("name = formula") or just the name of the variable; in that
+# case its formula is taken from DERIVED_VARIABLES_FORMULAS.
+def get_derived_formulas(variables_file_name, variables_sheet_names):
+    registry = load_variables_registry(variables_file_name)
+    formulas = OrderedDict()
+    for sheet_name in variables_sheet_names:
+        for cell in registry['calculated'].get(sheet_name, []):
+            if '=' in cell:
+                name, formula = [part.strip() for part in cell.split('=', 1)]
+            else:
+                name, formula = cell.strip(), DERIVED_VARIABLES_FORMULAS.get(cell.strip())
+            if formula is None:
+                report_warning("¡¡¡WARNING!!!: No se ha encontrado la fórmula de la variable calculada; " + name)
+                continue
+            formulas[name] = (formula, sheet_name)
+    return formulas
+
+def compile_derived_plan(formulas, available_columns):
+    """Compiles the formulas of the derived variables into a plan ordered by dependencies
+
+    Variables are referenced by name in the formulas. Names including operators (e.g. influente_P-PO4_conc) are
+    matched against the known variable names, longest first; they may also be quoted with backticks.
+
+    Parameters:
+        formulas: Ordered dictionary with derived variable name as key and (formula, sheet) as value
+        available_columns: Columns of the dataframe the plan will be evaluated on
+
+    Returns:
+        plan: List of DerivedVariable, each one placed after all the derived variables it depends on
+    """
+    known_names = set(available_columns) | set(formulas.keys())
+    names_regex = re.compile('`([^`]+)`|(?<!\\w)(' + '|'.join(re.escape(name) for name in
+                             sorted(known_names, key=len, reverse=True)) + ')(?!\\w)')
+
+    compiled = OrderedDict()
+    for name, (formula, sheet_name) in formulas.items():
+        variables = OrderedDict()
+        def placeholder(match):
+            variable = match.group(1) or match.group(2)
+            for key, value in variables.items():
+                if value == variable:
+                    return key
+            key = f'v{len(variables)}'
+            variables[key] = variable
+            return key
+        expression = names_regex.sub(placeholder, formula)
+
+        # Any name left in the expression is not a known variable
+        missing = [variable for variable in variables.values() if variable not in known_names]
+        missing += [token for token in re.findall('(?<![\\w.])[A-Za-z_]\\w*', expression) if token not in variables]
+        if missing:
+            report_warning("¡¡¡WARNING!!!: Las siguientes variables de la fórmula de " + name + " no existen; " + "; ".join(missing))
+            continue
+        error = check_expression(expression, variables)
+        if error is not None:
+            report_warning("¡¡¡WARNING!!!: La fórmula de " + name + " no es válida; " + error)
+            continue
+        compiled[name] = DerivedVariable(name, formula, expression, variables, sheet_name)
+
+    # Skip the variables depending on derived variables that could not be compiled
+    skipped = [name for name in formulas if name not in compiled]
+    while skipped:
+        skipped = [name for name, derived in compiled.items()
+                   if any(variable in formulas and variable not in compiled for variable in derived.variables.values())]
+        for name in skipped:
+            report_warning("¡¡¡WARNING!!!: No se puede calcular la variable " + name)
+            compiled.pop(name)
+
+    # Order by dependencies (derived variables used in other formulas first), keeping the declaration order otherwise
+    plan = []
+    pending = OrderedDict(compiled)
+    while pending:
+        ready = [name for name, derived in pending.items()
+                 if not any(variable in pending for variable in derived.variables.values())]
+        if not ready:
+            raise ValueError(f'Dependencia circular entre las variables calculadas: {list(pending.keys())}')
+        for name in ready:
+            plan.append(pending.pop(name))
+    return plan
+
+# Define function to evaluate a compiled expression over float64 arrays. The expression has been checked by
+# check_expression (only arithmetic on the placeholders), therefore NumPy can evaluate it directly.
+def evaluate_expression(expression, local_dict):
+    return eval(compile(ast.parse(expression, mode='eval'), '<formula>', 'eval'), {'__builtins__': {}}, dict(local_dict))
+
+def evaluate_derived_plan(df, plan):
+    """Evaluates a plan over the columns of a dataframe, one vectorized NumPy expression per derived variable. Every
+    column is converted to a float64 array once, and derived variables are passed as arrays to the ones using them.
+
+    Parameters:
+        df: Dataframe with the variables used in the formulas
+        plan: Plan of derived variables (see compile_derived_plan)
+
+    Returns:
+        derived: Ordered dictionary with derived variable name as key and its float64 array (of len(df)) as value
+    """
+    arrays = {}
+    def column(name):
+        if name not in arrays:
+            arrays[name] = np.asarray(df[name], dtype='float64')
+        return arrays[name]
+
+    derived = OrderedDict()
+    for variable in plan:
+        local_dict = {key: column(name) for key, name in variable.variables.items()}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.asarray(evaluate_expression(variable.expression, local_dict), dtype='float64')
+        arrays[variable.name] = values
+        derived[variable.name] = values
+    return derived
+
+def add_derived_variables(df, variables_file_name, variables_sheet_names):
+    """Adds to the dataframe all the variables declared in the CALCULADAS column of the variables file.
+    Each derived variable is placed after the last variable read from the same sheet of the variables file.
+
+    Parameters:
+        df: Dataframe with the variables read from all the sheets
+        variables_file_name: Variables file
+        variables_sheet_names: Sheets of the variables file whose derived variables are added
+
+    Returns:
+        df: New dataframe including the derived variables
+    """
+    with span('derived_variables') as sp:
+        formulas = get_derived_formulas(variables_file_name, variables_sheet_names)
+        plan = compile_derived_plan(formulas, df.columns)
+        if not plan:
+            return df
+        derived = evaluate_derived_plan(df, plan)
+        sp.rows, sp.columns = len(df), len(derived)
+
+    # Work out the column after which the derived variables of every sheet are placed
+    registry = load_variables_registry(variables_file_name)
+    anchors = {}
+    for variable in plan:
+        sheet_columns = [col for col in registry['mappings'].get(variable.sheet, {}).values() if col in df.columns]
+        anchors.setdefault(sheet_columns[-1] if sheet_columns else df.columns[-1], []).append(variable.name)
+
+    columns = []
+    for col in df.columns:
+        if col not in derived:
+            columns.append(col)
+            columns.extend(anchors.get(col, []))
+
+    df_derived = pd.DataFrame(derived, index=df.index)
+    return pd.concat([df.drop(columns=[col for col in derived if col in df.columns]), df_derived], axis=1)[columns]
@@ -0,0 +1,106 @@
+# Constants
+from parser_edar40.common.constants import (VARS_ORIGEN_COL_NAME, VARS_DESTINO_COL_NAME, VARS_PRECISION_COL_NAME,
+                                             VARS_TIPO_COL_NAME, VARIABLE_TYPES_CATEGORICAL, FLOAT32_SIGNIFICANT_DIGITS)
+
+# Variables
+from parser_edar40.variables import load_variables_registry
+
+# Instrumentation
+from parser_edar40.instrumentation import span
+
+# Data types of the variables.
+# By default every variable is float64. In the memory budget mode (blnMemory_BUDGET), measurements are float32 when
+# their precision allows it and flags and codes are categoricals. The data types are declared before the data is
+# written, and checked at write time (see check_dtypes), so that a step of the parser cannot change them unnoticed.
+
+# Define function to get the precision (significant digits) declared for a variable
+def declared_precision(value, default_precision):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default_precision
+
+def get_variables_dtypes(variables_file_name, variables_sheet_names, memory_budget=False, default_precision=None):
+    """Declares the data type of every variable of the variables file
+
+    Parameters:
+        variables_file_name: Variables file
+        variables_sheet_names: Sheets of the variables file
+        memory_budget: If False, every variable is float64
+        default_precision: Significant digits of the variables without PRECISION (None: float64)
+
+    Returns:
+        dtypes: Dictionary with variable name (DESTINO) as key and its data type ('float64', 'float32' or 'category')
+                as value. Key None holds the data type of the variables not declared (e.g. derived and meteo
+                variables), the one of default_precision
+    """
+    default_dtype = 'float32' if (memory_budget and default_precision is not None
+                                  and default_precision <= FLOAT32_SIGNIFICANT_DIGITS) else 'float64'
+    dtypes = {None: default_dtype}
+    if not memory_budget:
+        return dtypes
+
+    registry = load_variables_registry(variables_file_name)
+    for sheet_name in variables_sheet_names:
+        columns = registry['columns'].get(sheet_name, {})
+        origenes = columns.get(VARS_ORIGEN_COL_NAME, [])
+        empty = [None] * len(origenes)
+        for origen, destino, precision, tipo in zip(origenes, columns.get(VARS_DESTINO_COL_NAME, empty),
+                                                    columns.get(VARS_PRECISION_COL_NAME, empty),
+                                                    columns.get(VARS_TIPO_COL_NAME, empty)):
+            if origen is None:
+                continue
+            if tipo is not None and tipo.strip().upper() in VARIABLE_TYPES_CATEGORICAL:
+                dtype = 'category'
+            else:
+                precision = declared_precision(precision, default_precision)
+                dtype = 'float32' if precision is not None and precision <= FLOAT32_SIGNIFICANT_DIGITS else 'float64'
+            dtypes[destino if destino is not None else origen] = dtype
+    return dtypes
+
+# Define function to get the data type declared for a column (columns not declared, e.g. meteo, get the default one)
+def declared_dtype(dtypes, col):
+    return dtypes.get(col, dtypes.get(None, 'float64'))
+
+# Define function to get the memory used by a dataframe (MB)
+def frame_memory_mb(df):
+    return df.memory_usage(index=True, deep=True).sum() / 2 ** 20
+
+def apply_dtypes(df, dtypes):
+    """Converts the columns of a dataframe to their declared data types
+
+    Parameters:
+        df: Dataframe with float columns
+        dtypes: Declared data types (see get_variables_dtypes)
+
+    Returns:
+        df: Dataframe with the declared data types (the same dataframe if no column has to be converted)
+    """
+    conversions = {col: declared_dtype(dtypes, col) for col in df.columns
+                   if str(df[col].dtype) != declared_dtype(dtypes, col)}
+    if not conversions:
+        return df
+
+    with span('apply_dtypes') as sp:
+        memory_before = frame_memory_mb(df)
+        df = df.astype(conversions)
+        memory_after = frame_memory_mb(df)
+        sp.set_shape(df)
+        sp.attrs.update({'memory_before_mb': memory_before, 'memory_after_mb': memory_after})
+    print(f'Tipos de datos: {len(conversions)} variables convertidas; memoria {memory_before:.1f} MB -> {memory_after:.1f} MB')
+    return df
+
+def check_dtypes(df, dtypes):
+    """Checks that the columns of a dataframe have their declared data types, before writing it
+
+    Parameters:
+        df: Dataframe
+        dtypes: Declared data types (see get_variables_dtypes)
+
+    Raises:
+        ValueError: if any column does not have its declared data type
+    """
+    wrong = [f'{col} ({df[col].dtype}, declarado {declared_dtype(dtypes, col)})' for col in df.columns
+             if str(df[col].dtype) != declared_dtype(dtypes, col)]
+    if wrong:
+        raise ValueError('Tipos de datos no declarados: ' + '; '.join(wrong))
@@ -1,12 +1,126 @@
+import hashlib
+import json
+import os
+import numpy as np
 import pandas as pd
-from functools import reduce
-from parser_edar40.common.constants import DATE_COLUMN_NAME
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from parser_edar40.common.constants import DATE_COLUMN_NAME, METEO_CACHE_DIR
+from parser_edar40.dates import join_on_day_keys
+from parser_edar40.variables import load_variables_registry, get_variables_mapping
+from parser_edar40.instrumentation import span
 
 # Define function to create vars mask df
 def create_vars_mask_df(column_names, vars):
     df = pd.DataFrame(vars.items(), columns=column_names)
     return df
 
+# Define function to get the UNITS of the variables of a partial DF (see Create_Partial_DF), with their new names
+def get_partial_units(variables_file_name, variables_sheet_name, vars_ORIGEN_col_name, vars_DESTINO_col_name, units):
+    vars_mapping = get_variables_mapping(load_variables_registry(variables_file_name),
+                                         variables_sheet_name,
+                                         vars_ORIGEN_col_name,
+                                         vars_DESTINO_col_name)
+    return {destino_col_name: units.get(origen_col_name) for origen_col_name, destino_col_name in vars_mapping.items()
+            if destino_col_name != DATE_COLUMN_NAME}
+
+# Define function to split a dataframe read from a file with a UNITS row (i.e. a row without date, like
+# METEO_PERIOD_1.xlsx) into a numeric dataframe and a dictionary with its UNITS
+def split_units_row(df):
+    units_mask = pd.isnull(df.index)
+    units = {}
+    if units_mask.any():
+        units = {col: (None if pd.isnull(value) else str(value)) for col, value in df[units_mask].iloc[0].items()}
+    df_data = df[~units_mask].apply(pd.to_numeric, errors='coerce').astype('float64')
+    return df_data, units
+
+# Define function to create a dataframe with the UNITS as its first row (without date), the way they are written to
+# the CSV and Excel files
+def frame_with_units(df, units):
+    df_units = pd.DataFrame([[units.get(col) for col in df.columns]], columns=df.columns,
+                            index=pd.Index([pd.NaT], name=df.index.name))
+    return pd.concat([df_units, df.astype(object)], sort=False)
+
+# Define function to write whole numbers of float64 columns without decimals (6, not 6.0), the way they were written
+# when those columns were read from Excel (e.g. meteo columns). Other values are written as before.
+def whole_numbers_as_int(df, columns):
+    converted = {}
+    for col in columns:
+        if col not in df.columns or df[col].dtype != 'float64':
+            continue
+        values = df[col].to_numpy()
+        whole = np.isfinite(values) & (np.floor(values) == values) & (np.abs(values) < 2 ** 53)
+        if whole.any():
+            values = values.astype(object)
+            values[whole] = [int(value) for value in values[whole]]
+            converted[col] = values
+    return df.assign(**converted) if converted else df
+
+# Define function to write a dataframe to a CSV file. Respect 'standard' format: ',' for separation, '.' for decimals.
+# If UNITS are considered, they are written in the first row after the HEADER. Whole numbers of int_columns are
+# written without decimals (see whole_numbers_as_int).
+def write_csv(df, units, file_name, blnConsider_UNITS, int_columns=()):
+    df = whole_numbers_as_int(df, int_columns)
+    with open(file_name, 'w', encoding='latin-1', newline='') as f:
+        if (blnConsider_UNITS == True):
+            df_units = pd.DataFrame([[units.get(col) for col in df.columns]], columns=df.columns,
+                                    index=pd.Index([None], name=df.index.name))
+            df_units.to_csv(f, sep=',', decimal='.')
+            df.to_csv(f, sep=',', decimal='.', header=False)
+        else:
+            df.to_csv(f, sep=',', decimal='.')
+
+# Define function to append rows to a CSV file written by write_csv (without HEADER nor UNITS)
+def append_csv(df, file_name, int_columns=()):
+    df = whole_numbers_as_int(df, int_columns)
+    with open(file_name, 'a', encoding='latin-1', newline='') as f:
+        df.to_csv(f, sep=',', decimal='.', header=False)
+
+# Define function to read one meteo CSV file (one variable, one month).
+# Parsed files are stored in METEO_CACHE_DIR, keyed by the file's path, mtime and size, so that only new or modified
+# files are parsed again.
+def read_meteo_file(file_name, columns):
+    file_name = Path(file_name)
+    stat = file_name.stat()
+    path_key = hashlib.sha1(f'{file_name.resolve()}|{columns}'.encode('utf-8')).hexdigest()[:20]
+    cache_file_name = METEO_CACHE_DIR / f'{path_key}-{stat.st_mtime_ns}-{stat.st_size}.parquet'
+    if cache_file_name.exists():
+        return pd.read_parquet(cache_file_name)
+
+    df = pd.read_csv(file_name, sep=';', encoding='latin_1', usecols=['AÑO','MES','DIA']+columns,
+                     parse_dates={'Fecha':['AÑO','MES','DIA']})
+    df['Fecha'] = pd.to_datetime(df['Fecha'])
+    df.set_index('Fecha',inplace=True)
+    df[columns] = df[columns].astype('float')
+
+    # Store the parsed file (atomically) and remove the ones stored for previous versions of the file
+    METEO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_file_name = cache_file_name.with_name(f'{cache_file_name.name}.{os.getpid()}.tmp')
+    df.to_parquet(tmp_file_name)
+    tmp_file_name.replace(cache_file_name)
+    for old_file in METEO_CACHE_DIR.glob(f'{path_key}-*.parquet'):
+        if old_file != cache_file_name:
+            old_file.unlink()
+    return df
+
+# Define function to save a dataframe in Parquet format. UNITS are stored in the file's metadata.
+def save_frame_parquet(df, units, file_name):
+    table = pa.Table.from_pandas(df)
+    table = table.replace_schema_metadata({**table.schema.metadata,
+                                           b'units': json.dumps(units, ensure_ascii=False).encode('utf-8')})
+    file_name = Path(file_name)
+    tmp_file_name = file_name.with_name(f'{file_name.name}.{os.getpid()}.tmp')
+    pq.write_table(table, tmp_file_name)
+    tmp_file_name.replace(file_name)
+
+# Define function to load a dataframe saved by save_frame_parquet, together with its UNITS
+def load_frame_parquet(file_name):
+    table = pq.read_table(file_name)
+    units = json.loads(table.schema.metadata.get(b'units', b'{}').decode('utf-8'))
+    return table.to_pandas(), units
+
 # Define function to create meteo df
 def create_meteo_df(units,
                     year_folders,
@@ -14,128 +128,122 @@ def create_meteo_df(units,
                     column_names,
                     in_data_file_dir,
                     data_file_names):
-    # Create units dataframe
-    units_df = pd.DataFrame([units], columns=list(units.keys()))
-    units_df['Fecha'] = pd.to_datetime(units_df['Fecha'])
-    units_df.set_index('Fecha',inplace=True)
-    
-    # Initialize dataframe full (this will hold all the data)
-    df_full = pd.DataFrame()
-
-    # Start looking at respective files to be parsed depending on year and month
-    for year in year_folders:
-        for month in year_months[year]:
-            df_list = []
-            for col in column_names:
-                df = pd.read_csv(f'{in_data_file_dir}/{year}/{month}/{data_file_names[col]}', 
-                                sep=';',encoding='latin_1', usecols=['AÑO','MES','DIA']+column_names[col],
-                                parse_dates={'Fecha':['AÑO','MES','DIA']})
-                df['Fecha'] = pd.to_datetime(df['Fecha'])
-                df.set_index('Fecha',inplace=True)
-                df[column_names[col]] = df[column_names[col]].astype('float')
-                df_list.append(df)
-            df_tot = reduce(lambda df1,df2: pd.merge(df1,df2,on='Fecha',how='inner'), df_list)
-            df_full=df_full.append(df_tot, sort=False)
-
-    # Reset index of df_full in order to add units row
-    df_full=df_full.reset_index()
-
-    # Concatenate units row at the beginning of dataframe full
-    df_full = pd.concat([units_df, df_full], ignore_index=True, axis=0, sort=False)
-    df_full['Fecha'] = pd.to_datetime(df_full['Fecha'])
-
-    df_full.set_index('Fecha', inplace=True)
-    
-    return df_full
+    # Files to be parsed depending on year and month
+    months = [(year, month) for year in year_folders for month in year_months[year]]
+
+    # Read all the files at the same time
+    with ThreadPoolExecutor() as executor:
+        futures = {(year, month, col): executor.submit(read_meteo_file,
+                                                       f'{in_data_file_dir}/{year}/{month}/{data_file_names[col]}',
+                                                       column_names[col])
+                   for (year, month) in months for col in column_names}
+
+        # Join the variables of every month, and then concatenate all the months at once
+        # (instead of appending every month to the dataframe full, which copies it every time)
+        df_months = []
+        for (year, month) in months:
+            df_list = [futures[(year, month, col)].result() for col in column_names]
+            df_months.append(join_on_day_keys(df_list))
+
+    # Concatenate all months in dataframe full (this will hold all the data)
+    # NOTE: UNITS are returned apart, so that all columns of dataframe full are float
+    df_full = pd.concat(df_months, axis=0, sort=False)
+    df_full.index = pd.DatetimeIndex(df_full.index, name='Fecha')
+
+    return df_full, dict(units)
 
 # Define auxiliary function for creating partial DF according to variables to be read from COMPLETE DF
+class PartialDFReport:
+    """Quality report of a partial DF (see Create_Partial_DF)
+
+    Attributes:
+        sheet: Sheet of the variables file
+        rows: Number of rows of the partial DF
+        columns: Number of variables of the partial DF
+        columns_with_all_NaNs: Original names of the variables with all values NaN. A typical error consists of
+                               misswritting some letter of a column name, which returns all NaN values
+        columns_not_found: Original names of the variables not found in the original list of columns. They are
+                           added to the partial DF with all values NaN
+    """
+    def __init__(self, sheet, rows, columns, columns_with_all_NaNs, columns_not_found):
+        self.sheet = sheet
+        self.rows = rows
+        self.columns = columns
+        self.columns_with_all_NaNs = columns_with_all_NaNs
+        self.columns_not_found = columns_not_found
+
+    def warnings(self):
+        messages = []
+        if self.columns_with_all_NaNs:
+            messages.append("¡¡¡WARNING!!!: Las siguientes columnas tienen todos los valores a NaN; "
+                            + "; ".join(self.columns_with_all_NaNs))
+        if self.columns_not_found:
+            messages.append("¡¡¡WARNING!!!: Las siguientes columnas no aparecen en la lista de variables del archivo "
+                            "Excel de datos ORIGEN; " + "; ".join(self.columns_not_found))
+        return messages
+
 def Create_Partial_DF(variables_file_name,
                       variables_sheet_name,
                       vars_ORIGEN_col_name,
                       vars_DESTINO_col_name,
                       df_COMPLETE,
                       original_vars_list_COMPLETE,
-                      blnRename_columns,
-                      blnConsider_UNITS):
-
-    # Local variables
-    columns_with_all_NaNs_list = []
-    columns_with_all_NaNs_msg = ""
-    columns_not_found_in_original_list = []
-    columns_not_found_msg = ""
-    
-    # 1.2 Open file specifiying variables to be read from sheet variables_sheet_name (HEADER position does not need to be specified bacause it is 0)
-    df_vars = pd.read_excel(io=variables_file_name, sheet_name=variables_sheet_name)
-    
-    # Now, get Sheet ID, influent DATA
-    df_vars_ORIGEN_col_names = df_vars[vars_ORIGEN_col_name].dropna().values
-    df_PARTIAL = df_COMPLETE.loc[:, df_vars_ORIGEN_col_names]
-    
-    # IMPORTANT: run the following cheks:
-    # CHECK 1: Check if there has been any errors when pasrsing the data:
-    # A typical error consists of misswritting some letter of a column name, which trigers a warning
-    # ans returns all NaN values. We will check that.
-    #
-    # CHECK 2: Check if all columns ara in the original list of columns.
-    for col in df_PARTIAL.columns:
-        
-        # CHECK 1
-        if (df_PARTIAL[col].isnull().sum()== len(df_PARTIAL[col])):
-            
-            # Add column to list of columns with all NaNs
-            columns_with_all_NaNs_list.append(col)
-            
-            # Create and print a message
-            if (columns_with_all_NaNs_msg == ""):
-                # Message initialisation:
-                columns_with_all_NaNs_msg = "¡¡¡WARNING!!!: Las siguientes columnas tienen todos los valores a NaN"
-            
-            # Add name of column with all NaNs to message
-            columns_with_all_NaNs_msg = columns_with_all_NaNs_msg + "; " + col
-
-        # CHECK 2
-        if not (col in original_vars_list_COMPLETE):
-            # Add column to list of columns not found
-            columns_not_found_in_original_list.append(col)
-            
-            # Create and print a message
-            if (columns_not_found_msg == ""):
-                # Message initialisation:
-                columns_not_found_msg = "¡¡¡WARNING!!!: Las siguientes columnas no aparecen en la lista de variables del archivo Excel de datos ORIGEN"
-            
-            # Add name of column not found to message
-            columns_not_found_msg = columns_not_found_msg + "; " + col
-
-    # Print message, if columns with all NaNs exist
-    if (columns_with_all_NaNs_msg != ""):
-        print (columns_with_all_NaNs_msg)
-
-    # Print message, if not found columns exist
-    if (columns_not_found_msg != ""):
-        print (columns_not_found_msg)
-
-    # Rename colum names, if requested
-    if (blnRename_columns==True):
-        df_vars_DESTINO_col_names = df_vars[vars_DESTINO_col_name].values
-        for i in range(0, len(df_vars_ORIGEN_col_names)):
-            df_PARTIAL.rename(columns={df_vars_ORIGEN_col_names[i]: df_vars_DESTINO_col_names[i]}, inplace=True)
-
-    # VERY IMPORTANT: before returning the dataframe, convert all values to numeric
-    # IMPORTANT:
-    # 1. As we do not need to change to numeric column DATE_COLUMN_NAME, use a temporary variable
-    # 2. As we do not need to change to numeric row with information about UNITS, use a temporary variable
-    temp_df_PARTIAl_Date_Column = df_PARTIAL[DATE_COLUMN_NAME]
-    if (blnConsider_UNITS==True):
-        temp_df_UNITS = df_PARTIAL.iloc[0].values
-        
-    
-    # Convert values to numeric
-    df_PARTIAL = df_PARTIAL.apply(pd.to_numeric, errors='coerce')
-    
-    # Recover column DATE_COLUMN_NAME abd row with information about UNITS
-    df_PARTIAL[DATE_COLUMN_NAME] = temp_df_PARTIAl_Date_Column
-    if (blnConsider_UNITS==True):
-        df_PARTIAL.loc[0, :] = temp_df_UNITS
-    
-    # Return partial datafrme, list of problematic columns and list of columns not found
-    return df_PARTIAL, columns_with_all_NaNs_list, columns_not_found_in_original_list
\ No newline at end of file
+                      blnRename_columns):
+    """Creates a partial DF with the variables to be read from a sheet of the variables file
+
+    The variables are projected, renamed, converted to float64 and checked in one pass: their values are written
+    straight into a single float64 block, which is the only copy made of the data.
+
+    Parameters:
+        variables_file_name: Variables file
+        variables_sheet_name: Sheet of the variables file
+        vars_ORIGEN_col_name: Column of the sheet with the original variable names
+        vars_DESTINO_col_name: Column of the sheet with the new variable names
+        df_COMPLETE: Dataframe with all the columns of a sheet of the INPUT data Excel file, DATE_COLUMN_NAME included
+        original_vars_list_COMPLETE: Original list of columns
+        blnRename_columns: If True, variables are renamed to their new names
+
+    Returns:
+        df_PARTIAL: Dataframe with DATE_COLUMN_NAME as index and a float64 column per variable
+        report: PartialDFReport
+    """
+    with span('partial_df', sheet=variables_sheet_name) as sp:
+        # Get variables to be read from sheet variables_sheet_name. All the sheets of the variables file are read only
+        # once and kept in the variables registry (see parser_edar40/variables.py)
+        vars_mapping = get_variables_mapping(load_variables_registry(variables_file_name),
+                                             variables_sheet_name,
+                                             vars_ORIGEN_col_name,
+                                             vars_DESTINO_col_name)
+        origen_col_names = [col for col in vars_mapping if col != DATE_COLUMN_NAME]
+        destino_col_names = [vars_mapping[col] if blnRename_columns else col for col in origen_col_names]
+
+        # CHECK 2: Check if all columns are in the original list of columns
+        original_vars = set(original_vars_list_COMPLETE)
+        columns_not_found = [col for col in origen_col_names if col not in original_vars]
+
+        # Projection and conversion to numeric (float), column by column into one preallocated block.
+        # NOTE: the block is allocated in Fortran order, so that every column is contiguous and the dataframe is created
+        #       on top of it without copying.
+        values = np.empty((len(df_COMPLETE), len(origen_col_names)), dtype='float64', order='F')
+        for i, col in enumerate(origen_col_names):
+            if col not in df_COMPLETE.columns:
+                values[:, i] = np.nan
+                continue
+            # NOTE: astype + values (not to_numpy(na_value=...)), which pandas 0.25 does not support
+            values[:, i] = pd.to_numeric(df_COMPLETE[col], errors='coerce').astype('float64').values
+
+        # CHECK 1: Check if there has been any errors when parsing the data (columns with all NaN values)
+        all_NaNs = np.isnan(values).all(axis=0) if len(values) else np.ones(len(origen_col_names), dtype=bool)
+        columns_with_all_NaNs = [col for col, all_NaN in zip(origen_col_names, all_NaNs)
+                                 if all_NaN and col not in columns_not_found]
+
+        index = pd.DatetimeIndex(df_COMPLETE[DATE_COLUMN_NAME], name=DATE_COLUMN_NAME)
+        if not index.is_unique:
+            raise ValueError(f'Fechas duplicadas en la hoja {variables_sheet_name}: '
+                             f'{list(index[index.duplicated()].unique())}')
+        df_PARTIAL = pd.DataFrame(values, index=index, columns=destino_col_names, copy=False)
+
+        report = PartialDFReport(variables_sheet_name, len(df_PARTIAL), len(destino_col_names),
+                                 columns_with_all_NaNs, columns_not_found)
+        sp.set_shape(df_PARTIAL)
+    return df_PARTIAL, report
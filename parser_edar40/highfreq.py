@@ -0,0 +1,186 @@
+# Required Libraries
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Constants
+from parser_edar40.common.constants import (DATE_COLUMN_NAME, IN_YOKO_HF_DATA_DIR, YOKO_HF_FILE_PATTERN,
+                                             YOKO_HF_SEPARATOR, YOKO_HF_DECIMAL, YOKO_HF_TIMESTAMP_COLUMN_NAME,
+                                             YOKO_HF_TIMESTAMP_FORMAT, YOKO_HF_STATISTICS, OUT_YOKO_HF_DATASET_DIR,
+                                             DATASET_COMPRESSION)
+
+# Dates
+from parser_edar40.dates import day_keys, day_keys_index
+
+# Parquet dataset
+from parser_edar40.store import dataset_table, dataset_tmp_dir, replace_dataset, YEAR_COLUMN_NAME, MONTH_COLUMN_NAME
+
+# Instrumentation
+from parser_edar40.instrumentation import span, report_warning
+
+# High frequency YOKO (SCADA) exports.
+# Sheet YOKO of the INPUT data Excel file only has one reading per day. The SCADA exports have all the readings of
+# every signal; they are read in chunks of rows (bounded memory, whatever the size of the exports) and, in the same
+# pass, every chunk is stored in the high frequency dataset and its complete days are aggregated into daily statistics.
+# Readings must be sorted by time (within a file, and files sorted by name): the last day of every chunk is carried to
+# the next one, since it may go on there.
+
+# Define function to list the high frequency YOKO exports, sorted by name
+def list_yoko_hf_files(data_dir=IN_YOKO_HF_DATA_DIR):
+    data_dir = Path(data_dir)
+    return sorted(data_dir.glob(YOKO_HF_FILE_PATTERN)) if data_dir.is_dir() else []
+
+# Define function to get the name of the column of a daily statistic of a variable (the mean keeps the variable name)
+def statistic_column_name(name, statistic):
+    return name if statistic == 'mean' else f'{name}_{statistic}'
+
+def daily_statistics(keys, values):
+    """Works out the daily statistics (YOKO_HF_STATISTICS) of the readings of complete days
+
+    Parameters:
+        keys: Day keys of the readings (see parser_edar40/dates.py), sorted
+        values: 2D float64 array with one row per reading and one column per signal (NaN for missing readings)
+
+    Returns:
+        days: Day keys of the days
+        statistics: Dictionary with statistic as key and a 2D array (one row per day, one column per signal) as value
+    """
+    days, starts = np.unique(keys, return_index=True)
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0) / counts
+    statistics = {'mean': mean,
+                  'min': np.fmin.reduceat(values, starts, axis=0),
+                  'max': np.fmax.reduceat(values, starts, axis=0)}
+
+    # Percentiles need all the readings of the day
+    ends = np.append(starts[1:], len(keys))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        statistics['p95'] = np.vstack([np.nanpercentile(values[start:end], 95, axis=0)
+                                       for start, end in zip(starts, ends)]) if len(days) else np.empty((0, values.shape[1]))
+    return days, {statistic: statistics[statistic] for statistic in YOKO_HF_STATISTICS}
+
+# Define function to read the chunks of a high frequency export: readings (DatetimeIndex) of the signals requested
+def read_yoko_hf_chunks(file_name, signals, chunk_rows):
+    wanted = set(signals) | {YOKO_HF_TIMESTAMP_COLUMN_NAME}
+    for chunk in pd.read_csv(file_name, sep=YOKO_HF_SEPARATOR, decimal=YOKO_HF_DECIMAL, encoding='latin-1',
+                             usecols=lambda col: col in wanted, chunksize=chunk_rows):
+        timestamps = pd.to_datetime(chunk[YOKO_HF_TIMESTAMP_COLUMN_NAME], format=YOKO_HF_TIMESTAMP_FORMAT,
+                                    errors='coerce')
+        values = chunk.reindex(columns=signals).apply(pd.to_numeric, errors='coerce').astype('float64')
+        values.index = pd.DatetimeIndex(timestamps, name=DATE_COLUMN_NAME)
+        yield values[values.index.notna()].sort_index(kind='mergesort')
+
+def ingest_yoko_hf(files, mapping, chunk_rows, dataset_dir=OUT_YOKO_HF_DATASET_DIR, compression=DATASET_COMPRESSION):
+    """Reads the high frequency YOKO exports in chunks, stores their readings in a Parquet dataset partitioned by year
+    and month, and works out the daily statistics of every signal
+
+    Parameters:
+        files: High frequency exports (see list_yoko_hf_files)
+        mapping: Dictionary with signal name (column ORIGEN) as key and variable name (column DESTINO) as value
+        chunk_rows: Number of rows read at a time
+        dataset_dir: Directory of the high frequency dataset (it is replaced)
+        compression: Parquet compression codec
+
+    Returns:
+        df: Dataframe with DATE_COLUMN_NAME as index and the daily statistics of every variable (see
+            statistic_column_name)
+    """
+    signals = list(mapping)
+    names = [mapping[signal] for signal in signals]
+    tmp_dir = dataset_tmp_dir(dataset_dir)
+    schema = None
+
+    days_done, statistics_done = [], {statistic: [] for statistic in YOKO_HF_STATISTICS}
+    carry = None
+    open_day = None
+    skipped = 0
+    with span('yoko_hf_chunks', files=len(files)) as sp:
+        rows = 0
+        for file_name in files:
+            for chunk in read_yoko_hf_chunks(file_name, signals, chunk_rows):
+                chunk.columns = names
+                keys = day_keys(chunk.index)
+
+                # Readings of days already aggregated (before the day carried) can not be added anymore
+                if open_day is not None and len(keys) and keys[0] < open_day:
+                    late = keys < open_day
+                    skipped += int(late.sum())
+                    chunk, keys = chunk[~late], keys[~late]
+                if len(chunk) == 0:
+                    continue
+                rows += len(chunk)
+
+                # Store the readings of the chunk
+                table = dataset_table(chunk, {})
+                schema = schema or table.schema
+                pq.write_to_dataset(table, root_path=str(tmp_dir), partition_cols=[YEAR_COLUMN_NAME, MONTH_COLUMN_NAME],
+                                    compression=compression)
+
+                # Aggregate the complete days; the last day goes on in the next chunk
+                if carry is not None:
+                    chunk = pd.concat([carry, chunk])
+                    keys = np.concatenate([day_keys(carry.index), keys])
+                complete = keys < keys[-1]
+                if complete.any():
+                    days, statistics = daily_statistics(keys[complete], chunk.to_numpy()[complete])
+                    days_done.append(days)
+                    for statistic, values in statistics.items():
+                        statistics_done[statistic].append(values)
+                carry = chunk[~complete]
+                open_day = keys[-1]
+
+        if carry is not None:
+            days, statistics = daily_statistics(day_keys(carry.index), carry.to_numpy())
+            days_done.append(days)
+            for statistic, values in statistics.items():
+                statistics_done[statistic].append(values)
+        sp.rows, sp.columns = rows, len(names)
+
+    if skipped:
+        report_warning(f"¡¡¡WARNING!!!: YOKO alta frecuencia: {skipped} lecturas fuera de orden no se han agregado")
+
+    if schema is not None:
+        pq.write_metadata(schema, str(tmp_dir / '_common_metadata'))
+        replace_dataset(tmp_dir, dataset_dir)
+
+    # Daily statistics, with the columns of every variable together
+    index = day_keys_index(np.concatenate(days_done) if days_done else [])
+    statistics = {statistic: np.vstack(values) if values else np.empty((0, len(names)))
+                  for statistic, values in statistics_done.items()}
+    return pd.DataFrame({statistic_column_name(name, statistic): statistics[statistic][:, i]
+                         for i, name in enumerate(names) for statistic in YOKO_HF_STATISTICS}, index=index)
+
+def merge_yoko_hf(df_YOKO, units_YOKO, df_HF):
+    """Merges the daily statistics of the high frequency YOKO exports into the daily data of sheet YOKO: the daily
+    means replace the values of sheet YOKO (on the days with high frequency readings) and the other statistics are
+    added after every variable, with its UNITS
+
+    Parameters:
+        df_YOKO: Dataframe of sheet YOKO, with DATE_COLUMN_NAME as index
+        units_YOKO: UNITS of the variables of sheet YOKO
+        df_HF: Daily statistics (see ingest_yoko_hf)
+
+    Returns:
+        df_YOKO: Dataframe with the dates of both dataframes, sorted
+        units_YOKO: UNITS of all its variables
+    """
+    names = list(df_YOKO.columns)
+    df_YOKO = df_HF[[col for col in names if col in df_HF.columns]].combine_first(df_YOKO)
+    columns, units = [], dict(units_YOKO)
+    for name in names:
+        columns.append(name)
+        for statistic in YOKO_HF_STATISTICS:
+            col = statistic_column_name(name, statistic)
+            if col != name and col in df_HF.columns:
+                columns.append(col)
+                units[col] = units_YOKO.get(name)
+    df_YOKO = pd.concat([df_YOKO, df_HF.reindex(df_YOKO.index)[[col for col in columns if col not in df_YOKO.columns]]],
+                        axis=1)[columns]
+    df_YOKO.index.name = DATE_COLUMN_NAME
+    return df_YOKO, units
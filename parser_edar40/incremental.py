@@ -0,0 +1,89 @@
+# Required Libraries
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Constants
+from parser_edar40.common.constants import INCREMENTAL_STATE_FILE_NAME, PARSER_CACHE_VERSION
+
+# IMPORTANT: the incremental parse relies on the data being appended, i.e. operators only add new days to the INPUT
+# data Excel file and to the meteo files of the current month. In order to detect any other change, the data of every
+# source already processed is split in blocks (one per month) and a checksum of each block is kept in the state.
+
+def load_state():
+    try:
+        with open(INCREMENTAL_STATE_FILE_NAME, 'r') as f:
+            state = json.load(f)
+    except (OSError, IOError, ValueError):
+        return None
+    return state if state.get('version') == PARSER_CACHE_VERSION else None
+
+def save_state(state):
+    INCREMENTAL_STATE_FILE_NAME.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file_name = INCREMENTAL_STATE_FILE_NAME.with_name(f'{INCREMENTAL_STATE_FILE_NAME.name}.{os.getpid()}.tmp')
+    with open(tmp_file_name, 'w') as f:
+        json.dump({**state, 'version': PARSER_CACHE_VERSION}, f)
+    tmp_file_name.replace(INCREMENTAL_STATE_FILE_NAME)
+
+def block_checksums(df, last_date):
+    """Works out the checksums of the rows of a dataframe indexed by date up to a date, in blocks of one month
+
+    Parameters:
+        df: Dataframe with a DatetimeIndex and numeric columns
+        last_date: Last date to be considered (condition <=)
+
+    Returns:
+        blocks: Dictionary with month ("YYYY-MM") as key and the SHA-1 of its dates and values as value
+    """
+    df = df[df.index <= last_date].sort_index(kind='mergesort')
+    dates = pd.DatetimeIndex(df.index)
+    days = dates.values.astype('datetime64[D]').astype(np.int64)
+    values = df.to_numpy(dtype='float64')
+    # All NaN values are hashed the same way, whatever the operation they come from
+    values = np.where(np.isnan(values), np.nan, values)
+
+    months = dates.year * 12 + dates.month - 1
+    boundaries = np.concatenate([[0], np.flatnonzero(np.diff(months)) + 1, [len(df)]]) if len(df) else []
+    blocks = {}
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        sha = hashlib.sha1(days[first:last].tobytes())
+        sha.update(np.ascontiguousarray(values[first:last]).tobytes())
+        blocks[dates[first].strftime('%Y-%m')] = sha.hexdigest()
+    return blocks
+
+def create_state(key, last_date, columns, sources):
+    """Creates the state of the incremental parse after processing all the data up to a date
+
+    Parameters:
+        key: Key of the configuration of the parser; if it changes, everything is parsed again
+        last_date: Last date processed
+        columns: Columns of the joined data
+        sources: Dictionary with source name as key and its dataframe as value
+
+    Returns:
+        state: Dictionary to be saved with save_state
+    """
+    last_date = pd.Timestamp(last_date)
+    return {'key': key,
+            'last_date': last_date.strftime('%Y-%m-%d'),
+            'columns': list(columns),
+            'sources': {name: {'columns': list(df.columns),
+                               'last_date': df.index.max().strftime('%Y-%m-%d') if len(df) else None,
+                               'blocks': block_checksums(df, last_date)}
+                        for name, df in sources.items()}}
+
+def modified_sources(state, sources):
+    """Returns the names of the sources whose data up to the last date processed has been modified since the state
+    was created (columns changed, rows added, removed or modified)"""
+    last_date = pd.Timestamp(state['last_date'])
+    modified = []
+    for name, df in sources.items():
+        source_state = state['sources'].get(name)
+        if (source_state is None
+                or source_state['columns'] != list(df.columns)
+                or source_state['blocks'] != block_checksums(df, last_date)):
+            modified.append(name)
+    return modified
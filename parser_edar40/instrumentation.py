@@ -0,0 +1,194 @@
+# Required Libraries
+import json
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+# Constants
+from parser_edar40.common.constants import PARSER_RUN_REPORTS_DIR
+
+# Spans of the parser.
+# Every step of the parser runs within a span, which records its wall and CPU time, the rows and columns it processes
+# and, if memory tracing is enabled (see start_run), the peak of memory it allocates. Finished spans are kept in this
+# process until they are collected by the run report (spans of worker processes are sent back to the parser process,
+# see parser_edar40/stages.py).
+
+# The peak of every span needs tracemalloc.reset_peak (Python 3.9+). Without it the peak since tracing started would be
+# reported for every span, therefore memory is not traced and memory_peak_mb is left as None.
+SPAN_MEMORY_PEAKS = hasattr(tracemalloc, 'reset_peak')
+
+class Span:
+    """Step of the parser
+
+    Attributes:
+        name: Name of the step
+        parent: Name of the span this one runs within (None for the outermost one)
+        attrs: Dictionary with other information about the step (e.g. the sheet being parsed)
+        rows, columns: Size of the data processed by the step (see set_shape)
+        wall_seconds: Wall time of the step
+        cpu_seconds: CPU time of the step (of its process)
+        memory_peak_mb: Peak of memory allocated by the step, with respect to the memory allocated when it started
+                        (only if memory tracing is enabled and SPAN_MEMORY_PEAKS)
+        warnings: Warnings reported during the step (see report_warning)
+    """
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.parent = parent
+        self.attrs = dict(attrs or {})
+        self.pid = os.getpid()
+        self.rows = None
+        self.columns = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.memory_peak_mb = None
+        self.warnings = []
+        self._peak = 0
+
+    # Define function to set the size of the data processed, from a dataframe (or a dataframe and its UNITS)
+    def set_shape(self, df):
+        if isinstance(df, tuple):
+            df = df[0]
+        if hasattr(df, 'shape') and len(df.shape) == 2:
+            self.rows, self.columns = int(df.shape[0]), int(df.shape[1])
+
+    def to_dict(self):
+        return {'name': self.name, 'parent': self.parent, 'pid': self.pid, **self.attrs,
+                'rows': None if self.rows is None else int(self.rows),
+                'columns': None if self.columns is None else int(self.columns),
+                'wall_seconds': self.wall_seconds, 'cpu_seconds': self.cpu_seconds,
+                'memory_peak_mb': self.memory_peak_mb, 'warnings': self.warnings}
+
+# Fields of every span (any other field is an attribute of the span)
+SPAN_FIELDS = ('name', 'parent', 'pid', 'rows', 'columns', 'wall_seconds', 'cpu_seconds', 'memory_peak_mb', 'warnings')
+
+_finished = []
+_stack = []
+_warnings = []
+
+@contextmanager
+def span(name, **attrs):
+    """Runs a step of the parser within a span
+
+    Usage:
+        with span('partial_df', sheet=sheet_name) as sp:
+            ...
+            sp.set_shape(df)
+    """
+    sp = Span(name, _stack[-1].name if _stack else None, attrs)
+    tracing = SPAN_MEMORY_PEAKS and tracemalloc.is_tracing()
+    if tracing:
+        start_current, peak_before = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    _stack.append(sp)
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield sp
+    finally:
+        sp.wall_seconds = time.perf_counter() - start_wall
+        sp.cpu_seconds = time.process_time() - start_cpu
+        _stack.pop()
+        if tracing:
+            # The peak is reset by every span, therefore the peaks of the inner spans are passed to the outer one
+            sp._peak = max(sp._peak, tracemalloc.get_traced_memory()[1])
+            sp.memory_peak_mb = (sp._peak - start_current) / 2 ** 20
+            if _stack:
+                _stack[-1]._peak = max(_stack[-1]._peak, peak_before, sp._peak)
+        _finished.append(sp.to_dict())
+
+# Define function to report a warning of the parser: it is printed and kept in the current span and in the run report
+def report_warning(message):
+    print(message)
+    if _stack:
+        _stack[-1].warnings.append(message)
+    _warnings.append(message)
+
+# Define function to get (and forget) the spans finished in this process, as dictionaries
+def collect_spans():
+    spans = list(_finished)
+    _finished.clear()
+    return spans
+
+# Define function to add the spans finished in another process (e.g. a worker process)
+def add_spans(spans):
+    _finished.extend(spans)
+    for sp in spans:
+        _warnings.extend(sp['warnings'])
+
+def start_run(blnTrace_memory=False):
+    """Starts the instrumentation of a parser run: forgets the spans and warnings of previous runs and, if requested,
+    starts tracing memory allocations (tracemalloc; it slows down the parser; see SPAN_MEMORY_PEAKS)"""
+    _finished.clear()
+    _warnings.clear()
+    if blnTrace_memory and not SPAN_MEMORY_PEAKS:
+        report_warning('¡¡¡WARNING!!!: La memoria de cada paso del parser solo se mide con Python 3.9 o posterior '
+                       '(tracemalloc.reset_peak)')
+    elif blnTrace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def write_run_report(info=None, report_dir=PARSER_RUN_REPORTS_DIR, keep=30):
+    """Writes the JSON report of a parser run (<report_dir>/parser_<date>.json) with all its spans and warnings, and
+    removes the oldest reports, so that only the last keep reports are kept
+
+    Parameters:
+        info: Dictionary with other information about the run (e.g. the stages executed)
+        report_dir: Directory of the reports
+        keep: Number of reports to be kept
+
+    Returns:
+        report: Dictionary with the report
+    """
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    report = {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+              **(info or {}),
+              'max_rss_mb': usage.ru_maxrss / 1024,
+              'warnings': list(_warnings),
+              'spans': collect_spans()}
+
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    file_name = report_dir / f'parser_{time.strftime("%Y%m%d_%H%M%S")}.json'
+    tmp_file_name = file_name.with_name(f'{file_name.name}.{os.getpid()}.tmp')
+    with open(tmp_file_name, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    tmp_file_name.replace(file_name)
+
+    for old_file in sorted(report_dir.glob('parser_*.json'))[:-keep]:
+        old_file.unlink()
+    return report
+
+def load_last_run_report(report_dir=PARSER_RUN_REPORTS_DIR):
+    files = sorted(Path(report_dir).glob('parser_*.json'))
+    if not files:
+        return None
+    with open(files[-1], 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Define function to format a run report as metrics in the Prometheus text format (one series per span, labelled with
+# its name and its attributes)
+def metrics_text(report):
+    lines = []
+    if report is None:
+        return ''
+    metrics = [('wall_seconds', 'Tiempo (s) de cada paso del último parser'),
+               ('cpu_seconds', 'Tiempo de CPU (s) de cada paso del último parser'),
+               ('rows', 'Filas procesadas por cada paso del último parser'),
+               ('memory_peak_mb', 'Memoria máxima (MB) de cada paso del último parser')]
+    for metric, description in metrics:
+        lines.append(f'# HELP edar40_parser_span_{metric} {description}')
+        lines.append(f'# TYPE edar40_parser_span_{metric} gauge')
+        for sp in report['spans']:
+            if sp.get(metric) is not None:
+                labels = {'span': sp['name'], **{key: value for key, value in sp.items()
+                                                 if key not in SPAN_FIELDS and isinstance(value, (str, bool))}}
+                labels = ','.join('{}="{}"'.format(key, str(value).replace('"', "'")) for key, value in labels.items())
+                lines.append(f'edar40_parser_span_{metric}{{{labels}}} {sp[metric]}')
+    lines.append('# TYPE edar40_parser_max_rss_mb gauge')
+    lines.append(f'edar40_parser_max_rss_mb {report["max_rss_mb"]}')
+    lines.append('# TYPE edar40_parser_warnings gauge')
+    lines.append(f'edar40_parser_warnings {len(report["warnings"])}')
+    return '\n'.join(lines) + '\n'
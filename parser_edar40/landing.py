@@ -0,0 +1,247 @@
+# Required Libraries
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# Constants
+from parser_edar40.common.constants import RAW_CACHE_DIR
+
+# Stages
+from parser_edar40.stages import file_hash
+
+# Variables
+from parser_edar40.variables import to_json_value
+
+MANIFEST_FILE_NAME = 'manifest.json'
+
+# Define function to create unique column names from a HEADER row, the same way pandas does when parsing an Excel
+# sheet with header: empty cells are named "Unnamed: <position>" and duplicated names get a ".<n>" suffix
+# (e.g. CAUDAL, CAUDAL.1, CAUDAL.2). The variables files rely on these names.
+def dedup_column_names(header):
+    names = []
+    for i, name in enumerate(header):
+        if name is None or (isinstance(name, float) and pd.isnull(name)) or name == '':
+            names.append(f'Unnamed: {i}')
+        else:
+            names.append(str(name))
+
+    counts = {}
+    for i, name in enumerate(names):
+        cur_count = counts.get(name, 0)
+        while cur_count > 0:
+            counts[name] = cur_count + 1
+            name = f'{name}.{cur_count}'
+            cur_count = counts.get(name, 0)
+        names[i] = name
+        counts[name] = cur_count + 1
+    return names
+
+# Define function to split a sheet (parsed without header) into HEADER, UNITS and data rows
+def split_raw_sheet(df_raw, layout):
+    header = dedup_column_names(list(df_raw.iloc[layout['header']]))
+    units = [to_json_value(value) for value in df_raw.iloc[layout['units']]]
+
+    df_data = df_raw.iloc[layout['data']:].reset_index(drop=True)
+    df_data.columns = header
+    df_data = df_data.infer_objects()
+
+    # Columns mixing types (e.g. numbers and text) are stored as text, so that they can be written to Parquet.
+    # Columns without any value are stored as float.
+    for col in df_data.columns[df_data.dtypes == object]:
+        if df_data[col].isnull().all():
+            df_data[col] = df_data[col].astype('float64')
+        else:
+            df_data[col] = df_data[col].map(to_json_value)
+
+    return df_data, dict(zip(header, units))
+
+# Define function to convert the value of a cell to float, the same way pd.to_numeric(errors='coerce') does
+def cell_to_float(value):
+    if value is None or isinstance(value, bool):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return np.nan
+    return np.nan
+
+def stream_sheet(file_name, sheet_name, layout, columns):
+    """Reads a sheet of an Excel file row by row (openpyxl, read only mode), keeping only the requested columns plus
+    the first one (dates). Values are written straight into preallocated NumPy arrays, so that memory and time depend
+    on the number of requested columns, not on the width of the sheet.
+
+    Parameters:
+        file_name: Excel file
+        sheet_name: Sheet to be read
+        layout: Dictionary with the rows of the sheet's 'header', 'units' and 'data'
+        columns: Names of the columns to be read (HEADER names, as returned by dedup_column_names)
+
+    Returns:
+        df_data, units: tuple with the following variables
+            df_data: Dataframe with the first column (as read) and the requested columns found in the HEADER (float64)
+            units: Dictionary with the name of every column of the sheet (requested or not) as key and its UNITS as value
+    """
+    wb = load_workbook(file_name, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        rows = ws.iter_rows(values_only=True)
+
+        header_row, units_row = None, None
+        for i in range(layout['data']):
+            row = next(rows, ())
+            if i == layout['header']:
+                header_row = row
+            if i == layout['units']:
+                units_row = row
+        header = dedup_column_names(list(header_row or ()))
+        units_row = list(units_row or ()) + [None] * (len(header) - len(units_row or ()))
+        units = {name: to_json_value(value) for name, value in zip(header, units_row)}
+
+        # Positions of the requested columns. The first column (dates) is always read
+        positions = {name: i for i, name in enumerate(header)}
+        names = [header[0]] + [col for col in dict.fromkeys(columns) if col in positions and col != header[0]]
+        cols = [positions[name] for name in names[1:]]
+
+        # Preallocate the arrays (ws.max_row is taken from the dimensions of the sheet; grow them if it is wrong)
+        size = max((ws.max_row or 0) - layout['data'], 1024)
+        dates = np.empty(size, dtype=object)
+        values = np.full((size, len(cols)), np.nan, dtype='float64')
+
+        n = 0
+        for row in rows:
+            if n == size:
+                size *= 2
+                dates = np.resize(dates, size)
+                values = np.vstack([values, np.full((size - n, len(cols)), np.nan)])
+            width = len(row)
+            dates[n] = row[0] if width else None
+            values[n] = [cell_to_float(row[col]) if col < width else np.nan for col in cols]
+            n += 1
+    finally:
+        wb.close()
+
+    # Trailing empty rows are removed (pandas does the same)
+    filled = np.flatnonzero(pd.notnull(dates[:n]) | ~np.isnan(values[:n]).all(axis=1))
+    last = filled[-1] + 1 if len(filled) else 0
+    df_data = pd.DataFrame(values[:last], columns=names[1:])
+    df_dates = pd.Series(dates[:last], name=names[0]).infer_objects()
+    if df_dates.dtype == object:
+        df_dates = df_dates.map(to_json_value)
+    df_data.insert(0, names[0], df_dates)
+    return df_data, units
+
+def raw_cache_dir(file_name):
+    return RAW_CACHE_DIR / Path(file_name).stem
+
+# Every sheet is landed on its own (one Parquet file and one manifest per sheet), so that several sheets of the same
+# Excel file can be landed at the same time by different processes.
+def manifest_file_name(file_name, sheet_name):
+    return raw_cache_dir(file_name) / f'{sheet_name}.{MANIFEST_FILE_NAME}'
+
+def load_manifest(file_name, sheet_name):
+    try:
+        with open(manifest_file_name(file_name, sheet_name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, IOError, ValueError):
+        return None
+
+# Define function to write a file atomically (first to a temporary file, then renamed), so that a reader never finds
+# it half written
+def save_manifest(file_name, sheet_name, manifest):
+    out_file_name = manifest_file_name(file_name, sheet_name)
+    tmp_file_name = out_file_name.with_name(f'{out_file_name.name}.{os.getpid()}.tmp')
+    with open(tmp_file_name, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    tmp_file_name.replace(out_file_name)
+
+# Define function to check if the raw cache of a sheet of an Excel file is up to date.
+# If the file's mtime or size have changed, but not its hash (e.g. the file has been copied again), the manifest is updated.
+def is_landed(file_name, sheet_name, layout, columns=None):
+    manifest = load_manifest(file_name, sheet_name)
+    if manifest is None or manifest['layout'] != layout or manifest.get('columns') != columns:
+        return False
+    if not (raw_cache_dir(file_name) / manifest['file']).exists():
+        return False
+
+    stat = Path(file_name).stat()
+    if manifest['mtime_ns'] == stat.st_mtime_ns and manifest['size'] == stat.st_size:
+        return True
+
+    if manifest['sha256'] == file_hash(file_name):
+        manifest['mtime_ns'] = stat.st_mtime_ns
+        manifest['size'] = stat.st_size
+        save_manifest(file_name, sheet_name, manifest)
+        return True
+    return False
+
+def land_sheet(file_name, sheet_name, layout, columns=None):
+    """Decodes once a sheet of an Excel file, splits HEADER, UNITS and data rows and stores them in the raw cache:
+    a Parquet file with the data plus a manifest with the units, the layout, the columns and the mtime, size and hash
+    of the Excel file
+
+    Parameters:
+        file_name: Excel file
+        sheet_name: Sheet to be landed
+        layout: Dictionary with the rows of the sheet's 'header', 'units' and 'data'
+        columns: Columns to be landed (plus the first one), streaming the sheet (see stream_sheet). None to decode the
+                 whole sheet with pandas
+    """
+    # Measure computation time (start time).
+    start_t = time.time()
+    stat = Path(file_name).stat()
+
+    cache_dir = raw_cache_dir(file_name)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    if columns is not None:
+        df_data, units = stream_sheet(file_name, sheet_name, layout, columns)
+    else:
+        df_raw = pd.read_excel(file_name, sheet_name=sheet_name, header=None)
+        df_data, units = split_raw_sheet(df_raw, layout)
+    tmp_file_name = cache_dir / f'{sheet_name}.parquet.{os.getpid()}.tmp'
+    df_data.to_parquet(tmp_file_name, index=False)
+    tmp_file_name.replace(cache_dir / f'{sheet_name}.parquet')
+
+    save_manifest(file_name, sheet_name, {'source': str(file_name),
+                                          'mtime_ns': stat.st_mtime_ns,
+                                          'size': stat.st_size,
+                                          'sha256': file_hash(file_name),
+                                          'layout': layout,
+                                          'columns': columns,
+                                          'file': f'{sheet_name}.parquet',
+                                          'units': units})
+
+    end_t = time.time()
+    print("\nComputation time for landing sheet %s of Excel file is %g seconds.\n" %
+        (sheet_name, end_t - start_t))
+
+def read_raw_sheet(file_name, sheet_name, layouts, columns=None):
+    """Reads a sheet of an Excel file from the raw cache, landing it first if its cache is not up to date
+
+    Parameters:
+        file_name: Excel file
+        sheet_name: Sheet to be read
+        layouts: Dictionary with sheet name as key and a dictionary with the rows of its 'header', 'units' and 'data'
+                 as value
+        columns: Columns to be read (plus the first one). None for all of them
+
+    Returns:
+        df_data, units: tuple with the following variables
+            df_data: Dataframe with the data rows of the sheet and the HEADER as column names
+            units: Dictionary with the name of every column of the sheet as key and its UNITS as value
+    """
+    layout = layouts[sheet_name]
+    if not is_landed(file_name, sheet_name, layout, columns):
+        land_sheet(file_name, sheet_name, layout, columns)
+
+    manifest = load_manifest(file_name, sheet_name)
+    df_data = pd.read_parquet(raw_cache_dir(file_name) / manifest['file'])
+    return df_data, manifest['units']
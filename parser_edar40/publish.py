@@ -0,0 +1,79 @@
+# Required Libraries
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+# Constants
+from parser_edar40.common.constants import PUBLISHED_DIR
+
+# The parser writes its OUTPUT files in place (CSV files are rewritten, or appended to in the incremental parse), so
+# they must not be served from where they are written. After every run they are copied into a new version directory,
+# which is renamed into place once complete, and then the "current" link is switched to it. Consumers always read
+# through the "current" link, so they never find a file half written.
+
+VERSIONS_DIR_NAME = 'versions'
+CURRENT_LINK_NAME = 'current'
+
+# Define function to copy a file (or a directory) and flush it to disk
+def copy_synced(source, target):
+    if Path(source).is_dir():
+        shutil.copytree(source, target)
+        return
+    shutil.copyfile(source, target)
+    with open(target, 'rb') as f:
+        os.fsync(f.fileno())
+
+def publish_outputs(files, published_dir=PUBLISHED_DIR, keep=3):
+    """Publishes the OUTPUT files of a parser run as a new version
+
+    Parameters:
+        files: OUTPUT files (or directories, e.g. the Parquet dataset) to be published. Missing files are skipped
+        published_dir: Directory of the published versions
+        keep: Number of versions to be kept (the oldest ones are removed)
+
+    Returns:
+        version_dir: Directory of the new version
+    """
+    published_dir = Path(published_dir)
+    versions_dir = published_dir / VERSIONS_DIR_NAME
+    versions_dir.mkdir(parents=True, exist_ok=True)
+
+    # Version names sort by time and are unique, also for several runs within the same second (e.g. a --once run and
+    # a run triggered by the watcher): an existing version is never replaced, since it may be the one being served
+    now = time.time_ns()
+    version = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(now // 10 ** 9))}_{now % 10 ** 9:09d}_{os.getpid()}"
+    version_dir = versions_dir / version
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f'.{version}.', suffix='.tmp', dir=versions_dir))
+    for f in files:
+        if Path(f).exists():
+            copy_synced(f, tmp_dir / Path(f).name)
+    tmp_dir.rename(version_dir)
+
+    # Switch the current link (a new link is created and renamed over the previous one, which is atomic)
+    tmp_link = published_dir / f'.{CURRENT_LINK_NAME}.{os.getpid()}.tmp'
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+    os.symlink(Path(VERSIONS_DIR_NAME) / version, tmp_link)
+    os.replace(tmp_link, published_dir / CURRENT_LINK_NAME)
+
+    # Remove the oldest versions, but never the one the current link points to (it may have been switched by another
+    # run in the meantime)
+    versions = sorted(d for d in versions_dir.iterdir() if d.is_dir() and not d.name.startswith('.'))
+    for old_dir in versions[:-keep]:
+        if old_dir != version_dir and old_dir.name != current_version(published_dir):
+            shutil.rmtree(old_dir, ignore_errors=True)
+    return version_dir
+
+# Define function to get the name of the version the current link points to (None if nothing has been published yet)
+def current_version(published_dir=PUBLISHED_DIR):
+    try:
+        return Path(os.readlink(Path(published_dir) / CURRENT_LINK_NAME)).name
+    except OSError:
+        return None
+
+def current_dir(default_dir, published_dir=PUBLISHED_DIR):
+    """Returns the directory of the current published version, or default_dir if nothing has been published yet"""
+    current = Path(published_dir) / CURRENT_LINK_NAME
+    return current if current.exists() else Path(default_dir)
@@ -0,0 +1,214 @@
+# Required Libraries
+import hashlib
+import json
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pyarrow as pa
+
+# Constants
+from parser_edar40.common.constants import STAGES_CACHE_DIR, FILE_HASHES_CACHE_FILE_NAME, PARSER_CACHE_VERSION
+
+# Settings
+from parser_edar40.common.settings import blnUse_STAGE_CACHE
+
+# Instrumentation
+from parser_edar40.instrumentation import span, collect_spans, add_spans
+
+# Define function to work out the SHA-256 hash of a file.
+# IMPORTANT: hashing the complete ID workbook is not free, therefore hashes are stored in FILE_HASHES_CACHE_FILE_NAME
+# together with the file's mtime and size, and only recomputed when any of them changes.
+def file_hash(file_name, hashes_cache=None):
+    file_name = Path(file_name)
+    if not file_name.exists():
+        return None
+
+    stat = file_name.stat()
+    cached = hashes_cache.get(str(file_name)) if hashes_cache is not None else None
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    sha = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    if hashes_cache is not None:
+        hashes_cache[str(file_name)] = [stat.st_mtime_ns, stat.st_size, digest]
+    return digest
+
+def load_hashes_cache():
+    try:
+        with open(FILE_HASHES_CACHE_FILE_NAME, 'r') as f:
+            return json.load(f)
+    except (OSError, IOError, ValueError):
+        return {}
+
+def save_hashes_cache(hashes_cache):
+    FILE_HASHES_CACHE_FILE_NAME.parent.mkdir(parents=True, exist_ok=True)
+    with open(FILE_HASHES_CACHE_FILE_NAME, 'w') as f:
+        json.dump(hashes_cache, f)
+
+class Stage:
+    """Parser stage memoized on disk
+
+    The key of a stage is the hash of its name, the hashes of its input files, its configuration constants and the keys
+    of the stages it depends on. If a result with the same key exists in STAGES_CACHE_DIR (and all of the stage's
+    output files exist), the stage is not executed and the stored result is returned instead.
+
+    Attributes:
+        name: Name of the stage, used for the cache file name
+        func: Function computing the stage, called with the results of the depends stages as positional arguments
+        files: Input files of the stage
+        config: Configuration constants of the stage (any JSON serializable object)
+        depends: Stages whose results are passed to func
+        outputs: Files written by func. If any of them is missing, the stage is executed again
+        parallel: If True (and the stage has no depends), the stage may be executed in a worker process
+                  (see run_stages). func must then be a module level function returning a dataframe and the
+                  dictionary with its UNITS
+        executed: True if the stage has been executed (i.e. not loaded from the cache)
+        elapsed: Time (seconds) spent executing the stage or loading its result from the cache, dependencies excluded
+    """
+    def __init__(self, name, func, files=(), config=None, depends=(), outputs=(), hashes_cache=None, parallel=False):
+        self.name = name
+        self.func = func
+        self.files = list(files)
+        self.config = config
+        self.depends = list(depends)
+        self.outputs = list(outputs)
+        self.hashes_cache = hashes_cache
+        self.parallel = parallel
+        self._key = None
+        self._result = None
+        self._done = False
+        self.executed = False
+        self.elapsed = None
+
+    @property
+    def key(self):
+        if self._key is None:
+            key_info = {'version': PARSER_CACHE_VERSION,
+                        'name': self.name,
+                        'files': {str(f): file_hash(f, self.hashes_cache) for f in self.files},
+                        'config': self.config,
+                        'depends': [stage.key for stage in self.depends]}
+            self._key = hashlib.sha256(json.dumps(key_info, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return self._key
+
+    @property
+    def cache_file_name(self):
+        return STAGES_CACHE_DIR / f'{self.name}-{self.key[:20]}.pkl'
+
+    def is_cached(self):
+        return (blnUse_STAGE_CACHE
+                and self.cache_file_name.exists()
+                and all(Path(f).exists() for f in self.outputs))
+
+    def result(self):
+        if self._done:
+            return self._result
+
+        if self.is_cached():
+            print(f'Etapa {self.name}: sin cambios, cargando resultado de la caché')
+            with span(f'stage_{self.name}', cached=True) as sp:
+                with open(self.cache_file_name, 'rb') as f:
+                    self._result = pickle.load(f)
+                sp.set_shape(self._result)
+            self.elapsed = sp.wall_seconds
+        else:
+            args = [stage.result() for stage in self.depends]
+            print(f'Etapa {self.name}: ejecutando')
+            with span(f'stage_{self.name}') as sp:
+                result = self.func(*args)
+                sp.set_shape(result)
+            self.elapsed = sp.wall_seconds
+            self.set_result(result)
+
+        self._done = True
+        return self._result
+
+    # Define function to store the result of the stage once computed (here or in a worker process)
+    def set_result(self, result):
+        self._result = result
+        self._done = True
+        self.executed = True
+        if blnUse_STAGE_CACHE:
+            self.save()
+
+    def save(self):
+        STAGES_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_file_name = self.cache_file_name.with_suffix('.tmp')
+        with open(tmp_file_name, 'wb') as f:
+            pickle.dump(self._result, f, pickle.HIGHEST_PROTOCOL)
+        tmp_file_name.replace(self.cache_file_name)
+
+        # Remove results stored for previous keys of this stage
+        for old_file in STAGES_CACHE_DIR.glob(f'{self.name}-*.pkl'):
+            if old_file != self.cache_file_name:
+                old_file.unlink()
+
+# Define function to encode a dataframe as an Arrow IPC buffer, in order to send it from a worker process
+def frame_to_buffer(df):
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+# Define function to decode a dataframe encoded by frame_to_buffer
+def buffer_to_frame(buffer):
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+# Define function executed by the worker processes. Parallel stages return a dataframe and the dictionary with its UNITS.
+# The spans of the worker process are sent back to the parser process.
+def run_in_worker(name, func):
+    collect_spans()
+    with span(f'stage_{name}', worker=True) as sp:
+        df, units = func()
+        sp.set_shape(df)
+    return frame_to_buffer(df), units, sp.wall_seconds, collect_spans()
+
+# Define function to get the stages that will be executed in order to get the result of a stage
+def stages_to_execute(stage):
+    if stage.is_cached():
+        return []
+    return [stage] + [s for dependency in stage.depends for s in stages_to_execute(dependency)]
+
+def run_stages(stages, workers=1):
+    """Runs (or loads from the cache) all the final stages, i.e. those no other stage depends on.
+    Intermediate stages are only loaded or executed if some final stage needs them, or if any of their output files
+    is missing.
+
+    Parameters:
+        stages: List of Stage objects
+        workers: Number of worker processes. If greater than 1, all the parallel stages to be executed (e.g. the
+                 sheets of the INPUT data Excel file and the meteo files) are executed at the same time, each one in
+                 its own process
+
+    Returns:
+        executed: List with the names of the stages that have been executed
+    """
+    required = set(id(dependency) for stage in stages for dependency in stage.depends)
+    targets = [stage for stage in stages
+               if (id(stage) not in required) or (stage.outputs and not stage.is_cached())]
+
+    if workers > 1:
+        to_execute = {id(s): s for stage in targets for s in stages_to_execute(stage)}
+        parallel = [stage for stage in to_execute.values() if stage.parallel and not stage.depends]
+        if len(parallel) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(parallel))) as executor:
+                futures = []
+                for stage in parallel:
+                    print(f'Etapa {stage.name}: ejecutando en paralelo')
+                    futures.append((stage, executor.submit(run_in_worker, stage.name, stage.func)))
+                for stage, future in futures:
+                    buffer, units, elapsed, spans = future.result()
+                    add_spans(spans)
+                    stage.elapsed = elapsed
+                    stage.set_result((buffer_to_frame(buffer), units))
+
+    for stage in targets:
+        stage.result()
+    return [stage.name for stage in stages if stage.executed]
@@ -0,0 +1,135 @@
+# Required Libraries
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Constants
+from parser_edar40.common.constants import DATE_COLUMN_NAME, OUT_DATASET_DIR, DATASET_COMPRESSION
+
+# Partition columns of the dataset
+YEAR_COLUMN_NAME = 'year'
+MONTH_COLUMN_NAME = 'month'
+
+# Define function to create the Arrow table of a dataset, with the partition columns and the UNITS and data types in
+# its metadata. Variables are stored as float64, or float32 if so declared (see parser_edar40/dtypes.py); categoricals
+# are stored as their values (Parquet encodes them with a dictionary anyway) and restored by read_dataset.
+def dataset_table(df, units):
+    dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    df_data = df.astype({col: 'float64' for col, dtype in dtypes.items() if dtype != 'float32'})
+    df_data.index = pd.DatetimeIndex(df_data.index, name=DATE_COLUMN_NAME)
+    df_data = df_data.reset_index()
+    df_data[YEAR_COLUMN_NAME] = df_data[DATE_COLUMN_NAME].dt.year
+    df_data[MONTH_COLUMN_NAME] = df_data[DATE_COLUMN_NAME].dt.month
+
+    table = pa.Table.from_pandas(df_data, preserve_index=False)
+    return table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                          b'units': json.dumps(units, ensure_ascii=False).encode('utf-8'),
+                                          b'dtypes': json.dumps(dtypes, ensure_ascii=False).encode('utf-8')})
+
+# Define function to get the temporary directory where a dataset is written before replacing the previous one
+def dataset_tmp_dir(dataset_dir):
+    dataset_dir = Path(dataset_dir)
+    tmp_dir = dataset_dir.with_name(f'{dataset_dir.name}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return tmp_dir
+
+# Define function to replace a dataset by the one written in its temporary directory
+def replace_dataset(tmp_dir, dataset_dir):
+    dataset_dir = Path(dataset_dir)
+    old_dir = dataset_dir.with_name(f'{dataset_dir.name}.{os.getpid()}.old')
+    if dataset_dir.exists():
+        dataset_dir.rename(old_dir)
+    Path(tmp_dir).rename(dataset_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def write_dataset(df, units, dataset_dir=OUT_DATASET_DIR, compression=DATASET_COMPRESSION):
+    """Writes a dataframe indexed by date as a Parquet dataset partitioned by year and month
+    (<dataset_dir>/year=<year>/month=<month>/*.parquet). Variables are stored as float64 columns (float32 if so
+    declared, see dataset_table); their UNITS and data types are stored in the metadata of the dataset (file
+    _common_metadata). The dataset is written to a temporary directory first and then replaces the previous one.
+
+    Parameters:
+        df: Dataframe with DATE_COLUMN_NAME as index
+        units: Dictionary with variable name as key and its UNITS as value
+        dataset_dir: Directory of the dataset
+        compression: Parquet compression codec
+    """
+    # Measure computation time (start time).
+    start_t = time.time()
+    dataset_dir = Path(dataset_dir)
+
+    table = dataset_table(df, units)
+
+    tmp_dir = dataset_tmp_dir(dataset_dir)
+    pq.write_to_dataset(table, root_path=str(tmp_dir), partition_cols=[YEAR_COLUMN_NAME, MONTH_COLUMN_NAME],
+                        compression=compression)
+    pq.write_metadata(table.schema, str(tmp_dir / '_common_metadata'))
+
+    replace_dataset(tmp_dir, dataset_dir)
+
+    end_t = time.time()
+    print("\nComputation time for writing dataset %s is %g seconds.\n" %
+        (dataset_dir, end_t - start_t))
+
+def append_dataset(df, units, dataset_dir=OUT_DATASET_DIR, compression=DATASET_COMPRESSION):
+    """Appends rows to a dataset written by write_dataset. The rows are written as new files of their partitions, the
+    files already written are not modified. Dates must be after the last date of the dataset.
+
+    Parameters:
+        df: Dataframe with DATE_COLUMN_NAME as index and the same columns as the dataset
+        units: Dictionary with variable name as key and its UNITS as value
+        dataset_dir: Directory of the dataset
+        compression: Parquet compression codec
+    """
+    pq.write_to_dataset(dataset_table(df, units), root_path=str(dataset_dir),
+                        partition_cols=[YEAR_COLUMN_NAME, MONTH_COLUMN_NAME], compression=compression)
+
+# Define function to read a dictionary stored in the metadata of a dataset (b'units' or b'dtypes')
+def read_dataset_metadata(key, dataset_dir=OUT_DATASET_DIR):
+    metadata = pq.read_schema(str(Path(dataset_dir) / '_common_metadata')).metadata or {}
+    return json.loads(metadata.get(key, b'{}').decode('utf-8'))
+
+def read_dataset_units(dataset_dir=OUT_DATASET_DIR):
+    """Returns the UNITS of the variables of a dataset written by write_dataset, as a dictionary with variable name as
+    key and its UNITS as value"""
+    return read_dataset_metadata(b'units', dataset_dir)
+
+def read_dataset(columns=None, start=None, end=None, dataset_dir=OUT_DATASET_DIR):
+    """Reads a dataset written by write_dataset. Only the requested columns and the partitions (years) of the
+    requested dates are read.
+
+    Parameters:
+        columns: List of variables to be read (None for all of them)
+        start: First date to be read, "YYYY-MM-DD" (condition >=; None for no filtering)
+        end: Last date to be read, "YYYY-MM-DD" (condition <=; None for no filtering)
+        dataset_dir: Directory of the dataset
+
+    Returns:
+        df: Dataframe with DATE_COLUMN_NAME as index and the data types of the variables when written
+    """
+    start = pd.to_datetime(start) if start is not None else None
+    end = pd.to_datetime(end) if end is not None else None
+
+    filters = []
+    if start is not None:
+        filters.append((YEAR_COLUMN_NAME, '>=', int(start.year)))
+    if end is not None:
+        filters.append((YEAR_COLUMN_NAME, '<=', int(end.year)))
+
+    table = pq.read_table(str(dataset_dir),
+                          columns=[DATE_COLUMN_NAME] + list(columns) if columns is not None else None,
+                          filters=filters or None)
+    df = table.to_pandas()
+    df = df.drop(columns=[col for col in (YEAR_COLUMN_NAME, MONTH_COLUMN_NAME) if col in df.columns])
+    df = df.set_index(DATE_COLUMN_NAME).sort_index()
+    categories = [col for col, dtype in read_dataset_metadata(b'dtypes', dataset_dir).items()
+                  if dtype == 'category' and col in df.columns]
+    if categories:
+        df = df.astype({col: 'category' for col in categories})
+    return df.loc[start:end]
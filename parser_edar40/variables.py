@@ -0,0 +1,104 @@
+# Required Libraries
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# Constants
+from parser_edar40.common.constants import VARS_ORIGEN_COL_NAME, VARS_DESTINO_COL_NAME, VARS_CALCULADAS_COL_NAME
+
+# Registries already loaded by this process, with file name as key and ([mtime, size], registry) as value
+_registries = {}
+
+# Define function to store values in a JSON file: NaN values are stored as None, non string values as strings
+def to_json_value(value):
+    if value is None or (not isinstance(value, str) and pd.isnull(value)):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+def registry_cache_file_name(file_name):
+    file_name = Path(file_name)
+    return file_name.parent / '.cache' / f'{file_name.stem}.registry.json'
+
+def get_variables_mapping(registry, sheet_name, origen_col_name=VARS_ORIGEN_COL_NAME, destino_col_name=VARS_DESTINO_COL_NAME):
+    """Returns the mapping between two columns of a sheet of the variables file
+
+    Parameters:
+        registry: Variables registry (see load_variables_registry)
+        sheet_name: Sheet of the variables file
+        origen_col_name: Column with the original variable names
+        destino_col_name: Column with the new variable names
+
+    Returns:
+        mapping: Dictionary with original name as key and new name as value. Rows without original name are skipped
+                 and rows without new name keep the original one
+    """
+    columns = registry['columns'][sheet_name]
+    mapping = {}
+    for origen, destino in zip(columns.get(origen_col_name, []), columns.get(destino_col_name, [])):
+        if origen is not None:
+            mapping[origen] = destino if destino is not None else origen
+    return mapping
+
+def compile_variables_registry(file_name):
+    """Reads all the sheets of a variables file in one pass and compiles them into plain dictionaries
+
+    Parameters:
+        file_name: Variables Excel file (e.g. EDAR4.0_EDAR_Cartuja_VARIABLES_V5.0.xlsx or model_variables_mask.xlsx)
+
+    Returns:
+        registry: Dictionary with the following keys
+            columns: Dictionary with sheet name as key and a dictionary with column name as key and the list of its
+                     values (None for empty cells) as value
+            mappings: Dictionary with sheet name as key and its ORIGEN->DESTINO mapping as value
+            calculated: Dictionary with sheet name as key and the list of its CALCULADAS variables as value
+    """
+    sheets = pd.read_excel(io=file_name, sheet_name=None)
+    registry = {'columns': {}, 'mappings': {}, 'calculated': {}}
+    for sheet_name, df_vars in sheets.items():
+        registry['columns'][sheet_name] = {str(col): [to_json_value(value) for value in df_vars[col]]
+                                           for col in df_vars.columns}
+        registry['mappings'][sheet_name] = get_variables_mapping(registry, sheet_name)
+        registry['calculated'][sheet_name] = [value for value in registry['columns'][sheet_name].get(VARS_CALCULADAS_COL_NAME, [])
+                                              if value is not None]
+    return registry
+
+def load_variables_registry(file_name):
+    """Loads the compiled registry of a variables file. The registry is kept in RAM and in a JSON file next to the
+    variables file, and only compiled again when the variables file's mtime or size change
+
+    Parameters:
+        file_name: Variables Excel file
+
+    Returns:
+        registry: Variables registry (see compile_variables_registry)
+    """
+    stat = Path(file_name).stat()
+    signature = [stat.st_mtime_ns, stat.st_size]
+
+    loaded = _registries.get(str(file_name))
+    if loaded is not None and loaded[0] == signature:
+        return loaded[1]
+
+    cache_file_name = registry_cache_file_name(file_name)
+    registry = None
+    try:
+        with open(cache_file_name, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['signature'] == signature:
+            registry = cached['registry']
+    except (OSError, IOError, ValueError, KeyError):
+        pass
+
+    if registry is None:
+        registry = compile_variables_registry(file_name)
+        cache_file_name.parent.mkdir(parents=True, exist_ok=True)
+        # Several worker processes may compile the registry at the same time: each one writes its own temporary file
+        tmp_file_name = cache_file_name.with_name(f'{cache_file_name.name}.{os.getpid()}.tmp')
+        with open(tmp_file_name, 'w', encoding='utf-8') as f:
+            json.dump({'signature': signature, 'registry': registry}, f, ensure_ascii=False)
+        tmp_file_name.replace(cache_file_name)
+
+    _registries[str(file_name)] = (signature, registry)
+    return registry
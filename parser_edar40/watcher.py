@@ -0,0 +1,114 @@
+# Required Libraries
+import threading
+import time
+from pathlib import Path
+
+# watchdog watches the INPUT files through inotify (on Linux). It is optional: if it is not installed, the parser worker
+# runs the parser on its cron schedule only.
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Constants
+from parser_edar40.common.constants import (IN_DATA_FILE_NAME, VARIABLES_TO_READ_FILE_NAME,
+                                             IN_METEO_FILE_NAME_PERIOD_1, IN_METEO_DATA_FILE_DIR, IN_YOKO_HF_DATA_DIR)
+
+# Settings
+from parser_edar40.common.settings import blnIngest_YOKO_HF
+
+# INPUT files of the parser. Any file below IN_METEO_DATA_FILE_DIR (and IN_YOKO_HF_DATA_DIR, if the high frequency YOKO
+# exports are ingested) is an INPUT file as well. Other files of the data directory (e.g. the caches or the meteo files
+# written by the parser) are not watched, so that the parser does not trigger itself.
+WATCHED_FILE_NAMES = [IN_DATA_FILE_NAME, VARIABLES_TO_READ_FILE_NAME, IN_METEO_FILE_NAME_PERIOD_1]
+WATCHED_DIRS = [IN_METEO_DATA_FILE_DIR] + ([IN_YOKO_HF_DATA_DIR] if blnIngest_YOKO_HF else [])
+
+# Define function to check whether a path is an INPUT file of the parser. Temporary files (e.g. Excel lock files
+# "~$...", partial downloads) are not.
+def is_input_file(path):
+    path = Path(path).resolve()
+    if path.name.startswith(('~$', '.')) or path.suffix in ('.tmp', '.part', '.crdownload'):
+        return False
+    if any(path == Path(f).resolve() for f in WATCHED_FILE_NAMES):
+        return True
+    return any(Path(d).resolve() in path.parents for d in WATCHED_DIRS)
+
+class InputFilesHandler(FileSystemEventHandler):
+    """Handler of the file system events of the data directory. Every change of an INPUT file is passed to the
+    trigger (see ParserTrigger.notify)"""
+    def __init__(self, trigger):
+        self.trigger = trigger
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+            if path and is_input_file(path):
+                self.trigger.notify(path)
+
+class ParserTrigger:
+    """Runs the parser once the INPUT files stop changing
+
+    Copying the INPUT data Excel file or a month of meteo files produces bursts of events. The parser is run
+    debounce_seconds after the last event of a burst, and never less than min_interval_seconds after the start of the
+    previous run (events received in between are gathered into the next run). The run does not need to know which files
+    have changed: only the stages whose INPUT files hash differently are executed, the rest are loaded from the cache
+    (see parser_edar40/stages.py), and the incremental parse checks the sources itself (see parser_edar40/incremental.py).
+
+    Attributes:
+        run: Function running the parser
+        debounce_seconds: Time (seconds) without events before running the parser
+        min_interval_seconds: Minimum time (seconds) between the start of two runs
+    """
+    def __init__(self, run, debounce_seconds=30, min_interval_seconds=600):
+        self.run = run
+        self.debounce_seconds = debounce_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_run = None
+
+    # Define function to register a change of an INPUT file and (re)start the debounce timer
+    def notify(self, path):
+        with self._lock:
+            self._schedule(self.debounce_seconds)
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _fire(self):
+        with self._lock:
+            if self._last_run is not None:
+                wait = self._last_run + self.min_interval_seconds - time.monotonic()
+                if wait > 0:
+                    self._schedule(wait)
+                    return
+            self._timer = None
+            self._last_run = time.monotonic()
+        print('Parser: ficheros de entrada modificados')
+        self.run()
+
+def watch_input_files(trigger, data_dir=None):
+    """Starts watching the INPUT files of the parser
+
+    Parameters:
+        trigger: ParserTrigger notified of every change of an INPUT file
+        data_dir: Directory watched (recursively). By default, the directory of the INPUT data Excel file
+
+    Returns:
+        observer: watchdog observer (a running thread), or None if watchdog is not installed
+    """
+    if Observer is None:
+        print('¡¡¡WARNING!!!: watchdog no está instalado, no se vigilan los ficheros de entrada del parser')
+        return None
+    observer = Observer()
+    observer.schedule(InputFilesHandler(trigger), str(data_dir or IN_DATA_FILE_NAME.parent), recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
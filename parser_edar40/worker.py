@@ -0,0 +1,108 @@
+# Parser worker.
+# The parser runs in a process of its own, apart from the web server, so that it neither competes with the dashboards
+# for the GIL nor rewrites the files being served. Only one parser worker runs at a time: every worker takes an
+# exclusive lock on PARSER_LOCK_FILE_NAME and exits if another worker holds it (e.g. when every Gunicorn worker
+# starts one).
+#
+# Usage (from the root directory of the repository):
+#   python -m parser_edar40.worker          # run the parser every day at intParser_CRON_HOUR:intParser_CRON_MINUTE
+#   python -m parser_edar40.worker --once   # run the parser once and exit
+# If blnWatch_INPUT_FILES is set, the parser is run whenever the INPUT files change instead of at a fixed time (see
+# parser_edar40/watcher.py).
+
+# Required Libraries
+import argparse
+import fcntl
+import os
+import sys
+import threading
+from pathlib import Path
+
+# Constants
+from parser_edar40.common.constants import *
+
+# Settings
+from parser_edar40.common.settings import *
+
+# Parser
+from parser_edar40.app import parser, period_file_name
+
+# Publishing
+from parser_edar40.publish import publish_outputs
+
+# Watcher of the INPUT files
+from parser_edar40.watcher import ParserTrigger, watch_input_files
+
+# Lock to prevent two runs of the parser in the same worker at the same time
+run_lock = threading.Lock()
+
+# Define function to take the single-instance lock. The lock is released when the process exits, whatever the way.
+def acquire_lock(lock_file_name=PARSER_LOCK_FILE_NAME):
+    lock_file_name = Path(lock_file_name)
+    lock_file_name.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(lock_file_name, 'a+')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+# Define function to list the OUTPUT files of the parser to be published
+def output_files():
+    files = [OUT_VARS_ABSOLUTAS_FILE_NAME, OUT_VARS_RENDIMIENTOS_FILE_NAME]
+    files += [period_file_name(period) for period in PERIODS]
+    files += [ID_EDAR_CARTUJA_ID_sheet_column_names_FILE_NAME, ID_EDAR_CARTUJA_YOKO_sheet_column_names_FILE_NAME,
+              ID_EDAR_CARTUJA_ANALITICA_sheet_column_names_FILE_NAME]
+    if blnWrite_DATASET:
+        files.append(OUT_DATASET_DIR)
+    if blnIngest_YOKO_HF:
+        files.append(OUT_YOKO_HF_DATASET_DIR)
+    return files
+
+# Define function to run the parser and publish its OUTPUT files as a new version
+def run_parser():
+    with run_lock:
+        try:
+            parser()
+        except Exception as e:
+            # The last published version is kept
+            print(f'¡¡¡ERROR!!!: El parser ha fallado, no se publica una nueva versión; {e!r}')
+            return
+        version_dir = publish_outputs(output_files(), keep=intPublished_VERSIONS)
+    print(f'Parser: publicada la versión {version_dir}')
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Parser worker')
+    arg_parser.add_argument('--once', action='store_true', help='Ejecutar el parser una vez y salir')
+    args = arg_parser.parse_args()
+
+    lock_file = acquire_lock()
+    if lock_file is None:
+        print('Parser worker: ya hay otro parser worker en ejecución')
+        sys.exit(0)
+
+    if args.once:
+        run_parser()
+        return
+
+    if blnWatch_INPUT_FILES:
+        trigger = ParserTrigger(run_parser, intWatch_DEBOUNCE_SECONDS, intWatch_MIN_INTERVAL_SECONDS)
+        observer = watch_input_files(trigger)
+        if observer is not None:
+            # Changes made while the worker was not running
+            run_parser()
+            observer.join()
+            return
+
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    sched = BlockingScheduler()
+    sched.add_job(run_parser, 'cron', day_of_week='mon-sun', hour=intParser_CRON_HOUR, minute=intParser_CRON_MINUTE)
+    sched.start()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+# Required Libraries
+import os
+import sys
+from pathlib import Path
+
+# The parser reads its data with paths relative to the root of the repository (e.g. ./data/Meteo), therefore the tests
+# run from there
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+os.chdir(REPO_DIR)
@@ -0,0 +1,18 @@
+# Required Libraries
+import os
+
+# Parser
+from parser_edar40.app import list_year_months
+
+def test_list_year_months_sees_new_folders(tmp_path):
+    for folder in ['2018/Mayo', '2020/Enero', '2020/Febrero']:
+        os.makedirs(tmp_path / folder)
+    year_months = list_year_months(tmp_path)
+    assert list(year_months) == ['2018', '2020']
+    assert year_months['2018'][0] == 'Mayo' and year_months['2020'] == ['Enero', 'Febrero']
+
+    # Folders added later (e.g. while the parser worker runs) are listed by the next run
+    for folder in ['2020/Marzo', '2021/Enero']:
+        os.makedirs(tmp_path / folder)
+    year_months = list_year_months(tmp_path)
+    assert year_months['2020'] == ['Enero', 'Febrero', 'Marzo'] and year_months['2021'] == ['Enero']
@@ -0,0 +1,43 @@
+# Required Libraries
+import numpy as np
+import pandas as pd
+
+# Dates
+from parser_edar40.dates import day_keys, day_keys_index, join_on_day_keys, left_join_on_day_keys
+
+def test_day_keys():
+    index = pd.DatetimeIndex(['1970-01-01', '1970-01-02', '2019-09-30', '1969-12-31'])
+    keys = day_keys(index)
+    assert keys.dtype == np.int32
+    np.testing.assert_array_equal(keys, [0, 1, 18169, -1])
+    assert day_keys_index(keys).equals(index)
+
+def test_join_on_day_keys():
+    df_1 = pd.DataFrame({'a': [1.0, 2.0, 3.0, 4.0]},
+                        index=pd.DatetimeIndex(['2019-01-01', '2019-01-02', '2019-01-03', '2019-01-04']))
+    df_2 = pd.DataFrame({'b': [30.0, 10.0, 50.0], 'c': ['x', 'y', 'z']},
+                        index=pd.DatetimeIndex(['2019-01-03', '2019-01-01', '2019-01-05']))
+    df_3 = pd.DataFrame({'d': [7.0, 8.0, 9.0]},
+                        index=pd.DatetimeIndex(['2019-01-01', '2019-01-03', '2019-01-04']))
+
+    df = join_on_day_keys([df_1, df_2, df_3])
+    expected = pd.DataFrame({'a': [1.0, 3.0], 'b': [10.0, 30.0], 'c': ['y', 'x'], 'd': [7.0, 8.0]},
+                            index=pd.DatetimeIndex(['2019-01-01', '2019-01-03'], name=df.index.name))
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_left_join_on_day_keys():
+    df_left = pd.DataFrame({'a': [1.0, 2.0, 3.0]},
+                           index=pd.DatetimeIndex(['2019-01-02', '2019-01-01', '2019-01-09']))
+    df_right = pd.DataFrame({'b': [10.0, 20.0, 21.0, 40.0]},
+                            index=pd.DatetimeIndex(['2019-01-01', '2019-01-02', '2019-01-02', '2019-01-04']))
+
+    df = left_join_on_day_keys(df_left, df_right)
+    assert df.index.equals(df_left.index)
+    np.testing.assert_array_equal(df['a'].to_numpy(), [1.0, 2.0, 3.0])
+    # Duplicated dates take the first row; dates not found get NaN
+    np.testing.assert_array_equal(df['b'].to_numpy(), [20.0, 10.0, np.nan])
+
+def test_left_join_on_day_keys_empty_right():
+    df_left = pd.DataFrame({'a': [1.0]}, index=pd.DatetimeIndex(['2019-01-01']))
+    df = left_join_on_day_keys(df_left, pd.DataFrame({'b': []}, index=pd.DatetimeIndex([])))
+    assert list(df.columns) == ['a', 'b'] and np.isnan(df['b'].iloc[0])
@@ -0,0 +1,42 @@
+# Required Libraries
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Derived variables
+from parser_edar40.derived import compile_derived_plan, evaluate_derived_plan, check_expression
+
+def formulas(**declared):
+    return OrderedDict((name, (formula, 'ID')) for name, formula in declared.items())
+
+def test_plan_orders_by_dependencies():
+    plan = compile_derived_plan(formulas(c='b * 2', b='a + influente_P-PO4_conc', d='a - 1'),
+                                ['a', 'influente_P-PO4_conc'])
+    names = [derived.name for derived in plan]
+    assert names.index('b') < names.index('c')
+    assert sorted(names) == ['b', 'c', 'd']
+
+def test_plan_evaluation():
+    df = pd.DataFrame({'a': [1.0, 2.0, np.nan], 'influente_P-PO4_conc': [0.5, 0.5, 0.5]})
+    plan = compile_derived_plan(formulas(c='b * 2', b='a + influente_P-PO4_conc'), df.columns)
+    derived = evaluate_derived_plan(df, plan)
+    np.testing.assert_array_equal(derived['b'], [1.5, 2.5, np.nan])
+    np.testing.assert_array_equal(derived['c'], [3.0, 5.0, np.nan])
+
+def test_plan_circular_dependency():
+    with pytest.raises(ValueError, match='circular'):
+        compile_derived_plan(formulas(b='c + a', c='b * 2'), ['a'])
+
+def test_plan_skips_invalid_formulas():
+    plan = compile_derived_plan(formulas(b='a.__class__', c='b + 1', d='a ** 2'), ['a'])
+    assert [derived.name for derived in plan] == ['d']
+
+@pytest.mark.parametrize('expression', ['v0 + 1.5', '-v0 * (v1 - 2) / 3', 'v0 ** 2 % 7 // 1'])
+def test_check_expression_accepts_arithmetic(expression):
+    assert check_expression(expression, {'v0': 'a', 'v1': 'b'}) is None
+
+@pytest.mark.parametrize('expression', ['v0.real', 'v0[0]', 'abs(v0)', 'v2 + 1', "'a'", 'True', 'lambda: 0', 'v0 +'])
+def test_check_expression_rejects(expression):
+    assert check_expression(expression, {'v0': 'a', 'v1': 'b'}) is not None
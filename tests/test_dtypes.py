@@ -0,0 +1,31 @@
+# Required Libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# Data types
+from parser_edar40.dtypes import apply_dtypes, check_dtypes
+
+DTYPES = {None: 'float64', 'CAUDAL': 'float32', 'ALARMA': 'category'}
+
+def frame():
+    return pd.DataFrame({'CAUDAL': [1.5, np.nan], 'ALARMA': [0.0, 1.0], 'TEMPERATURA': [12.25, 13.0]})
+
+def test_apply_dtypes():
+    df = apply_dtypes(frame(), DTYPES)
+    assert {col: str(dtype) for col, dtype in df.dtypes.items()} == {'CAUDAL': 'float32', 'ALARMA': 'category',
+                                                                      'TEMPERATURA': 'float64'}
+    check_dtypes(df, DTYPES)
+
+    df_float64 = frame()
+    assert apply_dtypes(df_float64, {None: 'float64'}) is df_float64
+
+def test_check_dtypes_raises():
+    df = apply_dtypes(frame(), DTYPES)
+    df['CAUDAL'] = df['CAUDAL'].astype('float64')
+    df['TEMPERATURA'] = df['TEMPERATURA'].astype('float32')
+    with pytest.raises(ValueError) as error:
+        check_dtypes(df, DTYPES)
+    assert 'CAUDAL (float64, declarado float32)' in str(error.value)
+    assert 'TEMPERATURA (float32, declarado float64)' in str(error.value)
+    assert 'ALARMA' not in str(error.value)
@@ -0,0 +1,15 @@
+# Required Libraries
+import numpy as np
+import pandas as pd
+
+# Helpers
+from parser_edar40.helpers import write_csv
+
+def test_write_csv_whole_numbers(tmp_path):
+    df = pd.DataFrame({'DQO': [6.0, 6.5], 'TMAX': [6.0, np.nan], 'PREC': [0.25, -3.0]},
+                      index=pd.DatetimeIndex(['2019-01-01', '2019-01-02'], name='Fecha'))
+    write_csv(df, {'DQO': 'mg/l', 'TMAX': 'ºC'}, tmp_path / 'out.csv', True, ['TMAX', 'PREC'])
+    assert (tmp_path / 'out.csv').read_text(encoding='latin-1').splitlines() == [
+        'Fecha,DQO,TMAX,PREC', ',mg/l,ºC,', '2019-01-01,6.0,6,0.25', '2019-01-02,6.5,,-3']
+    # The dataframe is not modified
+    assert (df.dtypes == 'float64').all()
@@ -0,0 +1,63 @@
+# Required Libraries
+import numpy as np
+import pandas as pd
+import pytest
+
+# Constants
+from parser_edar40.common.constants import (YOKO_HF_SEPARATOR, YOKO_HF_DECIMAL, YOKO_HF_TIMESTAMP_COLUMN_NAME,
+                                             YOKO_HF_TIMESTAMP_FORMAT)
+
+# Dates
+from parser_edar40.dates import day_keys
+
+# High frequency YOKO exports
+from parser_edar40.highfreq import daily_statistics, ingest_yoko_hf
+
+# Store
+from parser_edar40.store import read_dataset
+
+def readings(start, periods, seed=0):
+    rng = np.random.RandomState(seed)
+    index = pd.DatetimeIndex(pd.date_range(start, periods=periods, freq='37min').values)
+    values = rng.normal(100.0, 10.0, size=(periods, 2))
+    values[rng.rand(periods, 2) < 0.1] = np.nan
+    return pd.DataFrame(values, index=index, columns=['FT-01', 'AIT-02'])
+
+def test_daily_statistics():
+    df = readings('2019-03-30 22:00', 300)
+    df.loc[df.index.normalize() == pd.Timestamp('2019-03-31'), 'AIT-02'] = np.nan
+
+    days, statistics = daily_statistics(day_keys(df.index), df.to_numpy())
+    groups = df.groupby(df.index.normalize())
+    np.testing.assert_array_equal(days, day_keys(groups.size().index))
+    np.testing.assert_allclose(statistics['mean'], groups.mean().to_numpy(), rtol=1e-12)
+    np.testing.assert_array_equal(statistics['min'], groups.min().to_numpy())
+    np.testing.assert_array_equal(statistics['max'], groups.max().to_numpy())
+    np.testing.assert_allclose(statistics['p95'], groups.quantile(0.95).to_numpy(), rtol=1e-12)
+
+def write_export(df, file_name):
+    df = df.copy()
+    df.insert(0, YOKO_HF_TIMESTAMP_COLUMN_NAME, df.index.strftime(YOKO_HF_TIMESTAMP_FORMAT))
+    df.to_csv(file_name, sep=YOKO_HF_SEPARATOR, decimal=YOKO_HF_DECIMAL, index=False, encoding='latin-1')
+
+@pytest.mark.parametrize('chunk_rows', [7, 50, 1000])
+def test_ingest_carries_days_between_chunks(tmp_path, chunk_rows):
+    # Two exports, the second one going on with the last day of the first one
+    df = readings('2019-03-30 22:00', 600)
+    write_export(df.iloc[:250], tmp_path / 'yoko_1.csv')
+    write_export(df.iloc[250:], tmp_path / 'yoko_2.csv')
+    mapping = {'FT-01': 'caudal', 'AIT-02': 'amonio'}
+
+    df_daily = ingest_yoko_hf([tmp_path / 'yoko_1.csv', tmp_path / 'yoko_2.csv'], mapping, chunk_rows,
+                              dataset_dir=tmp_path / 'dataset')
+
+    days, statistics = daily_statistics(day_keys(df.index), df.to_numpy())
+    assert day_keys(df_daily.index).tolist() == days.tolist()
+    for statistic, values in statistics.items():
+        for i, name in enumerate(mapping.values()):
+            column = name if statistic == 'mean' else f'{name}_{statistic}'
+            np.testing.assert_allclose(df_daily[column].to_numpy(), values[:, i], rtol=1e-12)
+
+    df_stored = read_dataset(dataset_dir=tmp_path / 'dataset')
+    assert len(df_stored) == len(df)
+    np.testing.assert_allclose(df_stored[list(mapping.values())].to_numpy(), df.to_numpy(), rtol=1e-12)
@@ -0,0 +1,46 @@
+# Required Libraries
+import numpy as np
+import pandas as pd
+
+# Incremental parse
+from parser_edar40.incremental import block_checksums, create_state, modified_sources
+
+def source(start='2019-01-20', periods=30):
+    index = pd.DatetimeIndex(pd.date_range(start, periods=periods, freq='D').values)
+    return pd.DataFrame({'a': np.arange(periods, dtype='float64'), 'b': np.nan}, index=index)
+
+def test_block_checksums_by_month():
+    df = source()
+    blocks = block_checksums(df, '2019-02-10')
+    assert list(blocks) == ['2019-01', '2019-02']
+    # Rows after the last date and the order of the rows do not change the checksums
+    assert block_checksums(df.iloc[::-1], '2019-02-10') == blocks
+    assert block_checksums(df.iloc[:22], '2019-02-10') == blocks
+    assert block_checksums(df.iloc[:12], '2019-02-10')['2019-01'] == blocks['2019-01']
+    assert block_checksums(df.iloc[:0], '2019-02-10') == {}
+
+def test_block_checksums_detect_changes():
+    df = source()
+    blocks = block_checksums(df, '2019-02-10')
+
+    modified = df.copy()
+    modified.iloc[15, 0] = -1.0
+    modified_blocks = block_checksums(modified, '2019-02-10')
+    assert modified_blocks['2019-01'] == blocks['2019-01']
+    assert modified_blocks['2019-02'] != blocks['2019-02']
+    assert block_checksums(df.drop(df.index[3]), '2019-02-10')['2019-01'] != blocks['2019-01']
+
+def test_modified_sources():
+    sources = {'ID': source(), 'METEO': source('2018-12-01', 90)}
+    state = create_state('key', '2019-02-10', ['a', 'b'], sources)
+    assert state['last_date'] == '2019-02-10'
+    assert modified_sources(state, sources) == []
+
+    # New days are not modifications
+    assert modified_sources(state, {**sources, 'ID': source(periods=60)}) == []
+
+    changed = sources['METEO'].copy()
+    changed.loc['2018-12-05', 'b'] = 1.0
+    assert modified_sources(state, {**sources, 'METEO': changed}) == ['METEO']
+    assert modified_sources(state, {**sources, 'ID': sources['ID'].rename(columns={'b': 'c'})}) == ['ID']
+    assert modified_sources(state, {**sources, 'YOKO': source()}) == ['YOKO']
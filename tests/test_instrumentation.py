@@ -0,0 +1,35 @@
+# Required Libraries
+import tracemalloc
+
+import pytest
+
+# Instrumentation
+from parser_edar40 import instrumentation
+from parser_edar40.instrumentation import span, start_run, collect_spans
+
+@pytest.fixture
+def tracing():
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    collect_spans()
+
+@pytest.mark.skipif(not instrumentation.SPAN_MEMORY_PEAKS, reason='tracemalloc.reset_peak requires Python 3.9')
+def test_span_memory_peaks(tracing):
+    start_run(True)
+    with span('outer'):
+        data = bytearray(8 * 2 ** 20)
+        del data
+        with span('inner'):
+            data = bytearray(2 * 2 ** 20)
+    peaks = {sp['name']: sp['memory_peak_mb'] for sp in collect_spans()}
+    assert 2 <= peaks['inner'] < 3
+    assert 8 <= peaks['outer'] < 9
+
+def test_span_memory_peaks_unavailable(tracing, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'SPAN_MEMORY_PEAKS', False)
+    start_run(True)
+    with span('step'):
+        pass
+    assert not tracemalloc.is_tracing()
+    assert collect_spans()[0]['memory_peak_mb'] is None
@@ -0,0 +1,48 @@
+# Required Libraries
+import os
+
+# Publication of the OUTPUT files
+from parser_edar40 import publish
+from parser_edar40.publish import publish_outputs, current_version, current_dir, VERSIONS_DIR_NAME, CURRENT_LINK_NAME
+
+def write_outputs(tmp_path, content):
+    (tmp_path / 'out').mkdir(exist_ok=True)
+    (tmp_path / 'out' / 'PERIOD_1.csv').write_text(content)
+    (tmp_path / 'out' / 'dataset' / 'year=2019').mkdir(parents=True, exist_ok=True)
+    (tmp_path / 'out' / 'dataset' / 'year=2019' / 'part.parquet').write_text(content)
+    return [tmp_path / 'out' / 'PERIOD_1.csv', tmp_path / 'out' / 'dataset', tmp_path / 'out' / 'missing.csv']
+
+def versions(published_dir):
+    return sorted(d.name for d in (published_dir / VERSIONS_DIR_NAME).iterdir())
+
+def test_publish_switches_current(tmp_path):
+    published_dir = tmp_path / 'published'
+    assert current_version(published_dir) is None
+    assert current_dir(tmp_path / 'out', published_dir) == tmp_path / 'out'
+
+    first = publish_outputs(write_outputs(tmp_path, 'first'), published_dir)
+    second = publish_outputs(write_outputs(tmp_path, 'second'), published_dir)
+
+    assert first != second and versions(published_dir) == [first.name, second.name]
+    assert current_version(published_dir) == second.name
+    assert os.readlink(published_dir / CURRENT_LINK_NAME) == os.path.join(VERSIONS_DIR_NAME, second.name)
+    current = current_dir(tmp_path / 'out', published_dir)
+    assert (current / 'PERIOD_1.csv').read_text() == 'second'
+    assert (current / 'dataset' / 'year=2019' / 'part.parquet').read_text() == 'second'
+    assert not (current / 'missing.csv').exists()
+    # Published files are copies: the parser may rewrite its OUTPUT files
+    assert (first / 'PERIOD_1.csv').read_text() == 'first'
+
+def test_publish_keeps_versions(tmp_path):
+    published_dir = tmp_path / 'published'
+    published = [publish_outputs(write_outputs(tmp_path, str(i)), published_dir, keep=2) for i in range(4)]
+    assert versions(published_dir) == [version_dir.name for version_dir in published[-2:]]
+    assert current_version(published_dir) == published[-1].name
+
+def test_publish_never_prunes_current(tmp_path, monkeypatch):
+    published_dir = tmp_path / 'published'
+    oldest = publish_outputs(write_outputs(tmp_path, 'oldest'), published_dir, keep=1)
+    # Another run switches the current link back to the oldest version while this one publishes
+    monkeypatch.setattr(publish, 'current_version', lambda published_dir: oldest.name)
+    newest = publish_outputs(write_outputs(tmp_path, 'newest'), published_dir, keep=1)
+    assert versions(published_dir) == [oldest.name, newest.name]
@@ -0,0 +1,164 @@
+# Required Libraries
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# RapidMiner client
+from utils.rapidminer_proxy import (SingleFlight, PriorityLimiter, LimiterTicket, PRIORITY_INTERACTIVE,
+                                    PRIORITY_BACKGROUND)
+
+def test_single_flight_do():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    def func(ticket):
+        calls.append(ticket)
+        started.set()
+        release.wait(5)
+        return len(calls)
+
+    with ThreadPoolExecutor(5) as executor:
+        leader = executor.submit(flight.do, 'key', func)
+        started.wait(5)
+        followers = [executor.submit(flight.do, 'key', func) for _ in range(3)]
+        while flight.waits < 3:
+            time.sleep(0.001)
+        other = executor.submit(flight.do, 'other', lambda ticket: 'other')
+        assert other.result(5) == 'other'
+        release.set()
+        assert [future.result(5) for future in [leader] + followers] == [1, 1, 1, 1]
+    assert (flight.calls, flight.waits, flight.in_flight()) == (2, 3, 0)
+
+def test_single_flight_do_exception():
+    flight = SingleFlight()
+    def func(ticket):
+        raise RuntimeError('RapidMiner')
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            flight.do('key', func)
+    assert (flight.calls, flight.in_flight()) == (2, 0)
+
+def test_single_flight_do_async():
+    flight = SingleFlight()
+    calls = []
+    async def func(ticket):
+        calls.append(ticket)
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def main():
+        first = asyncio.ensure_future(flight.do_async('key', func))
+        cancelled = asyncio.ensure_future(flight.do_async('key', func))
+        last = asyncio.ensure_future(flight.do_async('key', func))
+        await asyncio.sleep(0.01)
+        # A caller being cancelled does not cancel the call of the others
+        cancelled.cancel()
+        assert await first == 'result' and await last == 'result'
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    assert (flight.calls, flight.waits, flight.in_flight()) == (1, 2, 0)
+
+def test_limiter_order():
+    limiter = PriorityLimiter(1)
+    limiter.acquire(PRIORITY_BACKGROUND)
+    order = []
+    def call(name, priority):
+        limiter.acquire(priority)
+        order.append(name)
+        limiter.release()
+
+    threads = []
+    for name, priority in [('b1', PRIORITY_BACKGROUND), ('i1', PRIORITY_INTERACTIVE), ('b2', PRIORITY_BACKGROUND),
+                           ('i2', PRIORITY_INTERACTIVE)]:
+        threads.append(threading.Thread(target=call, args=(name, priority)))
+        threads[-1].start()
+        while limiter.queue_depth() < len(threads):
+            time.sleep(0.001)
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ['i1', 'i2', 'b1', 'b2']
+    assert (limiter.active, limiter.queue_depth()) == (0, 0)
+
+def test_limiter_async_cancel():
+    limiter = PriorityLimiter(1)
+    order = []
+    async def call(name, priority):
+        await limiter.acquire_async(priority)
+        order.append(name)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    async def main():
+        await limiter.acquire_async()
+        tasks = {name: asyncio.ensure_future(call(name, priority))
+                 for name, priority in [('b1', PRIORITY_BACKGROUND), ('i1', PRIORITY_INTERACTIVE),
+                                        ('i2', PRIORITY_INTERACTIVE)]}
+        await asyncio.sleep(0.01)
+        assert limiter.queue_depth() == 3
+        # A cancelled call leaves the queue without taking a place
+        tasks['i1'].cancel()
+        await asyncio.sleep(0.01)
+        assert limiter.queue_depth() == 2
+        limiter.release()
+        await asyncio.gather(tasks['i2'], tasks['b1'])
+
+    asyncio.run(main())
+    assert order == ['i2', 'b1']
+    assert (limiter.active, limiter.queue_depth()) == (0, 0)
+
+def test_limiter_promote():
+    limiter = PriorityLimiter(1)
+    limiter.acquire()
+    order = []
+    def call(name, ticket):
+        limiter.acquire(ticket=ticket)
+        order.append(name)
+        limiter.release()
+
+    tickets = {name: LimiterTicket(PRIORITY_BACKGROUND) for name in ('b1', 'b2')}
+    threads = [threading.Thread(target=call, args=(name, ticket)) for name, ticket in tickets.items()]
+    for thread in threads:
+        thread.start()
+        while limiter.queue_depth() < threads.index(thread) + 1:
+            time.sleep(0.001)
+    # An interactive call joins the call b2 (see SingleFlight)
+    tickets['b2'].promote(PRIORITY_INTERACTIVE)
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ['b2', 'b1']
+
+def test_single_flight_promotes_queued_call():
+    limiter = PriorityLimiter(1)
+    flight = SingleFlight()
+    limiter.acquire()
+    order = []
+    def func(name):
+        def call(ticket):
+            limiter.acquire(ticket=ticket)
+            order.append(name)
+            limiter.release()
+            return name
+        return call
+
+    with ThreadPoolExecutor(3) as executor:
+        background = executor.submit(flight.do, 'background', func('background'), PRIORITY_BACKGROUND)
+        while limiter.queue_depth() < 1:
+            time.sleep(0.001)
+        other = executor.submit(flight.do, 'other', func('other'), PRIORITY_BACKGROUND)
+        while limiter.queue_depth() < 2:
+            time.sleep(0.001)
+        joined = executor.submit(flight.do, 'other', func('other'), PRIORITY_INTERACTIVE)
+        # Wait for the call to be promoted in the queue
+        while limiter._queue[0][0] != PRIORITY_INTERACTIVE:
+            time.sleep(0.001)
+        limiter.release()
+        assert (background.result(5), other.result(5), joined.result(5)) == ('background', 'other', 'other')
+    assert order == ['other', 'background']
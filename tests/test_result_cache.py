@@ -0,0 +1,44 @@
+# Required Libraries
+import hashlib
+
+# RapidMiner results cache
+from utils import result_cache
+from utils.result_cache import ResultCache, file_content_hash
+
+def test_memory_bound_in_bytes(tmp_path):
+    cache = ResultCache(tmp_path / 'cache', max_memory_bytes=100, max_disk_entries=10)
+    cache.put('a', b'a' * 40)
+    cache.put('b', b'b' * 40)
+    assert cache.get('a') == b'a' * 40
+    # 'b' is the least recently used result
+    cache.put('c', b'c' * 40)
+    assert list(cache._memory) == ['a', 'c'] and cache._memory_bytes == 80
+    # Results larger than the whole cache are only kept on disk
+    cache.put('d', b'd' * 101)
+    assert list(cache._memory) == ['a', 'c']
+    assert cache.hits == 1
+
+def test_disk_hit_and_bound(tmp_path):
+    cache = ResultCache(tmp_path / 'cache', max_memory_bytes=100, max_disk_entries=2)
+    for key in 'abc':
+        cache.put(key, key.encode() * 10)
+    assert sorted(f.name for f in (tmp_path / 'cache').iterdir()) == ['b.bin', 'c.bin']
+
+    # Another process (new cache in memory) finds the results on disk
+    other = ResultCache(tmp_path / 'cache', max_memory_bytes=100, max_disk_entries=2)
+    assert other.get('a') is None
+    assert other.get('c') == b'c' * 10
+    assert other.get('c') == b'c' * 10
+    assert (other.misses, other.disk_hits, other.hits) == (1, 1, 1)
+
+def test_file_content_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, 'FILE_HASHES_MAX_ENTRIES', 3)
+    monkeypatch.setattr(result_cache, '_file_hashes', result_cache.OrderedDict())
+    for i in range(5):
+        (tmp_path / f'{i}.csv').write_bytes(b'%d' % i)
+        assert file_content_hash(tmp_path / f'{i}.csv') == hashlib.sha256(b'%d' % i).hexdigest()
+    assert len(result_cache._file_hashes) == 3
+
+    # A new content is hashed again
+    (tmp_path / '4.csv').write_bytes(b'new content')
+    assert file_content_hash(tmp_path / '4.csv') == hashlib.sha256(b'new content').hexdigest()
@@ -0,0 +1,41 @@
+# Required Libraries
+import numpy as np
+import pandas as pd
+
+# Constants
+from parser_edar40.common.constants import DATE_COLUMN_NAME
+
+# Parquet dataset
+from parser_edar40.store import write_dataset, append_dataset, read_dataset, read_dataset_units
+
+def dates_frame(start, periods):
+    # Dates without freq, as read from a dataset
+    index = pd.DatetimeIndex(pd.date_range(start, periods=periods, freq='D').values, name=DATE_COLUMN_NAME)
+    return pd.DataFrame({'CAUDAL': np.arange(periods, dtype='float64'),
+                         'DQO': np.where(np.arange(periods) % 3 == 0, np.nan, 0.5 * np.arange(periods))},
+                        index=index)
+
+def test_round_trip(tmp_path):
+    df = dates_frame('2018-11-15', 120)
+    units = {'CAUDAL': 'm³/día', 'DQO': 'mg/l'}
+    write_dataset(df, units, tmp_path / 'dataset')
+
+    assert sorted(p.name for p in (tmp_path / 'dataset').iterdir()) == ['_common_metadata', 'year=2018', 'year=2019']
+    pd.testing.assert_frame_equal(read_dataset(dataset_dir=tmp_path / 'dataset'), df)
+    assert read_dataset_units(tmp_path / 'dataset') == units
+
+def test_read_columns_and_dates(tmp_path):
+    df = dates_frame('2018-11-15', 120)
+    write_dataset(df, {}, tmp_path / 'dataset')
+
+    df_read = read_dataset(['DQO'], start='2018-12-30', end='2019-01-02', dataset_dir=tmp_path / 'dataset')
+    pd.testing.assert_frame_equal(df_read, df.loc['2018-12-30':'2019-01-02', ['DQO']])
+
+def test_write_replaces_and_append_adds(tmp_path):
+    write_dataset(dates_frame('2010-01-01', 10), {}, tmp_path / 'dataset')
+    df = dates_frame('2019-01-01', 40)
+    write_dataset(df.iloc[:30], {}, tmp_path / 'dataset')
+    append_dataset(df.iloc[30:], {}, tmp_path / 'dataset')
+
+    pd.testing.assert_frame_equal(read_dataset(dataset_dir=tmp_path / 'dataset'), df)
+    assert [p.name for p in tmp_path.iterdir()] == ['dataset']
@@ -0,0 +1,16 @@
+# Required Libraries
+from parser_edar40.common.constants import (IN_DATA_FILE_NAME, IN_METEO_DATA_FILE_DIR, IN_YOKO_HF_DATA_DIR,
+                                             OUT_METEO_DATA_FILE_NAME_PERIOD_2)
+from parser_edar40.common.settings import blnIngest_YOKO_HF
+
+# Watcher
+from parser_edar40.watcher import is_input_file
+
+def test_is_input_file():
+    assert is_input_file(IN_DATA_FILE_NAME)
+    assert is_input_file(IN_METEO_DATA_FILE_DIR / '2020' / 'Enero' / 'TemperaturaMediaZaragoza.csv')
+    assert is_input_file(IN_YOKO_HF_DATA_DIR / 'yoko_2020_01.csv') == blnIngest_YOKO_HF
+    # Files written by the parser and temporary files do not trigger it
+    assert not is_input_file(OUT_METEO_DATA_FILE_NAME_PERIOD_2)
+    assert not is_input_file(IN_DATA_FILE_NAME.with_name('~$' + IN_DATA_FILE_NAME.name))
+    assert not is_input_file(IN_METEO_DATA_FILE_DIR / '2020' / 'Enero' / 'PresionZaragoza.csv.part')
@@ -1,6 +1,7 @@
 # Import required libraries
 import pandas as pd
 import pickle
+from parser_edar40.variables import load_variables_registry
 # total_model_dict = {}
 # Functions to save and load objects
 def save_obj(obj, name):
@@ -36,15 +37,16 @@ def create_df_outs(file, sheets, cols):
     
     Returns:
         df, outs_dict: tuple with the following variables
-            df: Dataframe with processed file
+            df: Dictionary with sheet as key and a dictionary with the non empty values of each column as value
             outs_dict: Dictionary with all the outputs that can be modeled
     """
-    # print('Entre aqui')
+    # All the sheets of the excel file are read only once and kept in the variables registry
+    registry = load_variables_registry(file)
     outs_dict = {}
     df = {}
     for ws in sheets:
-        df[ws] = pd.read_excel(file, sheet_name=ws, usecols=cols)
-        for out in list(df[ws]['OUT'].dropna()):
+        df[ws] = {col: [value for value in registry['columns'][ws].get(col, []) if value is not None] for col in cols}
+        for out in df[ws]['OUT']:
             outs_dict.update({out:ws})
     return df, outs_dict
 
@@ -53,7 +55,7 @@ def create_model_vars_dict(df, outs_dict):
     """Creates the models variables dictionary which include all the variables that can be used to model each output
     
     Parameters:
-        df: Dataframe with all the parsed data
+        df: Dictionary with the non empty values of each column of each sheet (see create_df_outs)
         outs_dict: Dictonary including all the outputs that can be modeled as key and the sheet location as value
         
     Returns:
@@ -62,10 +64,9 @@ def create_model_vars_dict(df, outs_dict):
     total_model_dict = {}
     for out in outs_dict:
         proc_in_list = []
-        for proc_in in list(df[outs_dict[out]]['PROCESOS_IN'].dropna()):
-            # import pdb; pdb.set_trace()
-            proc_in_list = proc_in_list + list(df[proc_in]['OUT'].dropna()) + list(df[proc_in]['IN'].dropna()) + list(df[proc_in]['MANIPULABLES'].dropna())
-        total_model_dict.update({out: list(df[outs_dict[out]]['IN'].dropna()) + list(df[outs_dict[out]]['MANIPULABLES'].dropna()) + proc_in_list})
+        for proc_in in df[outs_dict[out]]['PROCESOS_IN']:
+            proc_in_list = proc_in_list + df[proc_in]['OUT'] + df[proc_in]['IN'] + df[proc_in]['MANIPULABLES']
+        total_model_dict.update({out: df[outs_dict[out]]['IN'] + df[outs_dict[out]]['MANIPULABLES'] + proc_in_list})
     return total_model_dict
 
 def load_or_create_model_vars(model_vars_file, mask_file, sheets, cols, force_create=False):
@@ -1,22 +1,590 @@
 import pandas as pd
 import requests
 import json
+import asyncio
+import socket
+import bisect
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests.utils import get_encoding_from_headers
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPClientError
+from tornado.httputil import url_concat
+from utils.server_config import def_user, def_pass
+from utils.result_cache import ResultCache, result_key
+
+# Timeouts (seconds) of the calls to RapidMiner: time to connect and time waiting for the response (processes such
+# as the optimization may take several minutes)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 300
+
+# Retries of the calls failing to connect or answered with a gateway error (502, 503, 504), waiting
+# RETRY_BACKOFF * 2^(retry - 1) seconds before every retry. Calls are not retried once the request has been sent and
+# the response is late (read timeout), since the process may be still running in RapidMiner
+RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+# Connections kept alive with every host
+POOL_SIZE = 10
+
+# Upper bounds (seconds) of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float('inf'))
+
+# Maximum number of simultaneous calls to every endpoint (process), and the limits of the endpoints differing from it.
+# The calls beyond the limit wait in a queue and are served by priority class (and by arrival order within a class)
+CONCURRENCY_LIMIT = 4
+ENDPOINT_CONCURRENCY_LIMITS = {
+	'/api/rest/process/EDAR_Cartuja_Prediccion_JSON_v5': 2,
+}
+
+# Priority classes: calls of a user waiting for the result (buttons, page loads) go before the background calls (e.g.
+# recreating the models saved in created_models.pkl)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BACKGROUND: 'background'}
+
+class LatencyHistogram:
+	"""Histograma de latencias de un endpoint
+
+	Attributes:
+		buckets: Límites superiores (segundos) de los intervalos del histograma
+		counts: Número de llamadas de cada intervalo (no acumulado)
+		count: Número de llamadas
+		total: Suma de las latencias (segundos)
+		errors: Número de llamadas fallidas
+	"""
+	def __init__(self, buckets=LATENCY_BUCKETS):
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.count = 0
+		self.total = 0.0
+		self.errors = 0
+
+	def observe(self, seconds, error=False):
+		self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+		self.count += 1
+		self.total += seconds
+		if error:
+			self.errors += 1
+
+	def to_dict(self):
+		return {'buckets': [str(bucket) for bucket in self.buckets], 'counts': list(self.counts),
+				'count': self.count, 'sum': self.total, 'errors': self.errors}
+
+class LimiterTicket:
+	"""Prioridad de una llamada en la cola de un PriorityLimiter. Si a una llamada agrupada (ver SingleFlight) se une
+	otra de mayor prioridad, la llamada se adelanta en la cola (ver promote)
+
+	Attributes:
+		priority: Prioridad de la llamada (la mejor de las llamadas agrupadas)
+		limiter: Limitador en cuya cola está la llamada (None si aún no ha llegado a él)
+		entry: Entrada de la llamada en la cola del limitador
+	"""
+	def __init__(self, priority=PRIORITY_INTERACTIVE):
+		self.priority = priority
+		self.limiter = None
+		self.entry = None
+		self._lock = threading.Lock()
+
+	def promote(self, priority):
+		"""Sube la prioridad de la llamada, también si ya está esperando en la cola"""
+		with self._lock:
+			limiter = self.limiter
+			if limiter is None:
+				self.priority = min(self.priority, priority)
+				return
+		limiter.promote(self, priority)
+
+class PriorityLimiter:
+	"""Limita el número de llamadas simultáneas a un endpoint. Las llamadas que superan el límite esperan en una cola y
+	se atienden por prioridad (y por orden de llegada dentro de cada prioridad). Sirve tanto a llamadas síncronas
+	(hilos, ver acquire) como a corutinas (ver acquire_async)
+
+	Attributes:
+		limit: Número máximo de llamadas simultáneas
+		active: Número de llamadas en curso
+		waits: Histograma del tiempo de espera en la cola de cada prioridad (ver LatencyHistogram)
+	"""
+	def __init__(self, limit):
+		self.limit = limit
+		self.active = 0
+		self.waits = {}
+		self._queue = []
+		self._order = itertools.count()
+		self._lock = threading.Lock()
+
+	def queue_depth(self):
+		with self._lock:
+			return len(self._queue)
+
+	def _observe_wait(self, priority, seconds):
+		# Se llama con el lock adquirido
+		self.waits.setdefault(priority, LatencyHistogram()).observe(seconds)
+
+	def _ticket(self, priority, ticket):
+		ticket = ticket if ticket is not None else LimiterTicket(priority)
+		with ticket._lock:
+			ticket.limiter = self
+		return ticket
+
+	def _try_acquire(self, ticket, wake):
+		# Se llama con el lock adquirido. Devuelve None si hay sitio para la llamada; si no, la pone en la cola
+		if self.active < self.limit and not self._queue:
+			self.active += 1
+			self._observe_wait(ticket.priority, 0.0)
+			return None
+		# Entries are lists: the priority of a waiting call may be raised (see promote)
+		ticket.entry = [ticket.priority, next(self._order), wake, time.perf_counter()]
+		heapq.heappush(self._queue, ticket.entry)
+		return ticket.entry
+
+	def acquire(self, priority=PRIORITY_INTERACTIVE, ticket=None):
+		"""Espera (bloqueando el hilo) a que haya sitio para una llamada. Con ticket, la prioridad es la del ticket"""
+		ticket = self._ticket(priority, ticket)
+		event = threading.Event()
+		with self._lock:
+			if self._try_acquire(ticket, event.set) is None:
+				return
+		event.wait()
+
+	async def acquire_async(self, priority=PRIORITY_INTERACTIVE, ticket=None):
+		"""Espera (sin bloquear el IO loop) a que haya sitio para una llamada. Con ticket, la prioridad es la del ticket"""
+		ticket = self._ticket(priority, ticket)
+		loop = asyncio.get_event_loop()
+		future = loop.create_future()
+		def wake():
+			loop.call_soon_threadsafe(self._wake_future, future)
+		with self._lock:
+			entry = self._try_acquire(ticket, wake)
+			if entry is None:
+				return
+		try:
+			await future
+		except asyncio.CancelledError:
+			with self._lock:
+				if entry in self._queue:
+					self._queue.remove(entry)
+					heapq.heapify(self._queue)
+					raise
+			# The call got its place and was cancelled before using it
+			if future.done() and not future.cancelled():
+				self.release()
+			raise
+
+	def promote(self, ticket, priority):
+		"""Sube la prioridad de una llamada (ver LimiterTicket.promote)"""
+		with self._lock:
+			if priority < ticket.priority:
+				ticket.priority = priority
+				entry = ticket.entry
+				if entry is not None and entry in self._queue:
+					entry[0] = priority
+					heapq.heapify(self._queue)
+
+	def _wake_future(self, future):
+		if future.cancelled():
+			# Nobody is waiting for the place given to this call anymore
+			self.release()
+		elif not future.done():
+			future.set_result(None)
+
+	def release(self):
+		"""Libera el sitio de una llamada; si hay llamadas en la cola, se lo cede a la de mayor prioridad"""
+		with self._lock:
+			if self._queue:
+				priority, _, wake, queued = heapq.heappop(self._queue)
+				self._observe_wait(priority, time.perf_counter() - queued)
+				wake()
+			else:
+				self.active -= 1
+
+class SingleFlight:
+	"""Agrupa las llamadas idénticas simultáneas: mientras una llamada con una clave está en curso, las siguientes
+	llamadas con la misma clave esperan su resultado en vez de repetirla. La llamada tiene la mejor prioridad de las
+	llamadas agrupadas: func recibe un LimiterTicket, que se promociona si se une una llamada de mayor prioridad
+
+	Attributes:
+		calls: Número de llamadas realizadas
+		waits: Número de llamadas que han esperado el resultado de otra
+	"""
+	def __init__(self):
+		self._futures = {}
+		self._tasks = {}
+		self._lock = threading.Lock()
+		self.calls = 0
+		self.waits = 0
+
+	def do(self, key, func, priority=PRIORITY_INTERACTIVE):
+		"""Devuelve el resultado de func(ticket), o el de la llamada en curso con la misma clave (también sus
+		excepciones)
+		"""
+		with self._lock:
+			flight = self._futures.get(key)
+			leader = flight is None
+			if leader:
+				flight = self._futures[key] = (Future(), LimiterTicket(priority))
+				self.calls += 1
+			else:
+				self.waits += 1
+		future, ticket = flight
+		if not leader:
+			ticket.promote(priority)
+			return future.result()
+
+		try:
+			result = func(ticket)
+		except BaseException as e:
+			future.set_exception(e)
+			raise
+		else:
+			future.set_result(result)
+		finally:
+			with self._lock:
+				del self._futures[key]
+		return result
+
+	async def do_async(self, key, func, priority=PRIORITY_INTERACTIVE):
+		"""Versión asíncrona de do: func(ticket) es una corutina. Solo se agrupan las llamadas del mismo IO loop"""
+		task_key = (id(asyncio.get_event_loop()), key)
+		with self._lock:
+			flight = self._tasks.get(task_key)
+			if flight is None:
+				ticket = LimiterTicket(priority)
+				flight = self._tasks[task_key] = (asyncio.ensure_future(func(ticket)), ticket)
+				flight[0].add_done_callback(lambda _: self._forget_task(task_key))
+				self.calls += 1
+			else:
+				flight[1].promote(priority)
+				self.waits += 1
+		task = flight[0]
+		# If a caller is cancelled (e.g. its session is closed), the call goes on for the others
+		return await asyncio.shield(task)
+
+	def _forget_task(self, task_key):
+		with self._lock:
+			del self._tasks[task_key]
+
+	def in_flight(self):
+		with self._lock:
+			return len(self._futures) + len(self._tasks)
+
+# Define function to get the key of a call, used to group identical simultaneous calls
+def request_key(url, username, parameters, out_json):
+	key_info = {'url': url, 'username': username, 'out_json': out_json,
+				'parameters': {str(name): str(value) for name, value in (parameters or {}).items()}}
+	return hashlib.sha256(json.dumps(key_info, sort_keys=True).encode('utf-8')).hexdigest()
+
+class RapidMinerClient:
+	"""Cliente de los servicios web de RapidMiner
+
+	Mantiene una sesión (requests.Session) por host, con un pool de conexiones keep-alive, de forma que las llamadas
+	no abren una conexión nueva cada vez. Las llamadas idénticas simultáneas (p.ej. varias sesiones abriendo el mismo
+	perfil) se agrupan en una sola llamada al servidor (ver SingleFlight). Las llamadas tienen timeouts y se reintentan (ver RETRIES) si fallan al
+	conectar. El número de llamadas simultáneas a cada endpoint está limitado (ver PriorityLimiter): las llamadas
+	interactivas pasan por delante de las de segundo plano. Registra un histograma de latencias por endpoint (ver
+	latency_histograms y metrics_text).
 
-def call_webservice(url, username, password, parameters=None, out_json=False):
-	"""Función que llama una URL con el método GET y retorna un JSON con la respuesta de la URL
 	Parameters:
-		url: endpoint a llamar
-		username: Nombre de usuario
-		password: Contraseña
-		parameters: Parametros en JSON a enviar al endpoint
-		out_json: Tipo de respuesta esperada del servidor, si es True el server devuelve un JSON, sinó es un texto
-	
-	Returns:
-		document: Documento en JSON o texto plano con la respuesta del servidor
-	"""
-	r = requests.get(url, params=parameters, auth=(username, password))
-	if out_json:
-		document = json.loads(r.text)
-	else:
-		document = r.text
-	return document
\ No newline at end of file
+		username: Nombre de usuario por defecto
+		password: Contraseña por defecto
+		connect_timeout, read_timeout: Timeouts (segundos)
+		retries: Número máximo de reintentos
+		backoff: Factor de espera entre reintentos (segundos)
+		pool_size: Número de conexiones mantenidas con cada host
+		cache: Caché de resultados (ver utils/result_cache.py), usada por las llamadas con cached=True
+		concurrency_limit: Número máximo de llamadas simultáneas a cada endpoint
+		endpoint_limits: Límites de los endpoints que difieren de concurrency_limit (diccionario con la ruta del endpoint
+						como clave)
+	"""
+	def __init__(self, username=None, password=None, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+				retries=RETRIES, backoff=RETRY_BACKOFF, pool_size=POOL_SIZE, cache=None,
+				concurrency_limit=CONCURRENCY_LIMIT, endpoint_limits=ENDPOINT_CONCURRENCY_LIMITS):
+		self.cache = cache if cache is not None else ResultCache()
+		self.single_flight = SingleFlight()
+		self.username = username
+		self.password = password
+		self.timeout = (connect_timeout, read_timeout)
+		self.retries = retries
+		self.backoff = backoff
+		self.pool_size = pool_size
+		self.concurrency_limit = concurrency_limit
+		self.endpoint_limits = dict(endpoint_limits)
+		self._limiters = {}
+		self._sessions = {}
+		self._histograms = {}
+		self._lock = threading.Lock()
+
+	def _retry(self):
+		options = {'total': self.retries, 'connect': self.retries, 'read': 0, 'status': self.retries,
+				'backoff_factor': self.backoff, 'status_forcelist': (502, 503, 504), 'raise_on_status': False}
+		try:
+			return Retry(allowed_methods=frozenset(['GET']), **options)
+		except TypeError:
+			# urllib3 < 1.26
+			return Retry(method_whitelist=frozenset(['GET']), **options)
+
+	def session(self, url):
+		"""Devuelve la sesión del host de la URL (se crea la primera vez)"""
+		parts = urlsplit(url)
+		host = f'{parts.scheme}://{parts.netloc}'
+		with self._lock:
+			session = self._sessions.get(host)
+			if session is None:
+				session = requests.Session()
+				adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=self._retry())
+				session.mount(host, adapter)
+				self._sessions[host] = session
+		return session
+
+	def limiter(self, url):
+		"""Devuelve el limitador de llamadas simultáneas del endpoint de la URL (se crea la primera vez)"""
+		endpoint = urlsplit(url).path
+		with self._lock:
+			limiter = self._limiters.get(endpoint)
+			if limiter is None:
+				limiter = PriorityLimiter(self.endpoint_limits.get(endpoint, self.concurrency_limit))
+				self._limiters[endpoint] = limiter
+		return limiter
+
+	def observe(self, url, seconds, error=False):
+		endpoint = urlsplit(url).path
+		with self._lock:
+			histogram = self._histograms.setdefault(endpoint, LatencyHistogram())
+			histogram.observe(seconds, error)
+
+	def call_webservice(self, url, username=None, password=None, parameters=None, out_json=False, cached=False,
+						priority=PRIORITY_INTERACTIVE):
+		"""Función que llama una URL con el método GET y retorna un JSON con la respuesta de la URL
+		Parameters:
+			url: endpoint a llamar
+			username: Nombre de usuario (por defecto, el del cliente)
+			password: Contraseña (por defecto, la del cliente)
+			parameters: Parametros en JSON a enviar al endpoint
+			out_json: Tipo de respuesta esperada del servidor, si es True el server devuelve un JSON, sinó es un texto
+			cached: Si es True, el resultado se busca primero en la caché de resultados. Solo para procesos cuyo
+					resultado depende únicamente de sus parámetros y de los archivos publicados que referencian
+					(URLs .../archivos/<archivo>): el resultado es válido hasta que el parser publica datos nuevos
+			priority: Prioridad de la llamada si tiene que esperar en la cola del endpoint (PRIORITY_INTERACTIVE o
+					PRIORITY_BACKGROUND)
+
+		Returns:
+			document: Documento en JSON o texto plano con la respuesta del servidor
+		"""
+		key = result_key(urlsplit(url).path, parameters, out_json) if cached else None
+		content = self.cache.get(key) if key is not None else None
+		if content is None:
+			def call(ticket):
+				content = self._get(url, username, password, parameters, out_json, ticket=ticket)
+				if key is not None:
+					self.cache.put(key, content)
+				return content
+			# Every caller decodes its own copy of the document
+			content = self.single_flight.do(key or request_key(url, username or self.username, parameters, out_json), call,
+											priority)
+		if out_json:
+			# The JSON document is decoded from bytes, without decoding it to text first
+			document = json.loads(content)
+		else:
+			document = content.decode('utf-8')
+		return document
+
+	def _get(self, url, username, password, parameters, out_json, priority=PRIORITY_INTERACTIVE, ticket=None):
+		# Llamada al servidor; devuelve el documento de la respuesta (bytes)
+		auth = (username or self.username, password or self.password)
+		limiter = self.limiter(url)
+		limiter.acquire(priority, ticket)
+		start = time.perf_counter()
+		try:
+			r = self.session(url).get(url, params=parameters, auth=auth, timeout=self.timeout)
+			r.raise_for_status()
+		except requests.RequestException:
+			self.observe(url, time.perf_counter() - start, error=True)
+			raise
+		finally:
+			limiter.release()
+		self.observe(url, time.perf_counter() - start)
+		# Text documents are decoded with the encoding of the response and kept in UTF-8
+		return r.content if out_json else r.text.encode('utf-8')
+
+	def latency_histograms(self):
+		"""Devuelve los histogramas de latencias, un diccionario con el endpoint como clave"""
+		with self._lock:
+			return {endpoint: histogram.to_dict() for endpoint, histogram in self._histograms.items()}
+
+	def queues(self):
+		"""Devuelve el estado de las colas de los endpoints: límite, llamadas en curso, en espera e histogramas del
+		tiempo de espera de cada prioridad
+		"""
+		with self._lock:
+			limiters = dict(self._limiters)
+		return {endpoint: {'limit': limiter.limit, 'active': limiter.active, 'queued': limiter.queue_depth(),
+							'waits': {PRIORITY_NAMES.get(priority, str(priority)): histogram.to_dict()
+									for priority, histogram in list(limiter.waits.items())}}
+				for endpoint, limiter in limiters.items()}
+
+	def counters(self):
+		"""Devuelve los contadores de la caché de resultados y de las llamadas agrupadas"""
+		return {'cache_hits': self.cache.hits, 'cache_disk_hits': self.cache.disk_hits, 'cache_misses': self.cache.misses,
+				'calls': self.single_flight.calls, 'coalesced_waits': self.single_flight.waits,
+				'in_flight': self.single_flight.in_flight()}
+
+	def metrics_text(self):
+		"""Devuelve los histogramas de latencias y los contadores en el formato de texto de Prometheus"""
+		lines = ['# HELP rapidminer_request_seconds Latency of the calls to RapidMiner',
+				'# TYPE rapidminer_request_seconds histogram']
+		errors = []
+		with self._lock:
+			for endpoint, histogram in sorted(self._histograms.items()):
+				cumulative = 0
+				for bucket, count in zip(histogram.buckets, histogram.counts):
+					cumulative += count
+					le = '+Inf' if bucket == float('inf') else str(bucket)
+					lines.append(f'rapidminer_request_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+				lines.append(f'rapidminer_request_seconds_sum{{endpoint="{endpoint}"}} {histogram.total}')
+				lines.append(f'rapidminer_request_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+				errors.append(f'rapidminer_request_errors_total{{endpoint="{endpoint}"}} {histogram.errors}')
+		lines += ['# HELP rapidminer_request_errors_total Failed calls to RapidMiner',
+				'# TYPE rapidminer_request_errors_total counter'] + errors
+		counters = self.counters()
+		for name, help_text in (('cache_hits', 'Results found in the in-process cache'),
+								('cache_disk_hits', 'Results found in the on-disk cache'),
+								('cache_misses', 'Results not found in the cache'),
+								('calls', 'Calls sent to RapidMiner'),
+								('coalesced_waits', 'Calls that waited for an identical call in flight')):
+			lines += [f'# HELP rapidminer_{name}_total {help_text}', f'# TYPE rapidminer_{name}_total counter',
+					f'rapidminer_{name}_total {counters[name]}']
+		lines += ['# HELP rapidminer_in_flight Calls to RapidMiner in flight', '# TYPE rapidminer_in_flight gauge',
+				f'rapidminer_in_flight {counters["in_flight"]}']
+		queues = sorted(self.queues().items())
+		for name, help_text, field in (('active_calls', 'Calls to RapidMiner running, per endpoint', 'active'),
+										('queue_depth', 'Calls to RapidMiner waiting for a place, per endpoint', 'queued'),
+										('concurrency_limit', 'Maximum simultaneous calls, per endpoint', 'limit')):
+			lines += [f'# HELP rapidminer_{name} {help_text}', f'# TYPE rapidminer_{name} gauge']
+			lines += [f'rapidminer_{name}{{endpoint="{endpoint}"}} {queue[field]}' for endpoint, queue in queues]
+		lines += ['# HELP rapidminer_queue_wait_seconds Time waited in the queue of the endpoint',
+				'# TYPE rapidminer_queue_wait_seconds histogram']
+		for endpoint, queue in queues:
+			for priority, histogram in sorted(queue['waits'].items()):
+				labels = f'endpoint="{endpoint}",priority="{priority}"'
+				cumulative = 0
+				for bucket, count in zip(histogram['buckets'], histogram['counts']):
+					cumulative += count
+					le = '+Inf' if bucket == 'inf' else bucket
+					lines.append(f'rapidminer_queue_wait_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+				lines.append(f'rapidminer_queue_wait_seconds_sum{{{labels}}} {histogram["sum"]}')
+				lines.append(f'rapidminer_queue_wait_seconds_count{{{labels}}} {histogram["count"]}')
+		return '\n'.join(lines) + '\n'
+
+# Errors of the curl client raised before the request is sent: could not resolve the host, could not connect
+CURL_CONNECT_ERRNOS = (6, 7)
+
+def is_retryable_error(e):
+	"""Indica si una llamada del cliente asíncrono que ha fallado se puede reintentar, con la política de
+	RapidMinerClient: solo si ha fallado antes de enviar la petición (al conectar) o el servidor ha respondido con un
+	error de gateway (502, 503, 504). Una conexión cerrada o reseteada después de enviar la petición no se reintenta,
+	ya que el proceso puede estar ejecutándose en RapidMiner
+	"""
+	if isinstance(e, HTTPClientError):
+		if e.code in (502, 503, 504):
+			return True
+		if getattr(e, 'errno', None) is not None:
+			# curl_httpclient.CurlError
+			return e.errno in CURL_CONNECT_ERRNOS
+		# simple_httpclient timeouts: 'Timeout while connecting' or 'Timeout in request queue'
+		return e.code == 599 and str(e).endswith(('while connecting', 'in request queue'))
+	return isinstance(e, (ConnectionRefusedError, socket.gaierror))
+
+class AsyncRapidMinerClient:
+	"""Cliente asíncrono de los servicios web de RapidMiner, para los callbacks de las aplicaciones Bokeh
+	(corutinas): mientras la llamada está en curso, el IO loop del servidor Bokeh sigue atendiendo al resto de sesiones
+
+	Usa el AsyncHTTPClient de Tornado del IO loop en curso (CurlAsyncHTTPClient, con conexiones keep-alive, si pycurl
+	está instalado). Comparte con el cliente síncrono los usuarios, timeouts, reintentos, la caché de resultados, las
+	llamadas agrupadas y los histogramas de latencias, de forma que /metrics/rapidminer incluye ambas.
+
+	Parameters:
+		client: Cliente síncrono (RapidMinerClient) cuya configuración, caché y métricas se comparten
+	"""
+	def __init__(self, client):
+		self.client = client
+		self._configured = False
+
+	def http_client(self):
+		"""Devuelve el cliente HTTP del IO loop en curso (Tornado mantiene uno por IO loop)"""
+		if not self._configured:
+			try:
+				import pycurl  # noqa: F401
+				AsyncHTTPClient.configure('tornado.curl_httpclient.CurlAsyncHTTPClient', max_clients=self.client.pool_size)
+			except ImportError:
+				AsyncHTTPClient.configure(None, max_clients=self.client.pool_size)
+			self._configured = True
+		return AsyncHTTPClient()
+
+	async def call_webservice(self, url, username=None, password=None, parameters=None, out_json=False, cached=False,
+							priority=PRIORITY_INTERACTIVE):
+		"""Corutina que llama una URL con el método GET y retorna un JSON con la respuesta de la URL (mismos parámetros y
+		resultado que RapidMinerClient.call_webservice)
+		"""
+		client = self.client
+		key = result_key(urlsplit(url).path, parameters, out_json) if cached else None
+		content = client.cache.get(key) if key is not None else None
+		if content is None:
+			async def call(ticket):
+				content = await self._get(url, username, password, parameters, out_json, ticket=ticket)
+				if key is not None:
+					client.cache.put(key, content)
+				return content
+			content = await client.single_flight.do_async(
+				key or request_key(url, username or client.username, parameters, out_json), call, priority)
+		if out_json:
+			document = json.loads(content)
+		else:
+			document = content.decode('utf-8')
+		return document
+
+	async def _get(self, url, username, password, parameters, out_json, priority=PRIORITY_INTERACTIVE, ticket=None):
+		# Llamada al servidor; devuelve el documento de la respuesta (bytes). Se reintenta como en RapidMinerClient
+		client = self.client
+		connect_timeout, read_timeout = client.timeout
+		request = HTTPRequest(url_concat(url, parameters), method='GET',
+							auth_username=username or client.username, auth_password=password or client.password,
+							connect_timeout=connect_timeout, request_timeout=connect_timeout + read_timeout)
+		limiter = client.limiter(url)
+		await limiter.acquire_async(priority, ticket)
+		try:
+			retry = 0
+			while True:
+				start = time.perf_counter()
+				try:
+					response = await self.http_client().fetch(request)
+					break
+				except (HTTPClientError, OSError) as e:
+					client.observe(url, time.perf_counter() - start, error=True)
+					if not is_retryable_error(e) or retry >= client.retries:
+						raise
+					retry += 1
+					await asyncio.sleep(client.backoff * 2 ** (retry - 1))
+		finally:
+			limiter.release()
+		client.observe(url, time.perf_counter() - start)
+		if out_json:
+			return response.body
+		# Text documents are decoded with the encoding of the response (as requests does) and kept in UTF-8
+		encoding = get_encoding_from_headers(response.headers) or 'utf-8'
+		return response.body.decode(encoding, errors='replace').encode('utf-8')
+
+# Clientes compartidos por todas las sesiones del proceso
+rapidminer_client = RapidMinerClient(username=def_user, password=def_pass)
+async_rapidminer_client = AsyncRapidMinerClient(rapidminer_client)
+
+def call_webservice(url, username, password, parameters=None, out_json=False):
+	"""Función que llama una URL con el método GET y retorna un JSON con la respuesta de la URL (ver
+	RapidMinerClient.call_webservice; se usa el cliente compartido rapidminer_client)
+	"""
+	return rapidminer_client.call_webservice(url, username, password, parameters, out_json)
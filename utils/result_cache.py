@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from parser_edar40.common.constants import OUT_DATA_FILE_NAME_PERIOD_1
+from parser_edar40.publish import current_dir
+
+# Directorio de la caché en disco de los resultados de RapidMiner, compartida por todos los procesos del servidor
+RESULTS_CACHE_DIR = Path('./data/.cache/rapidminer')
+
+# Tamaño máximo de la caché en memoria (bytes) y número máximo de resultados en la caché en disco
+MEMORY_MAX_BYTES = 64 * 2 ** 20
+DISK_MAX_ENTRIES = 256
+
+# URLs de los archivos publicados por el parser (ver la ruta /archivos de main.py)
+ARCHIVOS_URL_REGEX = re.compile(r'/archivos/([^/?#]+)$')
+
+# Hashes del contenido de los archivos ya calculados, con (ruta, mtime, tamaño) como clave. Cada versión publicada
+# añade rutas nuevas, por lo que solo se guardan los FILE_HASHES_MAX_ENTRIES usados más recientemente
+FILE_HASHES_MAX_ENTRIES = 256
+_file_hashes = OrderedDict()
+_file_hashes_lock = threading.Lock()
+
+def file_content_hash(file_name):
+	"""Devuelve el hash SHA-256 del contenido de un archivo. Solo se calcula de nuevo si cambia su ruta real (versión
+	publicada), su mtime o su tamaño
+	"""
+	file_name = Path(file_name).resolve()
+	stat = file_name.stat()
+	signature = (str(file_name), stat.st_mtime_ns, stat.st_size)
+	with _file_hashes_lock:
+		digest = _file_hashes.get(signature)
+		if digest is not None:
+			_file_hashes.move_to_end(signature)
+			return digest
+	sha = hashlib.sha256()
+	with open(file_name, 'rb') as f:
+		for chunk in iter(lambda: f.read(1 << 20), b''):
+			sha.update(chunk)
+	digest = sha.hexdigest()
+	with _file_hashes_lock:
+		_file_hashes[signature] = digest
+		while len(_file_hashes) > FILE_HASHES_MAX_ENTRIES:
+			_file_hashes.popitem(last=False)
+	return digest
+
+def referenced_files_hashes(parameters):
+	"""Devuelve los hashes del contenido de los archivos publicados referenciados en los parámetros de una llamada
+	(URLs .../archivos/<archivo>)
+
+	Parameters:
+		parameters: Parámetros de la llamada
+
+	Returns:
+		hashes: Diccionario con el parámetro como clave y el hash del archivo como valor, o None si algún archivo
+				referenciado no existe (el resultado no se puede versionar)
+	"""
+	data_dir = current_dir(OUT_DATA_FILE_NAME_PERIOD_1.parent)
+	hashes = {}
+	for name, value in (parameters or {}).items():
+		match = ARCHIVOS_URL_REGEX.search(str(value))
+		if match:
+			file_name = data_dir / match.group(1)
+			if not file_name.is_file():
+				return None
+			hashes[name] = file_content_hash(file_name)
+	return hashes
+
+def result_key(process, parameters, out_json):
+	"""Devuelve la clave de un resultado: hash del proceso, los parámetros (canonicalizados) y el contenido de los
+	archivos referenciados, o None si no se puede versionar
+	"""
+	hashes = referenced_files_hashes(parameters)
+	if hashes is None:
+		return None
+	key_info = {'process': process, 'out_json': out_json,
+				'parameters': {str(name): str(value) for name, value in (parameters or {}).items()},
+				'files': hashes}
+	return hashlib.sha256(json.dumps(key_info, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ResultCache:
+	"""Caché de dos niveles de los resultados de RapidMiner: LRU en memoria (limitada en bytes) y en disco (compartida
+	por todos los procesos del servidor). Los resultados se guardan como bytes (el documento tal y como lo devuelve el
+	servidor), de forma que cada llamada decodifica su propia copia
+
+	Attributes:
+		hits: Número de resultados encontrados en la caché en memoria
+		disk_hits: Número de resultados encontrados en la caché en disco
+		misses: Número de resultados no encontrados
+	"""
+	def __init__(self, cache_dir=RESULTS_CACHE_DIR, max_memory_bytes=MEMORY_MAX_BYTES, max_disk_entries=DISK_MAX_ENTRIES):
+		self.cache_dir = Path(cache_dir)
+		self.max_memory_bytes = max_memory_bytes
+		self.max_disk_entries = max_disk_entries
+		self._memory = OrderedDict()
+		self._memory_bytes = 0
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+
+	def _remember(self, key, content):
+		# Se llama con el lock adquirido
+		if len(content) > self.max_memory_bytes:
+			return
+		if key in self._memory:
+			self._memory_bytes -= len(self._memory.pop(key))
+		self._memory[key] = content
+		self._memory_bytes += len(content)
+		while self._memory_bytes > self.max_memory_bytes:
+			self._memory_bytes -= len(self._memory.popitem(last=False)[1])
+
+	def get(self, key):
+		"""Devuelve el resultado de una clave (bytes), o None si no está en la caché"""
+		with self._lock:
+			content = self._memory.get(key)
+			if content is not None:
+				self._memory.move_to_end(key)
+				self.hits += 1
+				return content
+		try:
+			with open(self.cache_dir / f'{key}.bin', 'rb') as f:
+				content = f.read()
+		except (OSError, IOError):
+			with self._lock:
+				self.misses += 1
+			return None
+		with self._lock:
+			self._remember(key, content)
+			self.disk_hits += 1
+		return content
+
+	def put(self, key, content):
+		"""Guarda el resultado de una clave (bytes) en memoria y en disco"""
+		with self._lock:
+			self._remember(key, content)
+		self.cache_dir.mkdir(parents=True, exist_ok=True)
+		file_name = self.cache_dir / f'{key}.bin'
+		tmp_file_name = self.cache_dir / f'.{key}.{os.getpid()}.{threading.get_ident()}.tmp'
+		with open(tmp_file_name, 'wb') as f:
+			f.write(content)
+		os.replace(tmp_file_name, file_name)
+
+		# Eliminar los resultados más antiguos
+		files = []
+		for cached_file in self.cache_dir.glob('*.bin'):
+			try:
+				files.append((cached_file.stat().st_mtime, cached_file))
+			except OSError:
+				pass
+		for _, old_file in sorted(files)[:-self.max_disk_entries]:
+			try:
+				old_file.unlink()
+			except OSError:
+				pass
@@ -3,3 +3,5 @@
 SERVER_IP = 'localhost' # Localhost
 def_user = 'rapidminer'
 def_pass = 'rapidminer'
+# Expose the metrics of the RapidMiner client (latencies, cache and coalesced calls) in the endpoint /metrics/rapidminer
+blnExpose_RAPIDMINER_METRICS = False